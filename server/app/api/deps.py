@@ -1,3 +1,5 @@
+import hashlib
+import time
 from typing import Optional
 from datetime import datetime
 
@@ -6,35 +8,88 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
 from pydantic import BaseModel
 
+from ..core.cache import TTLCache
 from ..core.config import config
+from ..core.memberships import is_member
 from ..db.mongodb import db
 from ..models.user import User, UserInDB, UserRole
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/token/", auto_error=False)
 
 
 class TokenData(BaseModel):
     email: Optional[str] = None
 
 
+_auth_config = config.get("auth") or {}
+_user_cache_config = _auth_config.get("user_cache") or {}
+_token_cache_config = _auth_config.get("token_cache") or {}
+# 已解析的用户，键为 token 中的 sub（邮箱）；角色变更时失效
+user_cache: TTLCache[UserInDB] = TTLCache(
+    "users",
+    maxsize=_user_cache_config.get("max_size", 10000),
+    ttl=_user_cache_config.get("ttl_seconds", 60),
+)
+# 已验证签名的 token 声明，键为 token 的 SHA-256，条目不会活过 token 的 exp
+token_cache: TTLCache[dict] = TTLCache(
+    "tokens",
+    maxsize=_token_cache_config.get("max_size", 10000),
+    ttl=_token_cache_config.get("ttl_seconds", 300),
+)
+
+
 async def get_user(email: str):
+    user = user_cache.get(email)
+    if user is not None:
+        return user
     user = await db.get_collection("users").find_one({"email": email})
     if user:
         user["id"] = str(user.pop("_id"))
-        return UserInDB(**user)
+        user = UserInDB(**user)
+        user_cache.set(email, user)
+        return user
     return None
 
 
+def invalidate_user(email: str):
+    """用户角色等鉴权相关信息变更后调用"""
+    user_cache.invalidate(email)
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    验证 access token 并返回其声明
+
+    同一 token 的验证结果会被缓存，热点客户端不必每个请求都重新计算 HMAC；
+    过期时间仍按 exp 严格判断。
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        if payload.get("exp", 0) <= time.time():
+            token_cache.invalidate(key)
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        return payload
+    payload = jwt.decode(
+        token,
+        config["jwt"]["secret_key"],
+        algorithms=[config["jwt"]["algorithm"]],
+        options={"require": ["exp", "sub"]},
+    )
+    token_cache.set(key, payload, ttl=payload["exp"] - time.time())
+    return payload
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    if not token:
+        raise credentials_exception
     try:
-        payload = jwt.decode(
-            token, config["jwt"]["secret_key"], algorithms=[config["jwt"]["algorithm"]]
-        )
+        payload = decode_access_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
@@ -87,3 +142,19 @@ async def get_current_user_or_guest(token: Optional[str] = Depends(oauth2_scheme
             created_at=datetime.utcnow(),
             updated_at=datetime.utcnow()
         )
+
+
+async def check_match_type_access(match_type_id: Optional[int], current_user):
+    """私有比赛类型的统计数据只对分组成员和超级管理员可见"""
+    if match_type_id is None or current_user.role == UserRole.ADMIN:
+        return
+    match_type = await db.match_types.find_one(
+        {"id": match_type_id}, {"is_private": 1}
+    )
+    if not match_type:
+        raise HTTPException(status_code=404, detail="比赛类型不存在")
+    if match_type.get("is_private", False) and (
+        current_user.role == UserRole.GUEST
+        or not await is_member(match_type_id, current_user.id)
+    ):
+        raise HTTPException(status_code=403, detail="无权访问该比赛类型的统计数据")
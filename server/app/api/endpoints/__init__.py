@@ -2,9 +2,12 @@ from . import (
     auth,
     decks,
     environments,
+    jobs,
     match_results,
     match_types,
+    metrics,
     statistics,
+    system,
     users,
     win_rates,
     prior_knowledge,
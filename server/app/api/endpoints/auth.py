@@ -4,19 +4,18 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
 import jwt
-from ...core.auth import (
-    get_current_user,
-    get_current_user_or_guest,
+from ...core.config import config
+from ...core.security import (
+    PasswordHasherBusy,
     create_access_token,
     create_refresh_token,
-    verify_password,
-    get_password_hash,
+    password_hasher,
 )
-from ...core.config import config
 from ...core.logger import logger
 from ...models.user import User, UserRole, UserCreate
 from ...db.mongodb import get_database
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from ..deps import get_current_user_or_guest
 
 router = APIRouter()
 
@@ -28,12 +27,19 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: Optional[str] = None
 
+def password_hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="服务器繁忙，请稍后重试",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/token/", response_model=Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    logger.info(f'开始登录验证: {form_data.username}')
+    logger.bind(sample=True).info(f'开始登录验证: {form_data.username}')
     user = await db.users.find_one({"email": form_data.username})
     
     if not user:
@@ -44,7 +50,15 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not verify_password(form_data.password, user["hashed_password"]):
+    try:
+        password_valid = await password_hasher.verify(
+            form_data.password, user["hashed_password"]
+        )
+    except PasswordHasherBusy:
+        logger.warning(f'密码校验繁忙，拒绝登录: {form_data.username}')
+        raise password_hasher_busy()
+
+    if not password_valid:
         logger.error(f'密码错误: {form_data.username}')
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -59,7 +73,7 @@ async def login_for_access_token(
         data={"sub": user["email"], "role": user["role"]}
     )
     
-    logger.info(f'登录成功: {form_data.username}')
+    logger.bind(sample=True).info(f'登录成功: {form_data.username}')
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
@@ -78,8 +92,6 @@ async def refresh_access_token(
             config["jwt"]["refresh_secret_key"],
             algorithms=[config["jwt"]["algorithm"]]
         )
-        logger.info(f'刷新token解码成功: {payload}')
-        
         email = payload.get("sub")
         if email is None:
             logger.error('刷新token中没有用户邮箱')
@@ -121,7 +133,7 @@ async def refresh_access_token(
 
 @router.get("/check-admin")
 async def check_admin(current_user: User = Depends(get_current_user_or_guest)):
-    logger.info(f'检查管理员权限: {current_user}')
+    logger.bind(sample=True).debug(f'检查管理员权限: {current_user.id}')
     return {
         "is_admin": current_user.role == UserRole.ADMIN,
         "is_moderator": current_user.role in [UserRole.ADMIN, UserRole.MODERATOR],
@@ -146,7 +158,13 @@ async def register_user(
     
     # 创建新用户
     user_dict = user_data.model_dump()
-    user_dict["hashed_password"] = get_password_hash(user_dict.pop("password"))
+    try:
+        user_dict["hashed_password"] = await password_hasher.hash(
+            user_dict.pop("password")
+        )
+    except PasswordHasherBusy:
+        logger.warning(f'密码哈希繁忙，拒绝注册: {user_data.email}')
+        raise password_hasher_busy()
     user_dict["created_at"] = datetime.utcnow()
     user_dict["updated_at"] = datetime.utcnow()
     user_dict["role"] = UserRole.PLAYER  # 默认为普通玩家
@@ -3,8 +3,12 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 
-from ...db.mongodb import db
+from ...core.data_versions import bump_data_version
+from ...core.deletion_jobs import enqueue_deletion, get_deletion_job
+from ...db.id_allocator import id_allocator
+from ...db.mongodb import NOT_DELETED, db
 from ...models.deck import Deck, DeckCreate
+from ...models.deletion_job import DeletionJob
 from ...models.user import UserRole
 from ..deps import get_current_admin, get_current_moderator, get_current_user
 
@@ -12,10 +16,7 @@ router = APIRouter()
 
 
 async def get_next_id():
-    result = await db.counters.find_one_and_update(
-        {"name": "deck_id"}, {"$inc": {"seq": 1}}, return_document=True
-    )
-    return result["seq"]
+    return await id_allocator.next_id("deck_id")
 
 
 @router.post("/", response_model=Deck)
@@ -38,6 +39,7 @@ async def create_deck(
     # deck_dict["author_id"] = current_user.email
 
     await db.decks.insert_one(deck_dict)
+    await bump_data_version([deck.environment_id])
     return Deck(**deck_dict)
 
 
@@ -45,7 +47,7 @@ async def create_deck(
 async def read_decks(
     environment_id: int = None, author_id: str = None, search: str = None
 ):
-    query = {}
+    query = dict(NOT_DELETED)
     if environment_id:
         query["environment_id"] = environment_id
     if author_id:
@@ -57,9 +59,22 @@ async def read_decks(
     return [Deck(**deck) for deck in decks]
 
 
+@router.get("/deletion-jobs/{job_id}", response_model=DeletionJob)
+async def read_deck_deletion_job(
+    job_id: str, current_user: dict = Depends(get_current_admin)
+):
+    """查询卡组级联删除任务的进度"""
+    job = await get_deletion_job(job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="删除任务不存在"
+        )
+    return DeletionJob(**job)
+
+
 @router.get("/{deck_id}", response_model=Deck)
 async def read_deck(deck_id: int):
-    deck = await db.decks.find_one({"id": deck_id})
+    deck = await db.decks.find_one({"id": deck_id, **NOT_DELETED})
     if not deck:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="卡组不存在")
     return Deck(**deck)
@@ -70,7 +85,7 @@ async def update_deck(
     deck_id: int, deck: DeckCreate, current_user: dict = Depends(get_current_moderator)
 ):
     # 检查卡组是否存在
-    existing = await db.decks.find_one({"id": deck_id})
+    existing = await db.decks.find_one({"id": deck_id, **NOT_DELETED})
     if not existing:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="卡组不存在")
 
@@ -83,29 +98,20 @@ async def update_deck(
     # 更新卡组
     deck_dict = deck.model_dump()
     await db.decks.update_one({"id": deck_id}, {"$set": deck_dict})
+    await bump_data_version([existing["environment_id"], deck.environment_id])
 
     return Deck(**{**deck_dict, "id": deck_id})
 
 
-@router.delete("/{deck_id}")
+@router.delete("/{deck_id}", status_code=status.HTTP_202_ACCEPTED)
 async def delete_deck(deck_id: int, current_user: dict = Depends(get_current_admin)):
     # 检查卡组是否存在
-    deck = await db.decks.find_one({"id": deck_id})
+    deck = await db.decks.find_one({"id": deck_id, **NOT_DELETED})
     if not deck:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="卡组不存在")
 
-    # 删除所有相关的对局记录
-    await db.match_results.delete_many(
-        {
-            "$or": [
-                {"first_deck_id": deck_id},
-                {"second_deck_id": deck_id},
-                {"winning_deck_id": deck_id},
-                {"losing_deck_id": deck_id},
-            ]
-        }
-    )
-
-    # 删除卡组
-    await db.decks.delete_one({"id": deck_id})
-    return {"message": "卡组及相关对局记录已删除"}
+    # 先打上墓碑标记，读请求立即不可见；相关对局记录和卡组本身由后台任务分批删除
+    await db.decks.update_one({"id": deck_id}, {"$set": {"deleted": True}})
+    await bump_data_version([deck["environment_id"]])
+    job = await enqueue_deletion("deck", deck_id)
+    return {"message": "卡组已删除，相关对局记录正在后台清理", "job_id": job["id"]}
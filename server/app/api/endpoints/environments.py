@@ -3,6 +3,8 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 
+from ...core.snapshots import drop_snapshots
+from ...db.id_allocator import id_allocator
 from ...db.mongodb import db
 from ...models.environment import Environment, EnvironmentCreate
 from ..deps import get_current_user
@@ -11,10 +13,7 @@ router = APIRouter()
 
 
 async def get_next_id():
-    result = await db.counters.find_one_and_update(
-        {"name": "environment_id"}, {"$inc": {"seq": 1}}, return_document=True
-    )
-    return result["seq"]
+    return await id_allocator.next_id("environment_id")
 
 
 @router.post("/", response_model=Environment)
@@ -93,4 +92,5 @@ async def delete_environment(
 
     # 删除环境
     await db.environments.delete_one({"id": environment_id})
+    await drop_snapshots(environment_id)
     return {"message": "环境已删除"}
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from ...core.calculation_jobs import (
+    MAX_ACTIVE_PER_USER,
+    active_job_count,
+    cancel_calculation_job,
+    enqueue_calculation,
+    get_calculation_job,
+)
+from ...models.calculation_job import CalculationJob, CalculationJobCreate
+from ...models.user import UserRole
+from ..deps import check_match_type_access, get_current_user
+
+router = APIRouter()
+
+
+async def get_own_job(job_id: str, current_user) -> dict:
+    """任务只对创建者和超级管理员可见"""
+    job = await get_calculation_job(job_id)
+    if not job or (
+        job["owner_id"] != current_user.id and current_user.role != UserRole.ADMIN
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="计算任务不存在"
+        )
+    return job
+
+
+@router.post("/", response_model=CalculationJob, status_code=status.HTTP_202_ACCEPTED)
+async def create_job(
+    spec: CalculationJobCreate, current_user: dict = Depends(get_current_user)
+):
+    """创建后台胜率计算任务，通过 GET /jobs/{job_id} 查询进度和结果"""
+    await check_match_type_access(spec.match_type_id, current_user)
+    if (
+        current_user.role != UserRole.ADMIN
+        and await active_job_count(current_user.id) >= MAX_ACTIVE_PER_USER
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"最多同时进行 {MAX_ACTIVE_PER_USER} 个计算任务，请等待已有任务完成",
+        )
+    return await enqueue_calculation(spec, current_user.id)
+
+
+@router.get("/{job_id}", response_model=CalculationJob)
+async def read_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    return await get_own_job(job_id, current_user)
+
+
+@router.post("/{job_id}/cancel", response_model=CalculationJob)
+async def cancel_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """取消任务，执行中的任务在算完当前环境后停止"""
+    await get_own_job(job_id, current_user)
+    return await cancel_calculation_job(job_id)
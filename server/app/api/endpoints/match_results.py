@@ -1,24 +1,36 @@
-from typing import List
+import json
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from ...db.mongodb import db
+from ...core.data_versions import data_version_marker
+from ...db.id_allocator import id_allocator
+from ...db.mongodb import NOT_DELETED, db
+from ...db.write_buffer import WriteBufferFull, write_buffer
 from ...models.match_result import (
     BatchMatchResultCreate,
     MatchResult,
     MatchResultCreate,
+    MatchResultPartial,
 )
 from ..deps import get_current_user
 
 router = APIRouter()
 
+# 单页最多返回的对局数
+MAX_PAGE_SIZE = 1000
+# 允许投影的字段
+PROJECTABLE_FIELDS = set(MatchResultPartial.model_fields) - {"id"}
+# 导出时每次从游标拉取的文档数，以及每次向客户端写出的行数
+EXPORT_BATCH_SIZE = 2000
+EXPORT_CHUNK_LINES = 500
+EXPORT_FIELDS = list(MatchResultPartial.model_fields)
+
 
 async def get_next_id():
-    result = await db.counters.find_one_and_update(
-        {"name": "match_result_id"}, {"$inc": {"seq": 1}}, return_document=True
-    )
-    return result["seq"]
+    return await id_allocator.next_id("match_result_id")
 
 
 @router.post("/batch", response_model=List[MatchResult])
@@ -47,20 +59,31 @@ async def create_batch_match_results(
     second_deck_id = batch_match_result.match_results[0].second_deck_id
 
     # 如果卡组ID为0，说明是忽略先后手的情况
-    if first_deck_id != 0 and not await db.decks.find_one({"id": first_deck_id}):
+    if first_deck_id != 0 and not await db.decks.find_one(
+        {"id": first_deck_id, **NOT_DELETED}
+    ):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"卡组 {first_deck_id} 不存在",
         )
-    if second_deck_id != 0 and not await db.decks.find_one({"id": second_deck_id}):
+    if second_deck_id != 0 and not await db.decks.find_one(
+        {"id": second_deck_id, **NOT_DELETED}
+    ):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"卡组 {second_deck_id} 不存在",
         )
 
+    # 一次性分配整批 ID
+    match_result_ids = await id_allocator.allocate(
+        "match_result_id", len(batch_match_result.match_results)
+    )
+
     # 创建对局结果列表
     created_match_results = []
-    for match_result in batch_match_result.match_results:
+    for match_result, match_result_id in zip(
+        batch_match_result.match_results, match_result_ids
+    ):
         # 如果是忽略先后手的情况（卡组ID为0），跳过胜利和失败卡组的验证
         if first_deck_id != 0 and second_deck_id != 0:
             # 验证胜利和失败卡组
@@ -75,9 +98,6 @@ async def create_batch_match_results(
                     detail="失败卡组必须是先手或后手卡组之一",
                 )
 
-        # 获取新的 ID
-        match_result_id = await get_next_id()
-
         # 创建对局结果
         match_result_dict = match_result.model_dump()
         match_result_dict["id"] = match_result_id
@@ -85,6 +105,9 @@ async def create_batch_match_results(
         await db.match_results.insert_one(match_result_dict)
         created_match_results.append(MatchResult(**match_result_dict))
 
+    data_version_marker.mark(
+        match_result.environment_id for match_result in batch_match_result.match_results
+    )
     return created_match_results
 
 
@@ -105,7 +128,7 @@ async def create_match_result(
         match_result.winning_deck_id,
         match_result.losing_deck_id,
     ]:
-        if not await db.decks.find_one({"id": deck_id}):
+        if not await db.decks.find_one({"id": deck_id, **NOT_DELETED}):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail=f"卡组 {deck_id} 不存在"
             )
@@ -134,6 +157,16 @@ async def create_match_result(
             detail="失败卡组必须是先手或后手卡组之一",
         )
 
+    # 启用写入缓冲时合并写入，由缓冲区统一分配 ID
+    if write_buffer.running:
+        try:
+            match_result_dict = await write_buffer.submit(match_result.model_dump())
+        except WriteBufferFull as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e)
+            )
+        return MatchResult(**match_result_dict)
+
     # 获取新的 ID
     match_result_id = await get_next_id()
 
@@ -142,18 +175,30 @@ async def create_match_result(
     match_result_dict["id"] = match_result_id
 
     await db.match_results.insert_one(match_result_dict)
+    data_version_marker.mark([match_result.environment_id])
     return MatchResult(**match_result_dict)
 
 
-@router.get("/", response_model=List[MatchResult])
+@router.get(
+    "/", response_model=List[MatchResultPartial], response_model_exclude_unset=True
+)
 async def read_match_results(
+    response: Response,
     environment_id: int = None,
     first_deck_id: int = None,
     second_deck_id: int = None,
     winning_deck_id: int = None,
     losing_deck_id: int = None,
     match_type_id: int = None,
+    after_id: Optional[int] = Query(None, description="上一页最后一条记录的 id"),
+    limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="每页条数"),
+    fields: Optional[str] = Query(None, description="逗号分隔的返回字段，id 总会返回"),
 ):
+    """
+    按 id 升序分页获取对局结果
+
+    返回条数等于 limit 时，响应头 X-Next-After-Id 给出下一页的 after_id
+    """
     query = {}
     if environment_id:
         query["environment_id"] = environment_id
@@ -167,9 +212,89 @@ async def read_match_results(
         query["losing_deck_id"] = losing_deck_id
     if match_type_id:
         query["match_type_id"] = match_type_id
+    if after_id is not None:
+        query["id"] = {"$gt": after_id}
+
+    projection = {"_id": 0, "id": 1}
+    if fields:
+        selected = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = selected - PROJECTABLE_FIELDS - {"id"}
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"不支持的字段: {', '.join(sorted(unknown))}",
+            )
+        projection.update({field: 1 for field in selected})
+    else:
+        projection.update({field: 1 for field in PROJECTABLE_FIELDS})
+
+    match_results = (
+        await db.match_results.find(query, projection)
+        .sort("id", 1)
+        .limit(limit)
+        .to_list(length=limit)
+    )
+    if len(match_results) == limit:
+        response.headers["X-Next-After-Id"] = str(match_results[-1]["id"])
+    return match_results
+
+
+@router.get("/export")
+async def export_match_results(
+    environment_id: int,
+    match_type_id: Optional[int] = None,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson 或 csv"),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    流式导出某环境下的全部对局结果
+
+    按 id 顺序遍历游标逐批写出，服务端内存占用与数据量无关
+    """
+    query = {"environment_id": environment_id}
+    if match_type_id is not None:
+        query["match_type_id"] = match_type_id
+    projection = {"_id": 0, **{field: 1 for field in EXPORT_FIELDS}}
+
+    if format == "csv":
+        media_type = "text/csv"
 
-    match_results = await db.match_results.find(query).to_list(length=None)
-    return [MatchResult(**mr) for mr in match_results]
+        def encode(doc: dict) -> str:
+            return ",".join(str(doc.get(field, "")) for field in EXPORT_FIELDS) + "\n"
+
+    else:
+        media_type = "application/x-ndjson"
+
+        def encode(doc: dict) -> str:
+            return json.dumps(doc, separators=(",", ":")) + "\n"
+
+    async def generate():
+        if format == "csv":
+            yield ",".join(EXPORT_FIELDS) + "\n"
+        cursor = (
+            db.analytics.match_results.find(query, projection)
+            .sort("id", 1)
+            .batch_size(EXPORT_BATCH_SIZE)
+        )
+        try:
+            lines = []
+            async for doc in cursor:
+                lines.append(encode(doc))
+                if len(lines) >= EXPORT_CHUNK_LINES:
+                    yield "".join(lines)
+                    lines = []
+            if lines:
+                yield "".join(lines)
+        finally:
+            # 客户端中途断开时及时释放服务端游标
+            await cursor.close()
+
+    filename = f"match_results_{environment_id}.{format}"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
 @router.get("/{match_result_id}", response_model=MatchResult)
@@ -187,11 +312,13 @@ async def delete_match_result(
     match_result_id: int, current_user: dict = Depends(get_current_user)
 ):
     # 检查对局结果是否存在
-    if not await db.match_results.find_one({"id": match_result_id}):
+    match_result = await db.match_results.find_one({"id": match_result_id})
+    if not match_result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="对局结果不存在"
         )
 
     # 删除对局结果
     await db.match_results.delete_one({"id": match_result_id})
+    data_version_marker.mark([match_result.get("environment_id")])
     return {"message": "对局结果已删除"}
@@ -5,6 +5,14 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 
+from ...core.memberships import (
+    add_member,
+    is_member,
+    member_match_type_ids,
+    members_of,
+    remove_match_type,
+)
+from ...db.id_allocator import id_allocator
 from ...db.mongodb import db
 from ...models.match_type import MatchType, MatchTypeCreate
 from ...models.user import UserRole
@@ -28,11 +36,23 @@ async def generate_invite_code(length: int = 8) -> str:
             return code
 
 
-async def get_next_id():
-    result = await db.counters.find_one_and_update(
-        {"name": "match_type_id"}, {"$inc": {"seq": 1}}, return_document=True
+# 公开比赛类型（is_private 为 false、null 或不存在）
+PUBLIC_QUERY = {"is_private": {"$ne": True}}
+
+
+async def with_members(match_types: List[dict]) -> List[MatchType]:
+    """为私有比赛类型填充成员列表，所有分组的成员一次查询取回"""
+    members = await members_of(
+        mt["id"] for mt in match_types if mt.get("is_private", False)
     )
-    return result["seq"]
+    return [
+        MatchType(**{**mt, "users": members.get(mt["id"], [])})
+        for mt in match_types
+    ]
+
+
+async def get_next_id():
+    return await id_allocator.next_id("match_type_id")
 
 
 @router.post("/", response_model=MatchType)
@@ -56,73 +76,48 @@ async def create_match_type(
     # 如果是私有分组，生成邀请码
     if match_type_dict.get("is_private", False):
         match_type_dict["invite_code"] = await generate_invite_code()
-        match_type_dict["users"] = [current_user.id]  # 创建者自动加入分组
     else:
         match_type_dict["invite_code"] = None
-        match_type_dict["users"] = []
 
     await db.match_types.insert_one(match_type_dict)
-    return MatchType(**match_type_dict)
-
-
-@router.get("/", response_model=List[MatchType])
+    users = []
+    if match_type_dict["is_private"]:
+        # 创建者自动加入分组
+        await add_member(match_type_id, current_user.id)
+        users = [current_user.id]
+    return MatchType(**match_type_dict, users=users)
+
+
+# 列表不返回成员，成员只在单个比赛类型的接口中返回
+@router.get(
+    "/",
+    response_model=List[MatchType],
+    response_model_exclude={"__all__": {"users"}},
+)
 async def read_match_types(current_user: dict = Depends(get_current_user_or_guest)):
     try:
         # 如果是管理员，返回所有比赛类型
         if current_user.role == UserRole.ADMIN:
             all_match_types = await db.match_types.find().to_list(length=None)
-            # 确保每个记录都有 creator_id 字段
-            for mt in all_match_types:
-                if "creator_id" not in mt:
-                    mt["creator_id"] = None
             return [MatchType(**mt) for mt in all_match_types]
 
         # 如果是游客，只返回公开的比赛类型
         if current_user.role == UserRole.GUEST:
-            public_match_types = await db.match_types.find(
-                {
-                    "$or": [
-                        {"is_private": False},
-                        {"is_private": None},
-                        {"is_private": {"$exists": False}},
-                    ]
-                }
-            ).to_list(length=None)
-            
-            # 确保每个记录都有 creator_id 字段
-            for mt in public_match_types:
-                if "creator_id" not in mt:
-                    mt["creator_id"] = None
-                # 对于游客，不返回私有信息
-                mt["users"] = []
-                mt["invite_code"] = None
-            return [MatchType(**mt) for mt in public_match_types]
-
-        # 普通用户可以看到公开的比赛类型和自己所在的私有比赛类型
-        # 获取所有公开的比赛类型（包括 is_private 为 false 或 null 的情况）
-        public_match_types = await db.match_types.find(
-            {
-                "$or": [
-                    {"is_private": False},
-                    {"is_private": None},
-                    {"is_private": {"$exists": False}},
-                ]
-            }
-        ).to_list(length=None)
-
-        # 获取用户所在的私有比赛类型
-        private_match_types = await db.match_types.find(
-            {"is_private": True, "users": str(current_user.id)}
-        ).to_list(length=None)
-
-        # 合并结果
-        all_match_types = public_match_types + private_match_types
-
-        # 确保每个记录都有 creator_id 字段
-        for mt in all_match_types:
-            if "creator_id" not in mt:
-                mt["creator_id"] = None
-
+            public_match_types = await db.match_types.find(PUBLIC_QUERY).to_list(
+                length=None
+            )
+            # 对于游客，不返回私有信息
+            return [
+                MatchType(**{**mt, "invite_code": None}) for mt in public_match_types
+            ]
+
+        # 普通用户可以看到公开的比赛类型和自己所在的私有比赛类型，
+        # 成员关系通常命中缓存，只需一次查询
+        member_ids = await member_match_type_ids(current_user.id)
+        query = PUBLIC_QUERY
+        if member_ids:
+            query = {"$or": [PUBLIC_QUERY, {"id": {"$in": list(member_ids)}}]}
+        all_match_types = await db.match_types.find(query).to_list(length=None)
         return [MatchType(**mt) for mt in all_match_types]
     except Exception as e:
         logger.error(f"获取比赛类型列表失败: {str(e)}")
@@ -147,10 +142,12 @@ async def read_match_type(
     if match_type.get("is_private", False):
         # 管理员可以查看所有比赛类型
         if current_user.role == UserRole.ADMIN:
-            return MatchType(**match_type)
+            return (await with_members([match_type]))[0]
         
-        # 检查用户是否在比赛类型的用户列表中
-        if current_user.role != UserRole.GUEST and current_user.id not in match_type.get("users", []):
+        # 检查用户是否是分组成员
+        if current_user.role != UserRole.GUEST and not await is_member(
+            match_type_id, current_user.id
+        ):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="无权访问此地区环境"
@@ -160,8 +157,9 @@ async def read_match_type(
     if current_user.role == UserRole.GUEST:
         match_type["users"] = []
         match_type["invite_code"] = None
+        return MatchType(**match_type)
     
-    return MatchType(**match_type)
+    return (await with_members([match_type]))[0]
 
 
 @router.put("/{match_type_id}", response_model=MatchType)
@@ -222,6 +220,7 @@ async def delete_match_type(
 
     # 删除比赛类型
     await db.match_types.delete_one({"id": match_type_id})
+    await remove_match_type(match_type_id)
     return {"message": "地区环境已删除"}
 
 
@@ -238,18 +237,11 @@ async def join_match_type(
             status_code=status.HTTP_404_NOT_FOUND, detail="邀请码无效或已过期"
         )
 
-    # 检查用户是否已经在分组中
-    if current_user.id in match_type.get("users", []):
+    # 将用户添加到分组，成员记录上的唯一索引保证不会重复加入
+    if not await add_member(match_type["id"], current_user.id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="您已经在该分组中"
         )
 
-    # 将用户添加到分组
-    await db.match_types.update_one(
-        {"id": match_type["id"]},
-        {"$addToSet": {"users": current_user.id}},  # 使用 addToSet 避免重复添加
-    )
-
     # 返回更新后的比赛类型信息
-    updated_match_type = await db.match_types.find_one({"id": match_type["id"]})
-    return MatchType(**updated_match_type)
+    return (await with_members([match_type]))[0]
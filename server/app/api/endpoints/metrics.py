@@ -0,0 +1,71 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from motor.frameworks import asyncio as motor_asyncio
+
+from ...core import calculation_jobs, deletion_jobs
+from ...core.live_updates import live_updates
+from ...core.metrics import REGISTRY, gauge
+from ...core.security import password_hasher
+from ...db.pool_monitor import pool_monitor
+from ...db.write_buffer import write_buffer
+
+router = APIRouter()
+
+
+def _executor_stats():
+    """Motor 执行数据库操作的线程池与密码哈希线程池：排队中的任务数与线程数"""
+    yield {"executor": "password", "stat": "in_flight"}, password_hasher.in_flight
+    yield {"executor": "password", "stat": "threads"}, password_hasher.max_workers
+    executor = getattr(motor_asyncio, "_EXECUTOR", None)
+    work_queue = getattr(executor, "_work_queue", None)
+    if work_queue is not None:
+        yield {"executor": "motor", "stat": "queued"}, work_queue.qsize()
+        yield {"executor": "motor", "stat": "threads"}, len(executor._threads)
+
+
+def _pool_stats():
+    for address, stats in pool_monitor.snapshot().items():
+        for stat in ("open", "in_use", "waiting"):
+            yield {"address": address, "stat": stat}, stats[stat]
+
+
+gauge(
+    "esu_executor_tasks",
+    "线程池排队任务数与线程数",
+    ["executor", "stat"],
+    callback=_executor_stats,
+)
+gauge(
+    "esu_write_buffer_pending",
+    "对局写入缓冲区中等待落库的文档数",
+    callback=lambda: [({}, write_buffer.pending)],
+)
+gauge(
+    "esu_deletion_jobs_running",
+    "当前 worker 正在执行的级联删除任务数",
+    callback=lambda: [({}, len(deletion_jobs._running_tasks))],
+)
+gauge(
+    "esu_calculation_jobs_running",
+    "当前 worker 正在执行或等待名额的胜率计算任务数",
+    callback=lambda: [({}, calculation_jobs.running_jobs())],
+)
+gauge(
+    "esu_live_subscribers",
+    "当前 worker 上实时统计的 SSE 订阅数",
+    callback=lambda: [({}, live_updates.subscriber_count)],
+)
+gauge(
+    "esu_mongodb_pool_connections",
+    "MongoDB 连接池中的连接数",
+    ["address", "stat"],
+    callback=_pool_stats,
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics():
+    """Prometheus 文本格式的指标"""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
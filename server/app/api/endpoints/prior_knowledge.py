@@ -1,39 +1,134 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from ...models.prior_knowledge import DeckMatchupPrior, DeckMatchupPriorResponse
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from ...core.data_versions import bump_data_version
+from ...core.logger import logger
+from ...core.priors import invalidate_priors, load_priors
+from ...models.prior_knowledge import (
+    BatchDeckMatchupPriorUpdate,
+    DeckMatchupPrior,
+    DeckMatchupPriorResponse,
+)
 from ...db.mongodb import get_database
-from ...core.auth import get_current_admin_or_moderator
+from ...db.repositories import DeckRepository
+from ..deps import get_current_moderator
 
 router = APIRouter()
 
+# 单次批量更新最多包含的单元格数（100×100 的矩阵）
+MAX_BATCH_PRIORS = 10000
+
 @router.get("/matchup-priors", response_model=DeckMatchupPriorResponse)
 async def get_matchup_priors(
+    environment_id: Optional[int] = Query(None, description="环境ID，不传时返回全部环境"),
     db: AsyncIOMotorDatabase = Depends(get_database),
-    current_user: dict = Depends(get_current_admin_or_moderator)
+    current_user: dict = Depends(get_current_moderator)
 ):
-    """获取所有卡组对局的先验数据"""
-    priors = {}
-    async for doc in db.deck_matchup_priors.find():
-        key = f"{doc['deck_a_id']}_{doc['deck_b_id']}"
-        priors[key] = DeckMatchupPrior(**doc)
-    return DeckMatchupPriorResponse(matchup_priors=priors)
+    """获取卡组对局的先验数据"""
+    priors = await load_priors(db, environment_id)
+    # 先验数据来自数据库且字段固定，直接序列化，不再逐条构造模型
+    return JSONResponse(
+        {"matchup_priors": {key: row._asdict() for key, row in priors.items()}}
+    )
 
 @router.post("/matchup-priors")
 async def update_matchup_prior(
     prior: DeckMatchupPrior,
     db: AsyncIOMotorDatabase = Depends(get_database),
-    current_user: dict = Depends(get_current_admin_or_moderator)
+    current_user: dict = Depends(get_current_moderator)
 ):
     """更新卡组对局的先验数据"""
     if prior.prior_wins > prior.prior_matches:
         raise HTTPException(status_code=400, detail="胜利次数不能超过总次数")
-        
+
+    environments = await DeckRepository(db).environment_ids(
+        [prior.deck_a_id, prior.deck_b_id]
+    )
+    if prior.deck_a_id not in environments or prior.deck_b_id not in environments:
+        raise HTTPException(status_code=404, detail="卡组不存在")
+    environment_id = environments[prior.deck_a_id]
+
     await db.deck_matchup_priors.update_one(
         {
             "deck_a_id": prior.deck_a_id,
             "deck_b_id": prior.deck_b_id
         },
-        {"$set": prior.dict()},
+        {"$set": {**prior.model_dump(), "environment_id": environment_id}},
         upsert=True
     )
-    return {"message": "更新成功"} 
\ No newline at end of file
+    invalidate_priors([environment_id])
+    await bump_data_version([environment_id], priors=True)
+    return {"message": "更新成功"}
+
+@router.post("/matchup-priors/batch")
+async def update_matchup_priors_batch(
+    batch: BatchDeckMatchupPriorUpdate,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: dict = Depends(get_current_moderator)
+):
+    """批量更新卡组对局的先验数据，整个或部分矩阵一次写入"""
+    priors = batch.matchup_priors
+    if not priors:
+        raise HTTPException(status_code=400, detail="先验数据不能为空")
+    if len(priors) > MAX_BATCH_PRIORS:
+        raise HTTPException(
+            status_code=400, detail=f"单次最多更新 {MAX_BATCH_PRIORS} 条先验数据"
+        )
+
+    # 一次遍历完成全部校验，卡组存在性只查询一次
+    environments = await DeckRepository(db).environment_ids(
+        {deck_id for prior in priors for deck_id in (prior.deck_a_id, prior.deck_b_id)}
+    )
+    seen = set()
+    for prior in priors:
+        key = (prior.deck_a_id, prior.deck_b_id)
+        if prior.prior_matches < 0 or prior.prior_wins < 0:
+            detail = "先验数据不能为负数"
+        elif prior.prior_wins > prior.prior_matches:
+            detail = "胜利次数不能超过总次数"
+        elif prior.deck_a_id not in environments or prior.deck_b_id not in environments:
+            detail = "卡组不存在"
+        elif key in seen:
+            detail = "同一对卡组重复出现"
+        else:
+            seen.add(key)
+            continue
+        raise HTTPException(
+            status_code=400, detail=f"{prior.deck_a_id}_{prior.deck_b_id}: {detail}"
+        )
+
+    operations = [
+        UpdateOne(
+            {"deck_a_id": prior.deck_a_id, "deck_b_id": prior.deck_b_id},
+            {
+                "$set": {
+                    **prior.model_dump(),
+                    "environment_id": environments[prior.deck_a_id],
+                }
+            },
+            upsert=True,
+        )
+        for prior in priors
+    ]
+    try:
+        result = await db.deck_matchup_priors.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        logger.error(
+            f"批量更新先验数据部分失败: "
+            f"{len(e.details.get('writeErrors', []))}/{len(operations)}"
+        )
+        raise HTTPException(status_code=500, detail="部分先验数据保存失败，请重试")
+    finally:
+        # 整批只失效一次；无序写入失败时其余单元格已写入，同样需要失效
+        environment_ids = {environments[prior.deck_a_id] for prior in priors}
+        invalidate_priors(environment_ids)
+        await bump_data_version(environment_ids, priors=True)
+    return {
+        "message": "更新成功",
+        "upserted": result.upserted_count,
+        "modified": result.modified_count,
+    }
@@ -1,12 +1,14 @@
 from typing import Dict, List, Optional
 
-from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from pydantic import BaseModel
 
+from ...core.analytics import compute_deck_statistics
+from ...core.live_updates import matchup_cells
+from ...core.memberships import is_member
+from ...core.tracing import span
 from ...db.mongodb import db
-from ...models.deck import Deck
-from ...models.match_result import MatchResult
+from ...db.repositories import DeckRepository, MatchResultRepository
 from ...models.user import UserRole
 from ..deps import get_current_user_or_guest
 
@@ -65,47 +67,15 @@ async def get_environment_statistics(
             raise HTTPException(status_code=404, detail="Environment not found")
 
         # 获取该环境下的所有卡组
-        decks = await db.decks.find({"environment_id": environment_id}).to_list(None)
+        deck_names = await DeckRepository(db.analytics).names(environment_id)
 
         # 获取该环境下的所有对战记录
-        match_results = await db.match_results.find(
+        match_results = await MatchResultRepository(db.analytics).fetch_deck_rows(
             {"environment_id": environment_id}
-        ).to_list(None)
+        )
 
         # 统计每个卡组的战绩
-        deck_statistics = []
-        for deck in decks:
-            deck_id = deck["id"]
-            deck_matches = [
-                m
-                for m in match_results
-                if m["winning_deck_id"] == deck_id or m["losing_deck_id"] == deck_id
-            ]
-
-            wins = sum(
-                1
-                for m in deck_matches
-                if m["winning_deck_id"] == deck_id and m["losing_deck_id"] != deck_id
-            )
-            losses = sum(
-                1
-                for m in deck_matches
-                if m["losing_deck_id"] == deck_id and m["winning_deck_id"] != deck_id
-            )
-            total_matches = wins + losses
-
-            win_rate = (wins / total_matches * 100) if total_matches > 0 else 0
-
-            deck_statistics.append(
-                {
-                    "deck_id": str(deck_id),
-                    "deck_name": deck["name"],
-                    "total_matches": total_matches,
-                    "wins": wins,
-                    "losses": losses,
-                    "win_rate": round(win_rate, 2),
-                }
-            )
+        deck_statistics = compute_deck_statistics(deck_names, match_results)
 
         return {
             "environment_id": environment_id,
@@ -134,8 +104,9 @@ async def get_deck_matchups(
             raise HTTPException(status_code=404, detail="环境不存在")
 
         # 获取该环境下的所有卡组
-        decks = await db.decks.find({"environment_id": environment_id}).to_list(None)
-        deck_map = {str(deck["id"]): deck["name"] for deck in decks}
+        with span("db"):
+            deck_names = await DeckRepository(db.analytics).names(environment_id)
+        deck_map = {str(deck_id): name for deck_id, name in deck_names.items()}
 
         # 构建查询条件
         match_query = {"environment_id": environment_id}
@@ -151,7 +122,7 @@ async def get_deck_matchups(
                     raise HTTPException(
                         status_code=403, detail="游客无权访问该比赛类型的统计数据"
                     )
-                if current_user.id not in match_type.get("users", []):
+                if not await is_member(match_type_id, current_user.id):
                     raise HTTPException(
                         status_code=403, detail="无权访问该比赛类型的统计数据"
                     )
@@ -159,97 +130,39 @@ async def get_deck_matchups(
             match_query["match_type_id"] = match_type_id
 
         # 获取该环境下的所有对战记录
-        match_results = await db.match_results.find(match_query).to_list(None)
-
-        # 统计卡组间的对战数据
-        matchup_stats = {}
-        for deck in decks:
-            deck_id = deck["id"]
-            deck_name = deck["name"]
-
-            # 获取该卡组的所有对战记录
-            deck_matches = [
-                m
-                for m in match_results
-                if m["winning_deck_id"] == deck_id or m["losing_deck_id"] == deck_id
-            ]
-            # 统计对阵其他卡组的战绩
-            opponent_stats = {}
-            for match in deck_matches:
-                # 确定对手ID
-                if match["winning_deck_id"] == deck_id:
-                    opponent_id = str(match["losing_deck_id"])
-                else:
-                    opponent_id = str(match["winning_deck_id"])
-
-                # 确定是否先手（处理三种情况）
-                first_deck_id = match["first_deck_id"]
-                second_deck_id = match["second_deck_id"]
-
-                # 如果first_deck_id和second_deck_id都为0，说明没有先后手信息
-                if first_deck_id == 0 and second_deck_id == 0:
-                    is_first_hand = None
-                else:
-                    is_first_hand = first_deck_id == deck_id
-
-                # 根据hand参数过滤对战记录
-                if hand == "first" and not is_first_hand:
-                    continue
-                if hand == "second" and is_first_hand:
-                    continue
-
-                if opponent_id in deck_map:
-                    if opponent_id not in opponent_stats:
-                        opponent_stats[opponent_id] = {
-                            "opponent_name": deck_map[opponent_id],
-                            "total": 0,
-                            "wins": 0,
-                            "losses": 0,
-                            "win_rate": 0,
-                            "first_hand_total": 0,
-                            "first_hand_wins": 0,
-                            "second_hand_total": 0,
-                            "second_hand_wins": 0,
-                        }
-
-                    stats = opponent_stats[opponent_id]
-                    stats["total"] += 1
-
-                    # 统计先后手数据
-                    if is_first_hand is None:
-                        # 没有先后手信息，不统计先后手数据
-                        pass
-                    elif is_first_hand:
-                        stats["first_hand_total"] += 1
-                    else:
-                        stats["second_hand_total"] += 1
-
-                    if match["winning_deck_id"] == deck_id:
-                        stats["wins"] += 1
-                        if is_first_hand is not None:  # 只有在有先后手信息时才统计
-                            if is_first_hand:
-                                stats["first_hand_wins"] += 1
-                            else:
-                                stats["second_hand_wins"] += 1
-                    elif match["losing_deck_id"] == deck_id:
-                        stats["losses"] += 1
-
-                    stats["win_rate"] = (
-                        round((stats["wins"] / stats["total"]) * 100, 2)
-                        if stats["total"] > 0
-                        else 0
-                    )
+        with span("db"):
+            match_results = await MatchResultRepository(db.analytics).fetch_deck_arrays(
+                match_query
+            )
 
-            matchup_stats[str(deck_id)] = {
-                "deck_name": deck_name,
-                "matchups": opponent_stats,
+        # 统计卡组间的对战数据，只保留双方都是该环境现有卡组的单元格
+        with span("compute"):
+            matchup_stats = {
+                str(deck_id): {"deck_name": deck_name, "matchups": {}}
+                for deck_id, deck_name in deck_names.items()
             }
+            for key, cell in matchup_cells(match_results, hand).items():
+                deck_id, opponent_id = key.split("_")
+                if deck_id not in matchup_stats or opponent_id not in deck_map:
+                    continue
+                matchup_stats[deck_id]["matchups"][opponent_id] = {
+                    "opponent_name": deck_map[opponent_id],
+                    **cell,
+                    "losses": cell["total"] - cell["wins"],
+                    "win_rate": round(cell["wins"] / cell["total"] * 100, 2),
+                }
 
-        return {
-            "environment_id": environment_id,
-            "environment_name": environment["name"],
-            "matchup_statistics": matchup_stats,
-        }
+        with span("validate"):
+            response = MatchupStatisticsResponse(
+                environment_id=environment_id,
+                environment_name=environment["name"],
+                matchup_statistics=matchup_stats,
+            )
+        # 已校验过的模型直接序列化返回，跳过 FastAPI 对 response_model 的二次校验
+        with span("serialize"):
+            return Response(
+                content=response.model_dump_json(), media_type="application/json"
+            )
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -268,7 +181,7 @@ async def get_statistics(
             raise HTTPException(status_code=404, detail="环境不存在")
 
         # 获取该环境下的所有卡组
-        decks = await db.decks.find({"environment_id": environment_id}).to_list(None)
+        deck_names = await DeckRepository(db.analytics).names(environment_id)
 
         # 构建查询条件
         match_query = {"environment_id": environment_id}
@@ -284,7 +197,7 @@ async def get_statistics(
                     raise HTTPException(
                         status_code=403, detail="游客无权访问该比赛类型的统计数据"
                     )
-                if current_user.id not in match_type.get("users", []):
+                if not await is_member(match_type_id, current_user.id):
                     raise HTTPException(
                         status_code=403, detail="无权访问该比赛类型的统计数据"
                     )
@@ -292,41 +205,11 @@ async def get_statistics(
             match_query["match_type_id"] = match_type_id
 
         # 获取该环境下的所有对局
-        match_results = await db.match_results.find(match_query).to_list(None)
-
-        deck_statistics = []
-        for deck in decks:
-            deck_id = deck["id"]
-            deck_matches = [
-                m
-                for m in match_results
-                if m["winning_deck_id"] == deck_id or m["losing_deck_id"] == deck_id
-            ]
-
-            wins = sum(
-                1
-                for m in deck_matches
-                if m["winning_deck_id"] == deck_id and m["losing_deck_id"] != deck_id
-            )
-            losses = sum(
-                1
-                for m in deck_matches
-                if m["losing_deck_id"] == deck_id and m["winning_deck_id"] != deck_id
-            )
-            total_matches = wins + losses
-
-            win_rate = (wins / total_matches * 100) if total_matches > 0 else 0
-
-            deck_statistics.append(
-                {
-                    "deck_id": str(deck_id),
-                    "deck_name": deck["name"],
-                    "total_matches": total_matches,
-                    "wins": wins,
-                    "losses": losses,
-                    "win_rate": round(win_rate, 2),
-                }
-            )
+        match_results = await MatchResultRepository(db.analytics).fetch_deck_rows(
+            match_query
+        )
+
+        deck_statistics = compute_deck_statistics(deck_names, match_results)
 
         return {
             "environment_id": environment_id,
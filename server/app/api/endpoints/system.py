@@ -0,0 +1,19 @@
+from fastapi import APIRouter, Depends
+
+from ...db.command_monitor import command_monitor
+from ...db.mongodb import db
+from ..deps import get_current_admin
+
+router = APIRouter()
+
+
+@router.get("/db-pool")
+async def read_db_pool_stats(current_user: dict = Depends(get_current_admin)):
+    """查看当前 worker 的数据库连接池配置与统计"""
+    return db.pool_stats()
+
+
+@router.get("/query-stats")
+async def read_query_stats(current_user: dict = Depends(get_current_admin)):
+    """查看当前 worker 按路由汇总的数据库命令数与耗时"""
+    return command_monitor.route_stats()
@@ -1,11 +1,14 @@
+from datetime import datetime
 from typing import List
 
 from bson import ObjectId
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 
+from ...core.logger import logger
 from ...db.mongodb import db
-from ..deps import get_current_user
+from ...models.user import UserRole
+from ..deps import get_current_admin, get_current_user, invalidate_user
 
 router = APIRouter()
 
@@ -19,6 +22,10 @@ class BatchUserRequest(BaseModel):
     user_ids: List[str]
 
 
+class UserRoleUpdate(BaseModel):
+    role: UserRole
+
+
 @router.post("/batch", response_model=List[UserInfo])
 async def get_users_batch(
     request: BatchUserRequest, current_user: dict = Depends(get_current_user)
@@ -35,7 +42,33 @@ async def get_users_batch(
             for user in users
         ]
     except Exception as e:
-        print(f"获取用户信息失败: {str(e)}")  # 添加日志输出
+        logger.error(f"获取用户信息失败: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="获取用户信息失败"
         )
+
+
+@router.put("/{user_id}/role", response_model=UserInfo)
+async def update_user_role(
+    user_id: str,
+    role_update: UserRoleUpdate,
+    current_user: dict = Depends(get_current_admin),
+):
+    """修改用户角色（仅超级管理员）"""
+    if role_update.role == UserRole.GUEST:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="不能将用户设为游客"
+        )
+    if not ObjectId.is_valid(user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="用户不存在")
+
+    user = await db.users.find_one_and_update(
+        {"_id": ObjectId(user_id)},
+        {"$set": {"role": role_update.role, "updated_at": datetime.utcnow()}},
+    )
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="用户不存在")
+
+    # 本 worker 立即生效，其他 worker 在用户缓存过期后生效
+    invalidate_user(user["email"])
+    return UserInfo(id=user_id, name=user["name"])
@@ -1,17 +1,36 @@
+import asyncio
+import json
+import time
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from ...core.win_rate_calculator import WinRateCalculator
-from ...db.mongodb import get_database
-from ...models.deck import Deck
-from ...models.match_result import MatchResult
-from ...models.win_rate import WinRateCalculationResponse
-from ...models.prior_knowledge import DeckMatchupPrior
+from ...core.analytics import InsufficientData, calculate_win_rates as calculate
+from ...core.live_updates import live_updates
+from ...core.snapshots import latest_snapshot, snapshot_history
+from ...core.stream_tickets import TICKET_TTL_SECONDS, issue_ticket, redeem_ticket
+from ...db.mongodb import db as mongodb, get_analytics_database
+from ...models.user import UserRole
+from ...models.win_rate import (
+    LiveTicket,
+    WinRateCalculationResponse,
+    WinRateSnapshot,
+)
+from ..deps import (
+    check_match_type_access,
+    get_current_user,
+    get_current_user_or_guest,
+    get_user,
+    oauth2_scheme,
+)
 
 router = APIRouter()
 
+# 没有事件时发送注释行的间隔，防止代理断开空闲连接
+HEARTBEAT_SECONDS = 15
+
 
 @router.get("/calculate", response_model=WinRateCalculationResponse)
 async def calculate_win_rates(
@@ -19,7 +38,7 @@ async def calculate_win_rates(
     prior_weight: float = Query(1.0, description="先验数据权重系数（0.1-10.0）"),
     environment_id: Optional[int] = Query(None, description="环境ID"),
     match_type_id: Optional[int] = Query(None, description="比赛类型ID"),
-    db: AsyncIOMotorDatabase = Depends(get_database),
+    db: AsyncIOMotorDatabase = Depends(get_analytics_database),
 ):
     """
     计算所有卡组的胜率
@@ -29,51 +48,144 @@ async def calculate_win_rates(
     - **environment_id**: 可选的环境ID
     - **match_type_id**: 可选的比赛类型ID
     """
-    # 构建查询条件
-    deck_query = {}
-    match_query = {}
-
-    if environment_id is not None:
-        deck_query["environment_id"] = environment_id
-
-    if match_type_id is not None:
-        match_query["match_type_id"] = match_type_id
-
-    # 获取符合条件的卡组
-    decks_cursor = db.decks.find(deck_query)
-    decks = []
-    async for doc in decks_cursor:
-        decks.append(Deck(**doc))
-    if not decks:
-        raise HTTPException(status_code=404, detail="No decks found")
-
-    print("match_query:", match_query)
-    # 获取符合条件的对战结果
-    match_results_cursor = db.match_results.find(match_query)
-    match_results = []
-    async for doc in match_results_cursor:
-        match_results.append(MatchResult(**doc))
-    if not match_results:
-        raise HTTPException(status_code=404, detail="No match results found")
-
-    # 获取先验数据
-    matchup_priors = {}
-    priors_cursor = db.deck_matchup_priors.find()
-    async for doc in priors_cursor:
-        key = f"{doc['deck_a_id']}_{doc['deck_b_id']}"
-        matchup_priors[key] = DeckMatchupPrior(**doc)
-
-    # 创建计算器实例
-    calculator = WinRateCalculator(sensitivity=sensitivity, prior_weight=prior_weight)
-
-    # 计算胜率
-    calculations = calculator.calculate_final_win_rates(
-        decks=decks,
-        match_results=match_results,
-        environment_offsets=None,
-        matchup_priors=matchup_priors,
-    )
+    try:
+        return await calculate(
+            db,
+            sensitivity=sensitivity,
+            prior_weight=prior_weight,
+            environment_id=environment_id,
+            match_type_id=match_type_id,
+        )
+    except InsufficientData as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/snapshot", response_model=WinRateSnapshot)
+async def read_win_rate_snapshot(
+    environment_id: int = Query(..., description="环境ID"),
+    match_type_id: Optional[int] = Query(
+        None, description="比赛类型ID，不传时为全部比赛类型"
+    ),
+    current_user: dict = Depends(get_current_user_or_guest),
+):
+    """
+    按默认参数预先计算好的最新胜率和卡组战绩
+
+    数据变更后由后台重新计算，computed_at 与 data_version 表示快照对应的时间和数据版本。
+    """
+    await check_match_type_access(match_type_id, current_user)
+    snapshot = await latest_snapshot(environment_id, match_type_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="快照尚未生成")
+    return snapshot
+
+
+@router.get("/snapshots", response_model=List[WinRateSnapshot])
+async def read_win_rate_snapshot_history(
+    environment_id: int = Query(..., description="环境ID"),
+    match_type_id: Optional[int] = Query(
+        None, description="比赛类型ID，不传时为全部比赛类型"
+    ),
+    limit: int = Query(20, ge=1, le=200, description="返回的快照数"),
+    current_user: dict = Depends(get_current_user_or_guest),
+):
+    """按时间倒序的历史快照，可用于查看梯度表的变化"""
+    await check_match_type_access(match_type_id, current_user)
+    return await snapshot_history(environment_id, match_type_id, limit)
+
+
+async def _check_environment(environment_id: int):
+    if not await mongodb.environments.find_one({"id": environment_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="环境不存在")
+
+
+@router.post("/live/ticket", response_model=LiveTicket)
+async def create_live_ticket(
+    environment_id: int = Query(..., description="环境ID"),
+    match_type_id: Optional[int] = Query(
+        None, description="比赛类型ID，不传时为全部比赛类型"
+    ),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    换取订阅实时统计的一次性票据
+
+    EventSource 无法设置请求头，登录用户用票据代替 token 放在 /live 的查询参数中；
+    票据只对指定的环境和比赛类型有效，使用一次或过期后失效。游客无需票据。
+    """
+    await _check_environment(environment_id)
+    await check_match_type_access(match_type_id, current_user)
+    ticket = await issue_ticket(current_user.email, environment_id, match_type_id)
+    return {"ticket": ticket, "expires_in": TICKET_TTL_SECONDS}
+
+
+@router.get("/live")
+async def subscribe_live_statistics(
+    environment_id: int = Query(..., description="环境ID"),
+    match_type_id: Optional[int] = Query(
+        None, description="比赛类型ID，不传时为全部比赛类型"
+    ),
+    ticket: Optional[str] = Query(
+        None, description="POST /live/ticket 换取的一次性票据"
+    ),
+    token: Optional[str] = Depends(oauth2_scheme),
+):
+    """
+    以 Server-Sent Events 订阅环境（及比赛类型）的实时统计
+
+    浏览器先通过 POST /live/ticket 换取票据；能设置请求头的客户端也可以直接使用
+    Authorization 头，两者都没有时按游客处理。
+
+    连接后首先收到 snapshot 事件（完整的默认参数胜率和对局矩阵），之后对局写入平息后
+    收到 delta 事件，只包含变化的 win_rates 和 matchups 条目，消失的条目为 null。
+    同一频道的所有订阅者共享一次计算。订阅期间失去访问权限时收到 revoked 事件，
+    随后连接关闭。
+    """
+    if ticket:
+        email = await redeem_ticket(ticket, environment_id, match_type_id)
+        current_user = await get_user(email) if email else None
+        if current_user is None:
+            raise HTTPException(status_code=401, detail="订阅票据无效或已过期")
+    else:
+        current_user = await get_current_user_or_guest(token)
+    await _check_environment(environment_id)
+    await check_match_type_access(match_type_id, current_user)
+
+    async def still_allowed() -> bool:
+        """订阅期间用户可能被删除或失去比赛类型的访问权限"""
+        user = current_user
+        if current_user.role != UserRole.GUEST:
+            user = await get_user(current_user.email)
+            if user is None:
+                return False
+        try:
+            await check_match_type_access(match_type_id, user)
+        except HTTPException:
+            return False
+        return True
+
+    async def generate():
+        async with live_updates.subscribe(environment_id, match_type_id) as queue:
+            checked_at = time.monotonic()
+            while True:
+                # 每个心跳间隔重新检查一次权限，失去权限时通知客户端并关闭连接
+                if time.monotonic() - checked_at >= HEARTBEAT_SECONDS:
+                    if not await still_allowed():
+                        yield "event: revoked\ndata: {}\n\n"
+                        return
+                    checked_at = time.monotonic()
+                try:
+                    event, data = await asyncio.wait_for(
+                        queue.get(), timeout=HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                payload = json.dumps(data, separators=(",", ":"))
+                yield f"event: {event}\ndata: {payload}\n\n"
 
-    return WinRateCalculationResponse(
-        calculations=calculations, sensitivity=sensitivity
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
@@ -0,0 +1,143 @@
+import asyncio
+from concurrent.futures import Executor
+from functools import partial
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from ..db.repositories import (
+    DeckRepository,
+    MatchArrays,
+    MatchResultRepository,
+    PriorRow,
+)
+from ..models.deck import Deck
+from ..models.win_rate import WinRateCalculationResponse
+from .priors import load_priors
+from .tracing import span
+from .win_rate_calculator import MatchInput, WinRateCalculator
+
+
+class InsufficientData(Exception):
+    """没有可用于计算的卡组或对局"""
+
+
+def match_query(
+    environment_id: Optional[int] = None, match_type_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """对局筛选条件，全部在数据库中完成（走 match_results 的覆盖索引）"""
+    query: Dict[str, Any] = {}
+    if environment_id is not None:
+        query["environment_id"] = environment_id
+    if match_type_id is not None:
+        query["match_type_id"] = match_type_id
+    return query
+
+
+class WinRateInputs(NamedTuple):
+    decks: List[Deck]
+    match_results: MatchArrays
+    matchup_priors: Dict[str, PriorRow]
+
+
+async def load_win_rate_inputs(
+    database: AsyncIOMotorDatabase,
+    environment_id: Optional[int] = None,
+    match_type_id: Optional[int] = None,
+) -> WinRateInputs:
+    """读取计算胜率所需的卡组、对局和先验数据，没有卡组或对局时抛出 InsufficientData"""
+    with span("db"):
+        # 获取符合条件的卡组
+        decks = await DeckRepository(database).list_decks(environment_id)
+        if not decks:
+            raise InsufficientData("No decks found")
+
+        # 只读取卡组 ID 字段，按批解码为数组，不逐条构造对象
+        match_results = await MatchResultRepository(database).fetch_deck_arrays(
+            match_query(environment_id, match_type_id)
+        )
+        if not len(match_results):
+            raise InsufficientData("No match results found")
+
+        # 获取先验数据（只读取所选环境的先验）
+        matchup_priors = await load_priors(database, environment_id)
+    return WinRateInputs(decks, match_results, matchup_priors)
+
+
+def compute_deck_statistics(
+    deck_names: Dict[int, str], match_results: MatchInput
+) -> List[Dict[str, Any]]:
+    """每个卡组的胜场、负场和胜率（百分比），同卡组对局不计入"""
+    if isinstance(match_results, MatchArrays):
+        decisive = match_results.winning_deck_id != match_results.losing_deck_id
+        winners, win_counts = np.unique(
+            match_results.winning_deck_id[decisive], return_counts=True
+        )
+        losers, loss_counts = np.unique(
+            match_results.losing_deck_id[decisive], return_counts=True
+        )
+        wins = dict(zip(winners.tolist(), win_counts.tolist()))
+        losses = dict(zip(losers.tolist(), loss_counts.tolist()))
+    else:
+        wins, losses = {}, {}
+        for match in match_results:
+            if match.winning_deck_id == match.losing_deck_id:
+                continue
+            wins[match.winning_deck_id] = wins.get(match.winning_deck_id, 0) + 1
+            losses[match.losing_deck_id] = losses.get(match.losing_deck_id, 0) + 1
+
+    statistics = []
+    for deck_id, deck_name in deck_names.items():
+        deck_wins = wins.get(deck_id, 0)
+        deck_losses = losses.get(deck_id, 0)
+        total_matches = deck_wins + deck_losses
+        win_rate = (deck_wins / total_matches * 100) if total_matches > 0 else 0
+        statistics.append(
+            {
+                "deck_id": str(deck_id),
+                "deck_name": deck_name,
+                "total_matches": total_matches,
+                "wins": deck_wins,
+                "losses": deck_losses,
+                "win_rate": round(win_rate, 2),
+            }
+        )
+    return statistics
+
+
+async def calculate_win_rates(
+    database: AsyncIOMotorDatabase,
+    sensitivity: float = 30.0,
+    prior_weight: float = 1.0,
+    environment_id: Optional[int] = None,
+    match_type_id: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> WinRateCalculationResponse:
+    """
+    读取卡组、对局和先验数据并计算胜率
+
+    传入 executor 时计算在该线程池中执行，不阻塞事件循环（后台任务使用）。
+    """
+    decks, match_results, matchup_priors = await load_win_rate_inputs(
+        database, environment_id, match_type_id
+    )
+    calculator = WinRateCalculator(sensitivity=sensitivity, prior_weight=prior_weight)
+    calculate = partial(
+        calculator.calculate_final_win_rates,
+        decks=decks,
+        match_results=match_results,
+        environment_offsets=None,
+        matchup_priors=matchup_priors,
+    )
+    with span("compute"):
+        if executor is None:
+            calculations = calculate()
+        else:
+            calculations = await asyncio.get_running_loop().run_in_executor(
+                executor, calculate
+            )
+
+    return WinRateCalculationResponse(
+        calculations=calculations, sensitivity=sensitivity
+    )
@@ -0,0 +1,79 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, Optional, TypeVar
+
+from .metrics import gauge, record_cache
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+# 所有缓存实例，用于导出缓存大小指标
+_caches = []
+
+
+class TTLCache(Generic[V]):
+    """
+    带过期时间的 LRU 缓存
+
+    缓存只在当前 worker 进程内有效，多 worker 部署时其他进程的数据最多滞后 ttl 秒。
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (过期时间, 值)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        _caches.append(self)
+
+    def get(self, key: Hashable, default: Any = None) -> Optional[V]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._data.move_to_end(key)
+                value = entry[1]
+            else:
+                if entry is not _MISSING:
+                    del self._data[key]
+                value = _MISSING
+        record_cache(self.name, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None):
+        """写入缓存，ttl 可以按条目缩短（例如不超过 token 的剩余有效期）"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def keys(self) -> list:
+        """当前所有键的快照（含尚未清理的过期条目）"""
+        with self._lock:
+            return list(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+gauge(
+    "esu_cache_entries",
+    "缓存中的条目数（含尚未清理的过期条目）",
+    ["cache"],
+    callback=lambda: [({"cache": cache.name}, len(cache)) for cache in _caches],
+)
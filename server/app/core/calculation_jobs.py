@@ -0,0 +1,286 @@
+"""
+后台胜率计算任务
+
+任务记录保存在 calculation_jobs 集合中，由创建任务的 worker 在进程内执行：
+同时执行的任务数受 jobs.max_workers 限制，计算在专用线程池中进行。
+worker 崩溃后租约过期的任务在其他 worker 启动时被接手，已算完的环境不会重算。
+结束的任务保留 jobs.result_ttl_seconds 后由 TTL 索引删除。
+"""
+
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from pymongo import ReturnDocument
+
+from ..db.mongodb import db
+from ..models.calculation_job import CalculationJobCreate, CalculationJobStatus
+from .analytics import InsufficientData, calculate_win_rates
+from .config import config
+from .logger import logger
+
+_jobs_config = config.get("jobs") or {}
+MAX_WORKERS = _jobs_config.get("max_workers", 2)
+RESULT_TTL_SECONDS = _jobs_config.get("result_ttl_seconds", 86400)
+# 每个用户同时排队或执行中的任务数上限（超级管理员不受限）
+MAX_ACTIVE_PER_USER = _jobs_config.get("max_active_per_user", 3)
+# 任务租约时长，每算完一个环境续租一次
+LEASE_SECONDS = 120
+
+_executor = ThreadPoolExecutor(
+    max_workers=MAX_WORKERS, thread_name_prefix="calculation"
+)
+# 在事件循环中首次使用时创建（Python 3.9 的 Semaphore 会绑定创建时的事件循环）
+_slots: Optional[asyncio.Semaphore] = None
+# 持有后台任务的引用，防止被垃圾回收
+_running_tasks: Set[asyncio.Task] = set()
+
+# 查询时不返回的内部字段
+_PROJECTION = {"_id": 0, "lease_expires_at": 0}
+
+
+def _jobs():
+    return db.get_collection("calculation_jobs")
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(MAX_WORKERS)
+    return _slots
+
+
+def _result_key(environment_id: Optional[int]) -> str:
+    return "all" if environment_id is None else str(environment_id)
+
+
+async def _environment_ids(spec: CalculationJobCreate) -> List[Optional[int]]:
+    if not spec.all_environments:
+        return [spec.environment_id]
+    environments = await db.environments.find({}, {"_id": 0, "id": 1}).to_list(None)
+    return sorted(environment["id"] for environment in environments)
+
+
+async def active_job_count(owner_id: str) -> int:
+    """用户排队中和执行中的任务数"""
+    return await _jobs().count_documents(
+        {
+            "owner_id": owner_id,
+            "status": {
+                "$in": [
+                    CalculationJobStatus.PENDING.value,
+                    CalculationJobStatus.RUNNING.value,
+                ]
+            },
+        }
+    )
+
+
+async def enqueue_calculation(
+    spec: CalculationJobCreate, owner_id: str
+) -> Dict[str, Any]:
+    """创建计算任务，有空闲名额时立即开始执行"""
+    now = datetime.utcnow()
+    job = {
+        "id": uuid.uuid4().hex,
+        "status": CalculationJobStatus.PENDING.value,
+        "spec": spec.model_dump(),
+        "environment_ids": await _environment_ids(spec),
+        "progress": 0,
+        "result": {},
+        "error": None,
+        "cancel_requested": False,
+        "owner_id": owner_id,
+        "lease_expires_at": None,
+        "created_at": now,
+        "updated_at": now,
+        "expires_at": None,
+    }
+    await _jobs().insert_one(job)
+    _spawn(job["id"])
+    job.pop("_id", None)
+    job.pop("lease_expires_at")
+    return job
+
+
+async def get_calculation_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """查询任务；TTL 索引的清理有延迟，已过保留期的任务同样视为不存在"""
+    return await _jobs().find_one(
+        {
+            "id": job_id,
+            "$or": [
+                {"expires_at": None},
+                {"expires_at": {"$gt": datetime.utcnow()}},
+            ],
+        },
+        _PROJECTION,
+    )
+
+
+async def cancel_calculation_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    取消任务
+
+    排队中的任务直接结束；执行中的任务标记 cancel_requested，
+    在当前环境算完后停止，不保存该环境的结果（之前已保存的结果保留）。
+    """
+    now = datetime.utcnow()
+    job = await _jobs().find_one_and_update(
+        {"id": job_id, "status": CalculationJobStatus.PENDING.value},
+        {
+            "$set": {
+                "status": CalculationJobStatus.CANCELLED.value,
+                "cancel_requested": True,
+                "updated_at": now,
+                "expires_at": now + timedelta(seconds=RESULT_TTL_SECONDS),
+            }
+        },
+        projection=_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
+    if job:
+        return job
+    return await _jobs().find_one_and_update(
+        {"id": job_id, "status": CalculationJobStatus.RUNNING.value},
+        {"$set": {"cancel_requested": True, "updated_at": now}},
+        projection=_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    ) or await get_calculation_job(job_id)
+
+
+async def resume_calculation_jobs():
+    """启动时接手未完成（或租约已过期）的任务"""
+    now = datetime.utcnow()
+    async for job in _jobs().find(
+        {
+            "$or": [
+                {"status": CalculationJobStatus.PENDING.value},
+                {
+                    "status": CalculationJobStatus.RUNNING.value,
+                    "lease_expires_at": {"$lt": now},
+                },
+            ]
+        },
+        {"id": 1},
+    ):
+        _spawn(job["id"])
+
+
+def running_jobs() -> int:
+    """当前 worker 中执行或等待名额的任务数"""
+    return len(_running_tasks)
+
+
+def _spawn(job_id: str):
+    task = asyncio.create_task(_run(job_id))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+
+
+async def _claim(job_id: str) -> Optional[Dict[str, Any]]:
+    now = datetime.utcnow()
+    return await _jobs().find_one_and_update(
+        {
+            "id": job_id,
+            "$or": [
+                {"status": CalculationJobStatus.PENDING.value},
+                {
+                    "status": CalculationJobStatus.RUNNING.value,
+                    "lease_expires_at": {"$lt": now},
+                },
+            ],
+        },
+        {
+            "$set": {
+                "status": CalculationJobStatus.RUNNING.value,
+                "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+                "updated_at": now,
+            }
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _renew(job_id: str) -> Dict[str, Any]:
+    """续租并读取最新的取消标记"""
+    now = datetime.utcnow()
+    return await _jobs().find_one_and_update(
+        {"id": job_id},
+        {
+            "$set": {
+                "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+                "updated_at": now,
+            }
+        },
+        projection={"cancel_requested": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _finish(job_id: str, status: CalculationJobStatus, **fields):
+    now = datetime.utcnow()
+    await _jobs().update_one(
+        {"id": job_id},
+        {
+            "$set": {
+                "status": status.value,
+                "lease_expires_at": None,
+                "updated_at": now,
+                "expires_at": now + timedelta(seconds=RESULT_TTL_SECONDS),
+                **fields,
+            }
+        },
+    )
+
+
+async def _run(job_id: str):
+    # 先等待名额再认领，排队期间任务保持 pending，可直接取消
+    async with _get_slots():
+        job = await _claim(job_id)
+        if not job:
+            # 已被取消、被其他 worker 接手或已结束
+            return
+
+        spec = CalculationJobCreate(**job["spec"])
+        logger.info(f"开始胜率计算任务 {job_id}")
+        try:
+            for environment_id in job["environment_ids"]:
+                key = _result_key(environment_id)
+                if key in (job.get("result") or {}):
+                    # 接手的任务跳过已算完的环境
+                    continue
+                current = await _renew(job_id)
+                if current is None:
+                    return
+                if current.get("cancel_requested"):
+                    await _finish(job_id, CalculationJobStatus.CANCELLED)
+                    logger.info(f"胜率计算任务已取消 {job_id}")
+                    return
+                try:
+                    response = await calculate_win_rates(
+                        db.analytics_db,
+                        sensitivity=spec.sensitivity,
+                        prior_weight=spec.prior_weight,
+                        environment_id=environment_id,
+                        match_type_id=spec.match_type_id,
+                        executor=_executor,
+                    )
+                    value = response.model_dump(mode="json")
+                except InsufficientData:
+                    value = None
+                # 计算期间请求了取消时不再保存结果
+                stored = await _jobs().update_one(
+                    {"id": job_id, "cancel_requested": {"$ne": True}},
+                    {"$set": {f"result.{key}": value}, "$inc": {"progress": 1}},
+                )
+                if not stored.matched_count:
+                    await _finish(job_id, CalculationJobStatus.CANCELLED)
+                    logger.info(f"胜率计算任务已取消 {job_id}")
+                    return
+            await _finish(job_id, CalculationJobStatus.COMPLETED)
+            logger.info(f"胜率计算任务完成 {job_id}")
+        except Exception as e:
+            logger.error(f"胜率计算任务失败 {job_id}: {str(e)}")
+            await _finish(job_id, CalculationJobStatus.FAILED, error=str(e))
@@ -8,7 +8,8 @@ import yaml
 def load_config():
     # 获取 server 根目录
     server_root = Path(__file__).parent.parent.parent
-    config_path = server_root / "config.yaml"
+    # ESU_CONFIG 可指定其他配置文件（例如测试）
+    config_path = Path(os.environ.get("ESU_CONFIG") or server_root / "config.yaml")
 
     if not config_path.exists():
         raise FileNotFoundError(f"配置文件不存在: {config_path}")
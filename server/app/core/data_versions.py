@@ -0,0 +1,99 @@
+"""
+按环境记录的数据版本
+
+影响统计结果的写入（对局、卡组、先验数据）都会递增所属环境的版本并标记为 dirty，
+快照调度器据此判断哪些环境需要重新计算。先验数据变更时另外递增 priors_version，
+各 worker 的先验缓存以它为键，不会读到其他 worker 修改前的数据。
+
+对局写入频繁，不在请求中直接写版本文档：data_version_marker 在本 worker 内记下
+变更的环境，后台每 flush_seconds 秒对每个环境只递增一次，避免赛事期间所有提交
+都更新同一个文档。
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Iterable, Optional, Set
+
+from ..db.mongodb import db
+from .config import config
+from .logger import logger
+
+COLLECTION = "data_versions"
+
+
+def _versions():
+    return db.get_collection(COLLECTION)
+
+
+async def bump_data_version(
+    environment_ids: Iterable[Optional[int]], priors: bool = False
+):
+    """递增各环境的数据版本；批量写入时对每个环境只调用一次"""
+    now = datetime.utcnow()
+    increments = {"version": 1, "priors_version": 1} if priors else {"version": 1}
+    for environment_id in set(environment_ids) - {None}:
+        await _versions().update_one(
+            {"environment_id": environment_id},
+            {
+                "$inc": increments,
+                "$set": {"dirty": True, "updated_at": now},
+                # 连续写入时记录第一次变更的时间，用于限制最长等待
+                "$min": {"dirty_since": now},
+            },
+            upsert=True,
+        )
+
+
+class DataVersionMarker:
+    """合并本 worker 内对局写入引起的版本递增，后台定期写入"""
+
+    def __init__(self, flush_seconds: float = 1.0):
+        self.flush_seconds = flush_seconds
+        self._pending: Set[int] = set()
+        self._worker: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls) -> "DataVersionMarker":
+        options = config.get("data_versions") or {}
+        return cls(flush_seconds=options.get("flush_seconds", 1.0))
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def mark(self, environment_ids: Iterable[Optional[int]]):
+        """记下数据有变更的环境，不等待数据库写入"""
+        self._pending.update(set(environment_ids) - {None})
+        if self._pending and (self._worker is None or self._worker.done()):
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        # 没有待写入的环境时退出，下一次 mark 时重新启动
+        while self._pending:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    async def flush(self):
+        environment_ids, self._pending = self._pending, set()
+        if not environment_ids:
+            return
+        try:
+            await bump_data_version(environment_ids)
+        except Exception as e:
+            # 放回待写入集合，下一轮重试
+            self._pending.update(environment_ids)
+            logger.error(f"更新数据版本失败: {str(e)}")
+
+    async def stop(self):
+        """停止后台任务并写入剩余的变更"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await self.flush()
+
+
+data_version_marker = DataVersionMarker.from_config()
@@ -0,0 +1,250 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from pymongo import ReturnDocument
+
+from ..db.mongodb import db
+from .data_versions import bump_data_version
+from .logger import logger
+from .priors import invalidate_priors
+from .snapshots import drop_snapshots
+
+# 每批删除的对局数，以及批次之间的停顿，避免长时间占满数据库
+BATCH_SIZE = 1000
+BATCH_PAUSE_SECONDS = 0.05
+# 任务租约时长，worker 崩溃后租约过期的任务会被其他 worker 接手
+LEASE_SECONDS = 60
+# 失败后按指数退避重试，直到删除完成；卡组已被标记删除，不能停在删除一半的状态
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+
+# 持有后台任务的引用，防止被垃圾回收
+_running_tasks: Set[asyncio.Task] = set()
+
+
+def _jobs():
+    return db.get_collection("deletion_jobs")
+
+
+def _match_fields(kind: str) -> List[str]:
+    """级联删除时按哪些字段匹配对局（任一字段等于目标 ID 即删除）"""
+    if kind == "deck":
+        return [
+            "first_deck_id",
+            "second_deck_id",
+            "winning_deck_id",
+            "losing_deck_id",
+        ]
+    if kind == "environment":
+        return ["environment_id"]
+    raise ValueError(f"未知的删除任务类型: {kind}")
+
+
+def _match_filter(kind: str, target_id: int) -> Dict[str, Any]:
+    """级联删除时需要删除的对局"""
+    return {"$or": [{field: target_id} for field in _match_fields(kind)]}
+
+
+async def _delete_target(kind: str, target_id: int):
+    """对局删除完成后删除目标本身及其先验数据"""
+    priors = db.get_collection("deck_matchup_priors")
+    if kind == "deck":
+        deck = await db.decks.find_one({"id": target_id}, {"environment_id": 1})
+        await priors.delete_many(
+            {"$or": [{"deck_a_id": target_id}, {"deck_b_id": target_id}]}
+        )
+        await db.decks.delete_one({"id": target_id})
+        invalidate_priors()
+        if deck:
+            await bump_data_version([deck.get("environment_id")], priors=True)
+    elif kind == "environment":
+        await priors.delete_many({"environment_id": target_id})
+        await db.environments.delete_one({"id": target_id})
+        invalidate_priors([target_id])
+        await drop_snapshots(target_id)
+
+
+async def enqueue_deletion(kind: str, target_id: int) -> Dict[str, Any]:
+    """创建级联删除任务并立即在后台开始执行"""
+    now = datetime.utcnow()
+    job = {
+        "id": uuid.uuid4().hex,
+        "kind": kind,
+        "target_id": target_id,
+        "status": "pending",
+        "deleted_matches": 0,
+        "total_matches": await db.match_results.count_documents(
+            _match_filter(kind, target_id)
+        ),
+        # 断点：正在处理的匹配字段及该字段下已删除的最大对局 id
+        "field": None,
+        "last_match_id": None,
+        "error": None,
+        "attempts": 0,
+        "retry_at": None,
+        "lease_expires_at": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+    await _jobs().insert_one(job)
+    _spawn(job["id"])
+    job.pop("_id", None)
+    return job
+
+
+# 任务的内部状态（租约和断点）不对外返回
+_PROJECTION = {
+    "_id": 0,
+    "lease_expires_at": 0,
+    "field": 0,
+    "last_match_id": 0,
+    "last_id": 0,
+}
+
+
+async def get_deletion_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return await _jobs().find_one({"id": job_id}, _PROJECTION)
+
+
+async def resume_deletion_jobs():
+    """启动时接手未完成（或租约已过期）的任务，等待重试的任务到时间后再执行"""
+    now = datetime.utcnow()
+    async for job in _jobs().find(
+        {
+            "$or": [
+                {"status": "pending"},
+                {"status": "running", "lease_expires_at": {"$lt": now}},
+            ]
+        },
+        {"id": 1, "retry_at": 1},
+    ):
+        retry_at = job.get("retry_at")
+        delay = (retry_at - now).total_seconds() if retry_at else 0
+        _spawn(job["id"], max(delay, 0))
+
+
+def _spawn(job_id: str, delay: float = 0):
+    task = asyncio.create_task(_run(job_id, delay))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+
+
+def _retry_delay(attempts: int) -> float:
+    return min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+async def _claim(job_id: str) -> Optional[Dict[str, Any]]:
+    now = datetime.utcnow()
+    return await _jobs().find_one_and_update(
+        {
+            "id": job_id,
+            "$or": [
+                {
+                    "status": "pending",
+                    "$or": [{"retry_at": None}, {"retry_at": {"$lte": now}}],
+                },
+                {"status": "running", "lease_expires_at": {"$lt": now}},
+            ],
+        },
+        {
+            "$set": {
+                "status": "running",
+                "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+                "updated_at": now,
+            }
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _run(job_id: str, delay: float = 0):
+    if delay:
+        await asyncio.sleep(delay)
+    job = await _claim(job_id)
+    if not job:
+        # 已被其他 worker 接手或已结束
+        return
+
+    kind, target_id = job["kind"], job["target_id"]
+    fields = _match_fields(kind)
+    logger.info(f"开始级联删除 {kind} {target_id}, 任务 {job_id}")
+
+    try:
+        # 逐个字段删除，每个字段按 id 顺序分批，走 (字段, id) 索引，不需要内存排序；
+        # 断点为当前字段和该字段下已删除的最大 id
+        start, last_match_id = 0, None
+        if job.get("field") in fields:
+            start, last_match_id = fields.index(job["field"]), job.get("last_match_id")
+        for field in fields[start:]:
+            while True:
+                batch_query: Dict[str, Any] = {field: target_id}
+                if last_match_id is not None:
+                    batch_query["id"] = {"$gt": last_match_id}
+                batch = (
+                    await db.match_results.find(batch_query, {"_id": 1, "id": 1})
+                    .sort("id", 1)
+                    .limit(BATCH_SIZE)
+                    .to_list(length=BATCH_SIZE)
+                )
+                if not batch:
+                    break
+
+                result = await db.match_results.delete_many(
+                    {"_id": {"$in": [doc["_id"] for doc in batch]}}
+                )
+                last_match_id = batch[-1].get("id", last_match_id)
+                now = datetime.utcnow()
+                await _jobs().update_one(
+                    {"id": job_id},
+                    {
+                        "$inc": {"deleted_matches": result.deleted_count},
+                        "$set": {
+                            "field": field,
+                            "last_match_id": last_match_id,
+                            "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+                            "updated_at": now,
+                        },
+                    },
+                )
+                await asyncio.sleep(BATCH_PAUSE_SECONDS)
+            last_match_id = None
+
+        await _delete_target(kind, target_id)
+        await _jobs().update_one(
+            {"id": job_id},
+            {"$set": {"status": "completed", "updated_at": datetime.utcnow()}},
+        )
+        logger.info(f"级联删除完成 {kind} {target_id}, 任务 {job_id}")
+    except Exception as e:
+        attempts = job.get("attempts", 0) + 1
+        delay = _retry_delay(attempts)
+        logger.error(
+            f"级联删除失败 {kind} {target_id}, 任务 {job_id}: {str(e)}，"
+            f"{delay:g} 秒后第 {attempts + 1} 次尝试"
+        )
+        # 回到 pending 并保留断点；worker 重启后由 resume_deletion_jobs 接手
+        now = datetime.utcnow()
+        try:
+            await _jobs().update_one(
+                {"id": job_id},
+                {
+                    "$set": {
+                        "status": "pending",
+                        "error": str(e),
+                        "attempts": attempts,
+                        "retry_at": now + timedelta(seconds=delay),
+                        "lease_expires_at": None,
+                        "updated_at": now,
+                    }
+                },
+            )
+        except Exception as update_error:
+            # 任务仍为 running，等租约过期后重新领取
+            logger.error(
+                f"更新删除任务 {job_id} 状态失败: {str(update_error)}，"
+                f"租约过期后重试"
+            )
+            delay = max(delay, LEASE_SECONDS)
+        _spawn(job_id, delay)
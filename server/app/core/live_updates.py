@@ -0,0 +1,280 @@
+"""
+按 (环境, 比赛类型) 推送的实时统计
+
+订阅者共享同一个频道：后台循环轮询订阅中环境的数据版本（data_versions），版本变化且
+写入平息 debounce 秒后（持续写入时最多等待 max_delay 秒）只计算一次胜率和对局矩阵，
+把与上一次结果不同的部分作为增量推送给该频道的所有订阅者。
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Optional, Set, Tuple
+
+import numpy as np
+
+from ..db.mongodb import db
+from ..db.repositories import MatchArrays
+from .analytics import InsufficientData, load_win_rate_inputs
+from .config import config
+from .data_versions import COLLECTION as VERSIONS_COLLECTION
+from .logger import logger
+from .snapshots import DEFAULT_PRIOR_WEIGHT, DEFAULT_SENSITIVITY
+from .win_rate_calculator import WinRateCalculator
+
+ChannelKey = Tuple[int, Optional[int]]
+# 每个订阅者最多积压的事件数，超过时丢弃积压并改为推送完整状态
+SUBSCRIBER_QUEUE_SIZE = 32
+
+
+def matchup_cells(
+    match_results: MatchArrays, hand: Optional[str] = None
+) -> Dict[str, Dict[str, int]]:
+    """
+    以 "deck_id_opponent_id" 为键的对局矩阵单元格，双向各一条
+
+    口径与 /deck-matchups 一致：同卡组对局计一次胜场，先后手都为 0 时不计入先后手
+    统计。hand 为 first 时只统计该卡组先手的对局，为 second 时统计其余对局（包括
+    没有先后手信息的对局）。
+    """
+    winner, loser = match_results.winning_deck_id, match_results.losing_deck_id
+    first, second = match_results.first_deck_id, match_results.second_deck_id
+    has_hand = (first != 0) | (second != 0)
+    # 胜者视角全部计入，负者视角排除同卡组对局
+    distinct = winner != loser
+    deck_ids = np.concatenate([winner, loser[distinct]])
+    opponent_ids = np.concatenate([loser, winner[distinct]])
+    wins = np.concatenate([np.ones(len(winner), bool), np.zeros(distinct.sum(), bool)])
+    first_hand = np.concatenate([first == winner, (first == loser)[distinct]])
+    hand_known = np.concatenate([has_hand, has_hand[distinct]])
+    on_first = hand_known & first_hand
+    on_second = hand_known & ~first_hand
+    if hand in ("first", "second"):
+        keep = on_first if hand == "first" else ~on_first
+        deck_ids, opponent_ids, wins, on_first, on_second = (
+            column[keep]
+            for column in (deck_ids, opponent_ids, wins, on_first, on_second)
+        )
+    if len(deck_ids) == 0:
+        return {}
+
+    pairs, inverse = np.unique(
+        np.stack([deck_ids, opponent_ids], axis=1), axis=0, return_inverse=True
+    )
+    inverse = inverse.ravel()
+
+    def count(mask: np.ndarray) -> list:
+        return np.bincount(inverse, weights=mask, minlength=len(pairs)).tolist()
+
+    columns = {
+        "total": np.bincount(inverse, minlength=len(pairs)).tolist(),
+        "wins": count(wins),
+        "first_hand_total": count(on_first),
+        "first_hand_wins": count(on_first & wins),
+        "second_hand_total": count(on_second),
+        "second_hand_wins": count(on_second & wins),
+    }
+    return {
+        f"{deck_id}_{opponent_id}": {
+            name: int(values[i]) for name, values in columns.items()
+        }
+        for i, (deck_id, opponent_id) in enumerate(pairs.tolist())
+    }
+
+
+def _diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """变化或新增的条目，消失的条目为 None"""
+    changed = {key: value for key, value in new.items() if old.get(key) != value}
+    changed.update({key: None for key in old.keys() - new.keys()})
+    return changed
+
+
+class _Channel:
+    def __init__(self):
+        self.subscribers: Set[asyncio.Queue] = set()
+        # 最近一次推送的状态及其数据版本，尚未计算时为 None
+        self.state: Optional[Dict[str, Any]] = None
+        self.version: Optional[int] = None
+        # 观察到版本变化但仍在等待写入平息的起始时间
+        self.pending_since: Optional[float] = None
+
+
+class LiveUpdateHub:
+    """
+    实时统计的订阅中心
+
+    只在当前 worker 内分发；数据版本保存在数据库中，其他 worker 的写入同样会被察觉。
+    """
+
+    def __init__(
+        self,
+        poll_seconds: float = 1,
+        debounce_seconds: float = 2,
+        max_delay_seconds: float = 10,
+    ):
+        self.poll_seconds = poll_seconds
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self._channels: Dict[ChannelKey, _Channel] = {}
+        # 计算在单独的线程中进行，不阻塞事件循环
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="live")
+        self._worker: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls) -> "LiveUpdateHub":
+        options = config.get("live_updates") or {}
+        return cls(
+            poll_seconds=options.get("poll_seconds", 1),
+            debounce_seconds=options.get("debounce_seconds", 2),
+            max_delay_seconds=options.get("max_delay_seconds", 10),
+        )
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(channel.subscribers) for channel in self._channels.values())
+
+    @asynccontextmanager
+    async def subscribe(
+        self, environment_id: int, match_type_id: Optional[int] = None
+    ) -> AsyncIterator[asyncio.Queue]:
+        """订阅频道，返回的队列中依次是 (事件名, 数据)；首个事件为完整状态"""
+        key = (environment_id, match_type_id)
+        channel = self._channels.setdefault(key, _Channel())
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        channel.subscribers.add(queue)
+        if channel.state is not None:
+            queue.put_nowait(("snapshot", self._snapshot_event(channel)))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        try:
+            yield queue
+        finally:
+            channel.subscribers.discard(queue)
+            if not channel.subscribers and self._channels.get(key) is channel:
+                del self._channels[key]
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def _run(self):
+        # 没有订阅者时退出，下一个订阅者到来时重新启动
+        while self._channels:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"推送实时统计失败: {str(e)}")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def run_once(self) -> int:
+        """检查所有频道，返回本轮重新计算的频道数"""
+        if not self._channels:
+            return 0
+        environment_ids = list({key[0] for key in self._channels})
+        versions = {
+            doc["environment_id"]: doc
+            async for doc in db.get_collection(VERSIONS_COLLECTION).find(
+                {"environment_id": {"$in": environment_ids}},
+                {"_id": 0, "environment_id": 1, "version": 1, "updated_at": 1},
+            )
+        }
+        computed = 0
+        for key, channel in list(self._channels.items()):
+            doc = versions.get(key[0]) or {}
+            version = doc.get("version", 0)
+            if channel.state is not None:
+                if version == channel.version or not self._settled(channel, doc):
+                    continue
+            await self._refresh(key, channel, version)
+            computed += 1
+        return computed
+
+    def _settled(self, channel: _Channel, doc: Dict[str, Any]) -> bool:
+        """写入已平息，或等待已超过 max_delay"""
+        now = time.monotonic()
+        if channel.pending_since is None:
+            channel.pending_since = now
+        if now - channel.pending_since >= self.max_delay_seconds:
+            return True
+        updated_at = doc.get("updated_at")
+        return updated_at is None or updated_at <= datetime.utcnow() - timedelta(
+            seconds=self.debounce_seconds
+        )
+
+    async def _refresh(self, key: ChannelKey, channel: _Channel, version: int):
+        state = await self._compute(*key)
+        previous = channel.state
+        channel.state, channel.version, channel.pending_since = state, version, None
+        if previous is None:
+            event = ("snapshot", self._snapshot_event(channel))
+        else:
+            event = (
+                "delta",
+                {
+                    "data_version": version,
+                    "win_rates": _diff(previous["win_rates"], state["win_rates"]),
+                    "matchups": _diff(previous["matchups"], state["matchups"]),
+                },
+            )
+            if not event[1]["win_rates"] and not event[1]["matchups"]:
+                return
+        for queue in list(channel.subscribers):
+            self._publish(channel, queue, event)
+
+    def _publish(self, channel: _Channel, queue: asyncio.Queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # 消费过慢：积压的增量已无意义，清空后只发送完整状态
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(("snapshot", self._snapshot_event(channel)))
+
+    @staticmethod
+    def _snapshot_event(channel: _Channel) -> Dict[str, Any]:
+        return {"data_version": channel.version, **channel.state}
+
+    async def _compute(
+        self, environment_id: int, match_type_id: Optional[int]
+    ) -> Dict[str, Any]:
+        try:
+            # 推送的状态标记为主节点上读到的版本，输入同样从主节点读取
+            inputs = await load_win_rate_inputs(db.db, environment_id, match_type_id)
+        except InsufficientData:
+            return {"win_rates": {}, "matchups": {}}
+        calculator = WinRateCalculator(
+            sensitivity=DEFAULT_SENSITIVITY, prior_weight=DEFAULT_PRIOR_WEIGHT
+        )
+
+        def compute():
+            calculations = calculator.calculate_final_win_rates(
+                decks=inputs.decks,
+                match_results=inputs.match_results,
+                environment_offsets=None,
+                matchup_priors=inputs.matchup_priors,
+            )
+            return {
+                "win_rates": {
+                    str(deck_id): {
+                        "average_win_rate": calculation.average_win_rate,
+                        "weighted_win_rate": calculation.weighted_win_rate,
+                    }
+                    for deck_id, calculation in calculations.items()
+                },
+                "matchups": matchup_cells(inputs.match_results),
+            }
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, compute)
+
+
+live_updates = LiveUpdateHub.from_config()
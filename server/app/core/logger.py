@@ -1,11 +1,79 @@
-import sys
 import os
+import sys
+import threading
+import time
+from typing import Dict
+
 from loguru import logger
 
-# 创建logs目录（如果不存在）
-log_dir = "logs"
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
+from .config import config
+
+# 日志配置（config.yaml 的 logging 段），未配置的项使用下面的默认值
+_logging_config = config.get("logging") or {}
+_file_config = _logging_config.get("file") or {}
+
+# 默认级别与按模块的级别，模块名按最长前缀匹配，例如 app.api.endpoints.auth: WARNING
+DEFAULT_LEVEL = _logging_config.get("level", "INFO")
+MODULE_LEVELS: Dict[str, str] = _logging_config.get("levels") or {}
+# 输出 JSON（每行一条记录，包含 extra 中的结构化字段）
+SERIALIZE = _logging_config.get("json", False)
+# 由后台线程写日志，调用方只需把记录放进队列
+ENQUEUE = _logging_config.get("enqueue", True)
+# 带 sample 标记的热点日志，每个日志点每秒最多输出的条数
+SAMPLE_RATE = (_logging_config.get("sample") or {}).get("rate_per_second", 10)
+
+_module_levels: Dict[str, int] = {}
+_sample_lock = threading.Lock()
+# 日志点 -> [当前秒, 本秒已输出条数]
+_sample_windows: Dict[tuple, list] = {}
+
+
+def _level_no(level) -> int:
+    return level if isinstance(level, int) else logger.level(level).no
+
+
+def _min_level(module: str) -> int:
+    """模块的最低输出级别，结果按模块名缓存"""
+    level = _module_levels.get(module)
+    if level is None:
+        matched = ""
+        level = _level_no(DEFAULT_LEVEL)
+        for prefix, prefix_level in MODULE_LEVELS.items():
+            if (module == prefix or module.startswith(prefix + ".")) and len(
+                prefix
+            ) > len(matched):
+                matched = prefix
+                level = _level_no(prefix_level)
+        _module_levels[module] = level
+    return level
+
+
+def _sampled(record) -> bool:
+    """同一日志点每秒只放行 SAMPLE_RATE 条，其余丢弃"""
+    key = (record["name"], record["function"], record["line"])
+    second = int(time.monotonic())
+    with _sample_lock:
+        window = _sample_windows.get(key)
+        if window is None or window[0] != second:
+            window = _sample_windows[key] = [second, 0]
+        window[1] += 1
+        return window[1] <= SAMPLE_RATE
+
+
+def _filter(record) -> bool:
+    if record["level"].no < _min_level(record["name"] or ""):
+        return False
+    if record["extra"].get("sample"):
+        # 同一条记录会经过每个处理器的过滤器，采样结果只计算一次
+        if "_sampled" not in record:
+            record["_sampled"] = _sampled(record)
+        return record["_sampled"]
+    return True
+
+
+TEXT_FORMAT = (
+    "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}"
+)
 
 # 移除默认的处理器
 logger.remove()
@@ -14,28 +82,42 @@ logger.remove()
 logger.add(
     sys.stdout,
     format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-    level="INFO",
-    colorize=True
+    level=0,
+    filter=_filter,
+    colorize=not SERIALIZE,
+    serialize=SERIALIZE,
+    enqueue=ENQUEUE,
 )
 
-# 添加文件处理器
-logger.add(
-    os.path.join(log_dir, "app.log"),
-    rotation="10 MB",  # 日志文件大小达到10MB时轮转
-    retention="1 week",  # 保留1周的日志
-    compression="zip",  # 压缩轮转的日志文件
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-    level="INFO",
-    encoding="utf-8"
-)
+if _file_config.get("enabled", True):
+    # 创建logs目录（如果不存在）
+    log_dir = _file_config.get("dir", "logs")
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
 
-# 添加错误日志文件处理器
-logger.add(
-    os.path.join(log_dir, "error.log"),
-    rotation="10 MB",
-    retention="1 week",
-    compression="zip",
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-    level="ERROR",
-    encoding="utf-8"
-) 
\ No newline at end of file
+    # 添加文件处理器
+    logger.add(
+        os.path.join(log_dir, "app.log"),
+        rotation=_file_config.get("rotation", "10 MB"),  # 日志文件大小达到10MB时轮转
+        retention=_file_config.get("retention", "1 week"),  # 保留1周的日志
+        compression="zip",  # 压缩轮转的日志文件
+        format=TEXT_FORMAT,
+        level=0,
+        filter=_filter,
+        serialize=SERIALIZE,
+        enqueue=ENQUEUE,
+        encoding="utf-8",
+    )
+
+    # 添加错误日志文件处理器
+    logger.add(
+        os.path.join(log_dir, "error.log"),
+        rotation=_file_config.get("rotation", "10 MB"),
+        retention=_file_config.get("retention", "1 week"),
+        compression="zip",
+        format=TEXT_FORMAT,
+        level="ERROR",
+        serialize=SERIALIZE,
+        enqueue=ENQUEUE,
+        encoding="utf-8",
+    )
@@ -0,0 +1,104 @@
+"""
+私有比赛类型的成员关系
+
+成员保存在 match_type_members 集合中（每个成员一条文档），不再放在 match_types
+文档的 users 数组里，大分组加入成员时不必重写整个比赛类型文档。
+"""
+
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, List
+
+from pymongo.errors import DuplicateKeyError
+
+from ..db.mongodb import db
+from .cache import TTLCache
+from .config import config
+
+COLLECTION = "match_type_members"
+
+_cache_config = (config.get("auth") or {}).get("membership_cache") or {}
+# 用户所在的私有比赛类型 id，键为用户 id。成员关系只会增加（删除比赛类型时整体删除），
+# 其他 worker 上的缓存只可能缺少新加入的分组，因此缓存命中可以直接信任，未命中的
+# 结果不缓存，而是回到数据库确认
+membership_cache: TTLCache[FrozenSet[int]] = TTLCache(
+    "match_type_memberships",
+    maxsize=_cache_config.get("max_size", 10000),
+    ttl=_cache_config.get("ttl_seconds", 60),
+)
+
+
+def _members():
+    return db.get_collection(COLLECTION)
+
+
+async def member_match_type_ids(user_id: str) -> FrozenSet[int]:
+    """
+    用户所在的全部私有比赛类型 id
+
+    优先使用缓存；其他 worker 上刚加入的分组最多在缓存过期后出现在列表中。
+    """
+    cached = membership_cache.get(user_id)
+    if cached is not None:
+        return cached
+    match_type_ids = frozenset(
+        await _members().distinct("match_type_id", {"user_id": user_id})
+    )
+    membership_cache.set(user_id, match_type_ids)
+    return match_type_ids
+
+
+async def is_member(match_type_id: int, user_id: str) -> bool:
+    cached = membership_cache.get(user_id)
+    if cached is not None and match_type_id in cached:
+        return True
+    # 缓存未命中或可能过期（在其他 worker 上刚加入分组），按唯一索引确认
+    if await _members().find_one(
+        {"match_type_id": match_type_id, "user_id": user_id}, {"_id": 1}
+    ):
+        membership_cache.invalidate(user_id)
+        return True
+    return False
+
+
+async def add_member(match_type_id: int, user_id: str) -> bool:
+    """把用户加入分组，已是成员时返回 False"""
+    try:
+        await _members().insert_one(
+            {
+                "match_type_id": match_type_id,
+                "user_id": user_id,
+                "joined_at": datetime.utcnow(),
+            }
+        )
+    except DuplicateKeyError:
+        return False
+    finally:
+        membership_cache.invalidate(user_id)
+    return True
+
+
+async def members_of(match_type_ids: Iterable[int]) -> Dict[int, List[str]]:
+    """按比赛类型分组的成员 id，一次查询取回"""
+    match_type_ids = list(match_type_ids)
+    members: Dict[int, List[str]] = {
+        match_type_id: [] for match_type_id in match_type_ids
+    }
+    if not match_type_ids:
+        return members
+    cursor = (
+        _members()
+        .find(
+            {"match_type_id": {"$in": match_type_ids}},
+            {"_id": 0, "match_type_id": 1, "user_id": 1},
+        )
+        .sort("joined_at", 1)
+    )
+    async for member in cursor:
+        members[member["match_type_id"]].append(member["user_id"])
+    return members
+
+
+async def remove_match_type(match_type_id: int):
+    """删除比赛类型时一并删除其成员关系，其他 worker 的缓存条目过期即可"""
+    await _members().delete_many({"match_type_id": match_type_id})
+    membership_cache.clear()
@@ -0,0 +1,85 @@
+"""
+卡组对局先验数据的按环境缓存
+
+先验数据文档上冗余保存了 deck_a_id 所属的 environment_id，读取时只取计算涉及的
+环境。缓存键包含环境在 data_versions 中的 priors_version，任何 worker 修改先验数据
+都会递增它，其他 worker 下次读取时即换用新键；invalidate_priors 只是提前释放本
+worker 的旧条目。
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from ..db.repositories import PriorRow, PriorRepository
+from .cache import TTLCache
+from .config import config
+from .data_versions import COLLECTION as VERSIONS_COLLECTION
+
+_cache_config = (config.get("analytics") or {}).get("prior_cache") or {}
+# 键为 (环境 id, 先验数据版本)，环境 id 为 None 表示全部环境
+prior_cache: TTLCache[Dict[str, PriorRow]] = TTLCache(
+    "matchup_priors",
+    maxsize=_cache_config.get("max_size", 256),
+    ttl=_cache_config.get("ttl_seconds", 300),
+)
+
+
+async def _priors_version(
+    database: AsyncIOMotorDatabase, environment_id: Optional[int]
+) -> Any:
+    """
+    环境当前的先验数据版本；全部环境时为各环境版本组成的元组
+
+    与先验数据从同一数据库读取，读到新版本时先验数据的写入也已可见。
+    """
+    versions = database.get_collection(VERSIONS_COLLECTION)
+    if environment_id is not None:
+        doc = await versions.find_one(
+            {"environment_id": environment_id}, {"_id": 0, "priors_version": 1}
+        )
+        return (doc or {}).get("priors_version", 0)
+    cursor = versions.find(
+        {"priors_version": {"$gt": 0}},
+        {"_id": 0, "environment_id": 1, "priors_version": 1},
+    )
+    return tuple(
+        sorted(
+            (doc["environment_id"], doc["priors_version"])
+            for doc in await cursor.to_list(length=None)
+        )
+    )
+
+
+async def load_priors(
+    database: AsyncIOMotorDatabase, environment_id: Optional[int] = None
+) -> Dict[str, PriorRow]:
+    """
+    以 "deck_a_id_deck_b_id" 为键返回环境的先验数据
+
+    返回的字典由缓存共享，调用方不能修改。
+    """
+    key: Tuple[Optional[int], Any] = (
+        environment_id,
+        await _priors_version(database, environment_id),
+    )
+    priors = prior_cache.get(key)
+    if priors is None:
+        priors = await PriorRepository(database).fetch_rows(
+            environment_id=environment_id
+        )
+        prior_cache.set(key, priors)
+    return priors
+
+
+def invalidate_priors(environment_ids: Iterable[Optional[int]] = ()):
+    """先验数据变更后调用；不传环境时清空全部缓存"""
+    environment_ids = set(environment_ids)
+    if not environment_ids:
+        prior_cache.clear()
+        return
+    # 全部环境的缓存包含任何环境的数据
+    environment_ids.add(None)
+    for key in prior_cache.keys():
+        if key[0] in environment_ids:
+            prior_cache.invalidate(key)
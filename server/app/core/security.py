@@ -1,13 +1,38 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional, TypeVar
 
 import jwt
 from passlib.context import CryptContext
 
 from .config import config
+from .logger import logger
+from .metrics import counter
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+T = TypeVar("T")
+
+# access token 过期后由前端用 refresh token 换取新的 token。有效期可以配置得更短，
+# 但不超过 15 分钟
+MAX_ACCESS_TOKEN_EXPIRE_MINUTES = 15
+_configured_expire_minutes = (config.get("jwt") or {}).get(
+    "access_token_expire_minutes", MAX_ACCESS_TOKEN_EXPIRE_MINUTES
+)
+ACCESS_TOKEN_EXPIRE_MINUTES = min(
+    _configured_expire_minutes, MAX_ACCESS_TOKEN_EXPIRE_MINUTES
+)
+if _configured_expire_minutes > MAX_ACCESS_TOKEN_EXPIRE_MINUTES:
+    logger.warning(
+        f"jwt.access_token_expire_minutes={_configured_expire_minutes} 超过上限，"
+        f"按 {MAX_ACCESS_TOKEN_EXPIRE_MINUTES} 分钟签发"
+    )
+
+PASSWORD_REJECTIONS = counter(
+    "esu_password_hashing_rejected_total", "线程池已满而被拒绝的密码哈希/校验请求数"
+)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -17,16 +42,82 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class PasswordHasherBusy(Exception):
+    """密码线程池和等待队列都已占满"""
+
+
+class PasswordHasher:
+    """
+    在专用线程池中执行 bcrypt，避免阻塞事件循环
+
+    bcrypt 计算时会释放 GIL，多个线程可以并行。执行中加排队的任务数超过
+    max_workers + max_pending 时立即拒绝，而不是让请求无限排队：
+    登录高峰时宁可让部分登录快速失败重试，也不拖慢同一 worker 上的其他请求。
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 16):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password"
+        )
+        # 只在事件循环线程中增减，不需要加锁
+        self.in_flight = 0
+
+    @classmethod
+    def from_config(cls) -> "PasswordHasher":
+        options = (config.get("auth") or {}).get("password_hashing") or {}
+        return cls(
+            max_workers=options.get("max_workers", 2),
+            max_pending=options.get("max_pending", 16),
+        )
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        if self.in_flight >= self.max_workers + self.max_pending:
+            PASSWORD_REJECTIONS.inc()
+            raise PasswordHasherBusy()
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+
+password_hasher = PasswordHasher.from_config()
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    to_encode = data.copy()
+    if expires_delta:
+        expire = datetime.utcnow() + expires_delta
+    else:
+        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(
+        to_encode, config["jwt"]["secret_key"], algorithm=config["jwt"]["algorithm"]
+    )
+    return encoded_jwt
+
+
+def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(
-            minutes=config["jwt"]["access_token_expire_minutes"]
+            days=config["jwt"].get("refresh_token_expire_days", 30)
         )
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(
-        to_encode, config["jwt"]["secret_key"], algorithm=config["jwt"]["algorithm"]
+        to_encode,
+        config["jwt"]["refresh_secret_key"],
+        algorithm=config["jwt"]["algorithm"],
     )
     return encoded_jwt
@@ -0,0 +1,334 @@
+"""
+预计算的胜率快照
+
+调度器定期检查 data_versions 中被标记为 dirty 的环境，在写入平息 debounce 秒后
+（持续写入时最多等待 max_delay 秒）按默认参数重新计算该环境整体及每个有对局的
+比赛类型的胜率和卡组战绩，写入 win_rate_snapshots。读取时直接返回最新快照，
+每个范围保留最近 history_size 个历史快照，即为梯度表的变化记录。
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import DESCENDING, ReturnDocument
+
+from ..db.mongodb import db
+from .analytics import InsufficientData, compute_deck_statistics, load_win_rate_inputs
+from .config import config
+from .data_versions import COLLECTION as VERSIONS_COLLECTION
+from .logger import logger
+from .win_rate_calculator import WinRateCalculator
+
+COLLECTION = "win_rate_snapshots"
+# 快照使用的默认参数，与 /win-rates/calculate 的默认值一致
+DEFAULT_SENSITIVITY = 30.0
+DEFAULT_PRIOR_WEIGHT = 1.0
+# 计算失败后的重试间隔上限
+RETRY_MAX_SECONDS = 3600
+
+
+def _snapshots():
+    return db.get_collection(COLLECTION)
+
+
+def _versions():
+    return db.get_collection(VERSIONS_COLLECTION)
+
+
+class SnapshotScheduler:
+    """
+    后台快照调度器
+
+    多个 worker 同时运行时，通过 data_versions 文档上的租约保证同一环境只由一个
+    worker 计算；计算期间又有新写入时版本号不一致，环境保持 dirty，并从本次计算
+    开始的时间重新计算最长等待，持续写入时每 max_delay 秒最多计算一次。计算失败时
+    按指数退避重试。
+    """
+
+    def __init__(
+        self,
+        poll_seconds: float = 10,
+        debounce_seconds: float = 30,
+        max_delay_seconds: float = 300,
+        lease_seconds: float = 300,
+        history_size: int = 100,
+    ):
+        self.poll_seconds = poll_seconds
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.lease_seconds = lease_seconds
+        self.history_size = history_size
+        # 计算在单独的线程中进行，不阻塞事件循环
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="snapshot"
+        )
+        self._worker: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls) -> "SnapshotScheduler":
+        options = config.get("snapshots") or {}
+        return cls(
+            poll_seconds=options.get("poll_seconds", 10),
+            debounce_seconds=options.get("debounce_seconds", 30),
+            max_delay_seconds=options.get("max_delay_seconds", 300),
+            lease_seconds=options.get("lease_seconds", 300),
+            history_size=options.get("history_size", 100),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self):
+        if self.running:
+            return
+        await self._track_environments()
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"胜率快照调度已启动: debounce={self.debounce_seconds:g}s, "
+            f"max_delay={self.max_delay_seconds:g}s"
+        )
+
+    async def stop(self):
+        if not self.running:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def _track_environments(self):
+        """还没有数据版本记录的环境（如升级前创建的环境）标记为 dirty，生成首个快照"""
+        tracked = set(await _versions().distinct("environment_id"))
+        now = datetime.utcnow()
+        async for environment in db.environments.find({}, {"_id": 0, "id": 1}):
+            if environment["id"] in tracked:
+                continue
+            await _versions().update_one(
+                {"environment_id": environment["id"]},
+                {
+                    "$setOnInsert": {
+                        "version": 1,
+                        "dirty": True,
+                        "updated_at": now,
+                        "dirty_since": now,
+                    }
+                },
+                upsert=True,
+            )
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"生成胜率快照失败: {str(e)}")
+            await asyncio.sleep(self.poll_seconds)
+
+    async def run_once(self) -> int:
+        """为所有到期的 dirty 环境生成快照，返回处理的环境数"""
+        processed = 0
+        while True:
+            claimed = await self._claim()
+            if claimed is None:
+                return processed
+            await self._snapshot_environment(
+                claimed["environment_id"], claimed["version"]
+            )
+            processed += 1
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return await _versions().find_one_and_update(
+            {
+                "dirty": True,
+                "$and": [
+                    {
+                        "$or": [
+                            {
+                                "updated_at": {
+                                    "$lte": now
+                                    - timedelta(seconds=self.debounce_seconds)
+                                }
+                            },
+                            {
+                                "dirty_since": {
+                                    "$lte": now
+                                    - timedelta(seconds=self.max_delay_seconds)
+                                }
+                            },
+                        ]
+                    },
+                    {
+                        "$or": [
+                            {"lease_expires_at": None},
+                            {"lease_expires_at": {"$lt": now}},
+                        ]
+                    },
+                    {"$or": [{"retry_at": None}, {"retry_at": {"$lte": now}}]},
+                ],
+            },
+            {"$set": {"lease_expires_at": now + timedelta(seconds=self.lease_seconds)}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _snapshot_environment(self, environment_id: int, version: int):
+        started = datetime.utcnow()
+        try:
+            # 环境整体（None）以及每个有对局的比赛类型。快照标记为主节点上读到的版本，
+            # 输入也必须从主节点读取，从节点可能落后于该版本
+            match_type_ids: List[Optional[int]] = [None] + sorted(
+                await db.match_results.distinct(
+                    "match_type_id", {"environment_id": environment_id}
+                )
+            )
+            for match_type_id in match_type_ids:
+                await self._snapshot_scope(environment_id, match_type_id, version)
+        except Exception:
+            await self._retry_later(environment_id)
+            raise
+        # 计算期间没有新写入时清除 dirty
+        result = await _versions().update_one(
+            {"environment_id": environment_id, "version": version},
+            {
+                "$set": {
+                    "dirty": False,
+                    "lease_expires_at": None,
+                    "retry_at": None,
+                    "failures": 0,
+                },
+                "$unset": {"dirty_since": ""},
+            },
+        )
+        if not result.matched_count:
+            # 有新写入：保持 dirty，最长等待从本次计算开始重新计时
+            await _versions().update_one(
+                {"environment_id": environment_id},
+                {
+                    "$set": {
+                        "lease_expires_at": None,
+                        "dirty_since": started,
+                        "retry_at": None,
+                        "failures": 0,
+                    }
+                },
+            )
+
+    async def _retry_later(self, environment_id: int):
+        """保持 dirty 并释放租约，按连续失败次数指数退避"""
+        doc = await _versions().find_one_and_update(
+            {"environment_id": environment_id},
+            {"$inc": {"failures": 1}, "$set": {"lease_expires_at": None}},
+            projection={"failures": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        failures = (doc or {}).get("failures", 1)
+        delay = min(
+            max(self.debounce_seconds, 1) * 2 ** (failures - 1), RETRY_MAX_SECONDS
+        )
+        await _versions().update_one(
+            {"environment_id": environment_id},
+            {"$set": {"retry_at": datetime.utcnow() + timedelta(seconds=delay)}},
+        )
+
+    async def _snapshot_scope(
+        self, environment_id: int, match_type_id: Optional[int], version: int
+    ):
+        try:
+            inputs = await load_win_rate_inputs(db.db, environment_id, match_type_id)
+        except InsufficientData:
+            return
+        calculator = WinRateCalculator(
+            sensitivity=DEFAULT_SENSITIVITY, prior_weight=DEFAULT_PRIOR_WEIGHT
+        )
+
+        def compute():
+            calculations = calculator.calculate_final_win_rates(
+                decks=inputs.decks,
+                match_results=inputs.match_results,
+                environment_offsets=None,
+                matchup_priors=inputs.matchup_priors,
+            )
+            deck_names = {deck.id: deck.name for deck in inputs.decks}
+            return calculations, compute_deck_statistics(
+                deck_names, inputs.match_results
+            )
+
+        calculations, deck_statistics = (
+            await asyncio.get_running_loop().run_in_executor(self._executor, compute)
+        )
+        await _snapshots().insert_one(
+            {
+                "environment_id": environment_id,
+                "match_type_id": match_type_id,
+                "data_version": version,
+                "computed_at": datetime.utcnow(),
+                "sensitivity": DEFAULT_SENSITIVITY,
+                "prior_weight": DEFAULT_PRIOR_WEIGHT,
+                "total_matches": len(inputs.match_results),
+                # MongoDB 文档的键必须是字符串
+                "calculations": {
+                    str(deck_id): calculation.model_dump()
+                    for deck_id, calculation in calculations.items()
+                },
+                "deck_statistics": deck_statistics,
+            }
+        )
+        await self._prune(environment_id, match_type_id)
+
+    async def _prune(self, environment_id: int, match_type_id: Optional[int]):
+        """只保留该范围最近 history_size 个快照"""
+        scope = {"environment_id": environment_id, "match_type_id": match_type_id}
+        oldest_kept = (
+            await _snapshots()
+            .find(scope, {"_id": 0, "computed_at": 1})
+            .sort("computed_at", DESCENDING)
+            .skip(self.history_size - 1)
+            .limit(1)
+            .to_list(length=1)
+        )
+        if oldest_kept:
+            await _snapshots().delete_many(
+                {**scope, "computed_at": {"$lt": oldest_kept[0]["computed_at"]}}
+            )
+
+
+snapshot_scheduler = SnapshotScheduler.from_config()
+
+
+async def latest_snapshot(
+    environment_id: int, match_type_id: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    return await _snapshots().find_one(
+        {"environment_id": environment_id, "match_type_id": match_type_id},
+        {"_id": 0},
+        sort=[("computed_at", DESCENDING)],
+    )
+
+
+async def snapshot_history(
+    environment_id: int, match_type_id: Optional[int] = None, limit: int = 20
+) -> List[Dict[str, Any]]:
+    """按时间倒序的历史快照"""
+    return (
+        await _snapshots()
+        .find(
+            {"environment_id": environment_id, "match_type_id": match_type_id},
+            {"_id": 0},
+        )
+        .sort("computed_at", DESCENDING)
+        .limit(limit)
+        .to_list(length=limit)
+    )
+
+
+async def drop_snapshots(environment_id: int):
+    """删除环境时一并删除其快照和数据版本"""
+    await _snapshots().delete_many({"environment_id": environment_id})
+    await _versions().delete_one({"environment_id": environment_id})
@@ -0,0 +1,59 @@
+"""
+实时统计订阅票据
+
+EventSource 无法设置请求头，为了不把长期有效的 access token 放进 URL（会出现在代理
+和访问日志中），登录用户先通过 POST 换取一次性票据：票据只对指定的环境和比赛类型
+有效，几十秒后过期，使用一次即删除。票据保存在数据库中，换取和订阅可以落在不同
+worker 上；库中只保存票据的 SHA-256。
+"""
+
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional
+
+from ..db.mongodb import db
+from .config import config
+
+COLLECTION = "stream_tickets"
+TICKET_TTL_SECONDS = (config.get("live_updates") or {}).get("ticket_seconds", 30)
+
+
+def _tickets():
+    return db.get_collection(COLLECTION)
+
+
+def _digest(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+
+async def issue_ticket(
+    email: str, environment_id: int, match_type_id: Optional[int] = None
+) -> str:
+    """为用户签发订阅 (环境, 比赛类型) 的一次性票据"""
+    ticket = secrets.token_urlsafe(32)
+    await _tickets().insert_one(
+        {
+            "ticket": _digest(ticket),
+            "email": email,
+            "environment_id": environment_id,
+            "match_type_id": match_type_id,
+            "expires_at": datetime.utcnow() + timedelta(seconds=TICKET_TTL_SECONDS),
+        }
+    )
+    return ticket
+
+
+async def redeem_ticket(
+    ticket: str, environment_id: int, match_type_id: Optional[int] = None
+) -> Optional[str]:
+    """使用票据，返回签发时的用户邮箱；票据无效、过期或范围不符时返回 None"""
+    doc = await _tickets().find_one_and_delete(
+        {
+            "ticket": _digest(ticket),
+            "environment_id": environment_id,
+            "match_type_id": match_type_id,
+            "expires_at": {"$gt": datetime.utcnow()},
+        }
+    )
+    return doc["email"] if doc else None
@@ -0,0 +1,74 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from .config import config
+
+
+class RequestTrace:
+    """单个请求内各阶段（db、compute、validate、serialize 等）的耗时"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, float] = {}
+
+    def add(self, name: str, duration: float):
+        self.spans[name] = self.spans.get(name, 0.0) + duration
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar(
+    "request_trace", default=None
+)
+
+
+def _tracing_config() -> dict:
+    return config.get("tracing") or {}
+
+
+def begin_trace() -> RequestTrace:
+    trace = RequestTrace()
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """
+    记录一段代码的耗时，计入当前请求的同名阶段
+
+    同名阶段多次出现时累加；不在请求上下文中（如后台任务）时不做任何事。
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, time.perf_counter() - started)
+
+
+def slow_request_seconds() -> float:
+    return _tracing_config().get("slow_request_ms", 1000) / 1000
+
+
+def server_timing_enabled() -> bool:
+    return _tracing_config().get("server_timing", False)
+
+
+def server_timing_header(trace: RequestTrace, extra: Dict[str, float] = None) -> str:
+    """生成 Server-Timing 响应头，浏览器开发者工具的 Timing 面板可直接显示"""
+    spans = {**trace.spans, **(extra or {}), "total": trace.elapsed}
+    return ", ".join(
+        f"{name};dur={duration * 1000:.1f}" for name, duration in spans.items()
+    )
@@ -1,11 +1,74 @@
-from typing import Dict, List, Optional
+import time
+from typing import Dict, List, Optional, Sequence, Union
 
 import numpy as np
 
+from ..db.repositories import MatchArrays
 from ..models.deck import Deck
 from ..models.match_result import MatchResult
 from ..models.win_rate import WinRateCalculation
 from ..models.prior_knowledge import DeckMatchupPrior
+from .metrics import CALCULATOR_DECKS, CALCULATOR_ITERATIONS, CALCULATOR_SOLVE_DURATION
+
+# 对局可以是逐条的对象（MatchResult、MatchRow），也可以是按列存放的卡组 ID 数组
+MatchInput = Union[Sequence[MatchResult], MatchArrays]
+# 卡组 -> 对手 -> {"wins": 胜场, "total": 总场}
+OpponentStats = Dict[int, Dict[int, Dict[str, int]]]
+
+
+def _tally_rows(match_results: Sequence[MatchResult]) -> OpponentStats:
+    tallies: OpponentStats = {}
+    for match in match_results:
+        sides = [(match.first_deck_id, match.second_deck_id)]
+        # 同卡组对局只计一次
+        if match.second_deck_id != match.first_deck_id:
+            sides.append((match.second_deck_id, match.first_deck_id))
+        for deck_id, opponent_id in sides:
+            stats = tallies.setdefault(deck_id, {}).setdefault(
+                opponent_id, {"wins": 0, "total": 0}
+            )
+            stats["total"] += 1
+            if match.winning_deck_id == deck_id:
+                stats["wins"] += 1
+    return tallies
+
+
+def _tally_arrays(matches: MatchArrays) -> OpponentStats:
+    first, second = matches.first_deck_id, matches.second_deck_id
+    # 同卡组对局只计一次
+    distinct = first != second
+    deck_ids = np.concatenate([first, second[distinct]])
+    opponent_ids = np.concatenate([second, first[distinct]])
+    wins = np.concatenate(
+        [
+            matches.winning_deck_id == first,
+            (matches.winning_deck_id == second)[distinct],
+        ]
+    )
+    if len(deck_ids) == 0:
+        return {}
+    pairs, inverse = np.unique(
+        np.stack([deck_ids, opponent_ids], axis=1), axis=0, return_inverse=True
+    )
+    inverse = inverse.ravel()
+    totals = np.bincount(inverse, minlength=len(pairs))
+    win_counts = np.bincount(inverse, weights=wins, minlength=len(pairs))
+    tallies: OpponentStats = {}
+    for (deck_id, opponent_id), total, win_count in zip(
+        pairs.tolist(), totals.tolist(), win_counts.tolist()
+    ):
+        tallies.setdefault(deck_id, {})[opponent_id] = {
+            "wins": int(win_count),
+            "total": total,
+        }
+    return tallies
+
+
+def tally_opponents(match_results: MatchInput) -> OpponentStats:
+    """按卡组和对手统计胜场与总场，对局只遍历一次"""
+    if isinstance(match_results, MatchArrays):
+        return _tally_arrays(match_results)
+    return _tally_rows(match_results)
 
 
 class WinRateCalculator:
@@ -16,31 +79,19 @@ class WinRateCalculator:
         self.prior_weight = prior_weight
 
     def calculate_average_win_rate(
-        self, deck_id: int, match_results: List[MatchResult], matchup_priors: Dict[str, DeckMatchupPrior]
+        self, deck_id: int, match_results: MatchInput, matchup_priors: Dict[str, DeckMatchupPrior]
     ) -> float:
         """计算卡组的平均胜率，考虑先验数据"""
-        total_win_rate = 0
-        count = 0
-
-        # 按对手卡组分组统计
-        opponent_stats = {}
-        for match in match_results:
-            if match.first_deck_id == deck_id:
-                opponent_id = match.second_deck_id
-                is_win = match.winning_deck_id == deck_id
-            elif match.second_deck_id == deck_id:
-                opponent_id = match.first_deck_id
-                is_win = match.winning_deck_id == deck_id
-            else:
-                continue
-
-            if opponent_id not in opponent_stats:
-                opponent_stats[opponent_id] = {"wins": 0, "total": 0}
-
-            opponent_stats[opponent_id]["total"] += 1
-            if is_win:
-                opponent_stats[opponent_id]["wins"] += 1
+        return self._average_win_rate(
+            tally_opponents(match_results).get(deck_id, {}), deck_id, matchup_priors
+        )
 
+    def _average_win_rate(
+        self,
+        opponent_stats: Dict[int, Dict[str, int]],
+        deck_id: int,
+        matchup_priors: Dict[str, DeckMatchupPrior],
+    ) -> float:
         # 计算加权平均胜率，考虑先验数据
         total_weight = 0
         weighted_sum = 0
@@ -77,34 +128,31 @@ class WinRateCalculator:
     def calculate_weighted_win_rate(
         self,
         deck_id: int,
-        match_results: List[MatchResult],
+        match_results: MatchInput,
         previous_win_rates: Dict[int, float],
         environment_offsets: Optional[Dict[int, float]] = None,
         matchup_priors: Optional[Dict[str, DeckMatchupPrior]] = None,
     ) -> float:
         """计算卡组的加权胜率"""
+        return self._weighted_win_rate(
+            tally_opponents(match_results).get(deck_id, {}),
+            deck_id,
+            previous_win_rates,
+            environment_offsets,
+            matchup_priors,
+        )
+
+    def _weighted_win_rate(
+        self,
+        opponent_stats: Dict[int, Dict[str, int]],
+        deck_id: int,
+        previous_win_rates: Dict[int, float],
+        environment_offsets: Optional[Dict[int, float]] = None,
+        matchup_priors: Optional[Dict[str, DeckMatchupPrior]] = None,
+    ) -> float:
         total_weight = 0
         weighted_sum = 0
 
-        # 按对手卡组分组统计
-        opponent_stats = {}
-        for match in match_results:
-            if match.first_deck_id == deck_id:
-                opponent_id = match.second_deck_id
-                is_win = match.winning_deck_id == deck_id
-            elif match.second_deck_id == deck_id:
-                opponent_id = match.first_deck_id
-                is_win = match.winning_deck_id == deck_id
-            else:
-                continue
-
-            if opponent_id not in opponent_stats:
-                opponent_stats[opponent_id] = {"wins": 0, "total": 0}
-
-            opponent_stats[opponent_id]["total"] += 1
-            if is_win:
-                opponent_stats[opponent_id]["wins"] += 1
-
         # 获取所有可能的对手卡组ID
         all_opponent_ids = set(previous_win_rates.keys())
         
@@ -162,14 +210,19 @@ class WinRateCalculator:
     def calculate_final_win_rates(
         self,
         decks: List[Deck],
-        match_results: List[MatchResult],
+        match_results: MatchInput,
         environment_offsets: Optional[Dict[int, float]] = None,
         matchup_priors: Optional[Dict[str, DeckMatchupPrior]] = None,
     ) -> Dict[int, WinRateCalculation]:
         """计算所有卡组的最终胜率"""
+        started = time.perf_counter()
+        # 对局只统计一次，之后每轮迭代只读取统计结果
+        tallies = tally_opponents(match_results)
         # 计算初始平均胜率
         initial_win_rates = {
-            deck.id: self.calculate_average_win_rate(deck.id, match_results, matchup_priors or {})
+            deck.id: self._average_win_rate(
+                tallies.get(deck.id, {}), deck.id, matchup_priors or {}
+            )
             for deck in decks
         }
 
@@ -177,12 +230,18 @@ class WinRateCalculator:
         max_iterations = 100
         convergence_threshold = 0.01
 
+        iterations = 0
         for _ in range(max_iterations):
+            iterations += 1
             new_win_rates = {}
 
             for deck in decks:
-                raw_new_rate = self.calculate_weighted_win_rate(
-                    deck.id, match_results, current_win_rates, environment_offsets, matchup_priors
+                raw_new_rate = self._weighted_win_rate(
+                    tallies.get(deck.id, {}),
+                    deck.id,
+                    current_win_rates,
+                    environment_offsets,
+                    matchup_priors,
                 )
                 new_win_rates[deck.id] = current_win_rates[
                     deck.id
@@ -199,6 +258,10 @@ class WinRateCalculator:
 
             current_win_rates = new_win_rates
 
+        CALCULATOR_ITERATIONS.observe(iterations)
+        CALCULATOR_SOLVE_DURATION.observe(time.perf_counter() - started)
+        CALCULATOR_DECKS.observe(len(decks))
+
         # 构建返回结果
         return {
             deck.id: WinRateCalculation(
@@ -0,0 +1,39 @@
+"""
+存储后端
+
+MongoDB 类只依赖客户端的 client[database] 以及 Motor 风格的数据库/集合接口，
+具体实现由 mongodb.backend 选择：
+
+- motor：连接真实的 MongoDB（默认）
+- memory：进程内实现，用于测试、基准测试和不依赖数据库的单机压测
+"""
+
+from typing import Any, Callable, Dict
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from .memory import MemoryClient
+
+
+def _create_motor_client(uri: str, **options) -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(uri, **options)
+
+
+def _create_memory_client(uri: str, **options) -> MemoryClient:
+    # 内存后端不使用连接串、连接池和事件监听器
+    return MemoryClient()
+
+
+BACKENDS: Dict[str, Callable[..., Any]] = {
+    "motor": _create_motor_client,
+    "memory": _create_memory_client,
+}
+
+
+def create_client(backend: str, uri: str, **options):
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的存储后端: {backend}")
+    return BACKENDS[backend](uri, **options)
+
+
+__all__ = ["BACKENDS", "MemoryClient", "create_client"]
@@ -0,0 +1,1090 @@
+"""
+进程内存储后端
+
+实现了本项目用到的 Motor 接口子集（查询、聚合、插入、更新、删除、索引），
+不依赖 MongoDB 服务，供测试、基准测试和单机压测使用。数据只保存在当前进程中。
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId, encode
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError
+from pymongo.operations import (
+    DeleteMany,
+    DeleteOne,
+    InsertOne,
+    ReplaceOne,
+    UpdateMany,
+    UpdateOne,
+)
+
+_MISSING = object()
+
+
+def _clone(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _clone(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_clone(item) for item in value]
+    return value
+
+
+def _get_path(document: Dict[str, Any], path: str) -> Any:
+    value: Any = document
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _set_path(document: Dict[str, Any], path: str, value: Any):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.setdefault(part, {})
+    document[parts[-1]] = value
+
+
+def _unset_path(document: Dict[str, Any], path: str):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(parts[-1], None)
+
+
+# ---------------------------------------------------------------- 查询匹配
+
+
+def _values_equal(value: Any, expected: Any) -> bool:
+    if value is _MISSING:
+        return expected is None
+    if isinstance(value, list) and not isinstance(expected, list):
+        return any(_values_equal(item, expected) for item in value)
+    return value == expected
+
+
+def _compare(value: Any, expected: Any, operator: str) -> bool:
+    if value is _MISSING or value is None or expected is None:
+        return False
+    if isinstance(value, list):
+        return any(_compare(item, expected, operator) for item in value)
+    try:
+        if operator == "$gt":
+            return value > expected
+        if operator == "$gte":
+            return value >= expected
+        if operator == "$lt":
+            return value < expected
+        return value <= expected
+    except TypeError:
+        return False
+
+
+def _match_operators(value: Any, condition: Dict[str, Any]) -> bool:
+    for operator, expected in condition.items():
+        if operator == "$eq":
+            matched = _values_equal(value, expected)
+        elif operator == "$ne":
+            matched = not _values_equal(value, expected)
+        elif operator in ("$gt", "$gte", "$lt", "$lte"):
+            matched = _compare(value, expected, operator)
+        elif operator == "$in":
+            matched = any(_values_equal(value, item) for item in expected)
+        elif operator == "$nin":
+            matched = not any(_values_equal(value, item) for item in expected)
+        elif operator == "$exists":
+            matched = (value is not _MISSING) == bool(expected)
+        elif operator == "$all":
+            matched = isinstance(value, list) and all(
+                item in value for item in expected
+            )
+        elif operator == "$size":
+            matched = isinstance(value, list) and len(value) == expected
+        elif operator == "$not":
+            matched = not _match_operators(value, expected)
+        elif operator == "$regex":
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            matched = isinstance(value, str) and re.search(expected, value, flags)
+        elif operator == "$options":
+            continue
+        elif operator == "$elemMatch":
+            matched = isinstance(value, list) and any(
+                (
+                    matches(item, expected)
+                    if isinstance(item, dict)
+                    else _match_operators(item, expected)
+                )
+                for item in value
+            )
+        else:
+            raise NotImplementedError(f"内存后端不支持查询运算符 {operator}")
+        if not matched:
+            return False
+    return True
+
+
+def _is_operator_dict(value: Any) -> bool:
+    return (
+        isinstance(value, dict) and value and all(key.startswith("$") for key in value)
+    )
+
+
+def _match_text(document: Dict[str, Any], search: str) -> bool:
+    """$text 的简化实现：任一检索词出现在任一字符串字段中即视为匹配"""
+    terms = [term.lower() for term in search.split() if term]
+    text = " ".join(
+        value.lower() for value in document.values() if isinstance(value, str)
+    )
+    return any(term in text for term in terms)
+
+
+def matches(document: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    if not query:
+        return True
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(document, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(document, part) for part in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, part) for part in condition):
+                return False
+        elif key == "$text":
+            if not _match_text(document, condition["$search"]):
+                return False
+        elif key.startswith("$"):
+            raise NotImplementedError(f"内存后端不支持查询运算符 {key}")
+        else:
+            value = _get_path(document, key)
+            if _is_operator_dict(condition):
+                if not _match_operators(value, condition):
+                    return False
+            elif not _values_equal(value, condition):
+                return False
+    return True
+
+
+# ---------------------------------------------------------------- 投影与排序
+
+
+def project(
+    document: Dict[str, Any], projection: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    if not projection:
+        return _clone(document)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = bool(projection.get("_id", 1))
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    if fields and all(value for value in fields.values()):
+        result = {}
+        if include_id and "_id" in document:
+            result["_id"] = document["_id"]
+        for field in fields:
+            value = _get_path(document, field)
+            if value is not _MISSING:
+                _set_path(result, field, _clone(value))
+        return result
+    result = _clone(document)
+    for field, value in fields.items():
+        if not value:
+            _unset_path(result, field)
+    if not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def _normalize_sort(key_or_list: Any, direction: Optional[int] = None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return list(key_or_list)
+
+
+def _sort_key(value: Any) -> Tuple:
+    # 与 MongoDB 的跨类型排序大致一致：缺失/None < 数字 < 字符串 < 其他
+    if value is _MISSING or value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (5, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, ObjectId):
+        return (3, value.binary)
+    if isinstance(value, datetime):
+        return (4, value)
+    return (6, str(value))
+
+
+def sort_documents(documents: List[Dict[str, Any]], spec) -> List[Dict[str, Any]]:
+    for field, direction in reversed(spec):
+        documents.sort(
+            key=lambda document: _sort_key(_get_path(document, field)),
+            reverse=direction == -1,
+        )
+    return documents
+
+
+# ---------------------------------------------------------------- 更新
+
+
+def _apply_update(
+    document: Dict[str, Any], update: Dict[str, Any], inserting: bool = False
+) -> Dict[str, Any]:
+    if update and not any(key.startswith("$") for key in update):
+        # 整体替换
+        replacement = _clone(update)
+        if "_id" in document:
+            replacement["_id"] = document["_id"]
+        return replacement
+
+    for operator, fields in update.items():
+        if operator == "$setOnInsert":
+            if not inserting:
+                continue
+            for path, value in fields.items():
+                _set_path(document, path, _clone(value))
+        elif operator == "$set":
+            for path, value in fields.items():
+                _set_path(document, path, _clone(value))
+        elif operator == "$unset":
+            for path in fields:
+                _unset_path(document, path)
+        elif operator == "$inc":
+            for path, value in fields.items():
+                current = _get_path(document, path)
+                _set_path(
+                    document, path, (0 if current is _MISSING else current) + value
+                )
+        elif operator in ("$max", "$min"):
+            for path, value in fields.items():
+                current = _get_path(document, path)
+                if (
+                    current is _MISSING
+                    or (operator == "$max" and value > current)
+                    or (operator == "$min" and value < current)
+                ):
+                    _set_path(document, path, value)
+        elif operator in ("$addToSet", "$push"):
+            for path, value in fields.items():
+                current = _get_path(document, path)
+                items = current if isinstance(current, list) else []
+                values = (
+                    value["$each"]
+                    if isinstance(value, dict) and "$each" in value
+                    else [value]
+                )
+                for item in values:
+                    if operator == "$push" or item not in items:
+                        items.append(_clone(item))
+                _set_path(document, path, items)
+        elif operator == "$pull":
+            for path, value in fields.items():
+                current = _get_path(document, path)
+                if isinstance(current, list):
+                    _set_path(
+                        document,
+                        path,
+                        [
+                            item
+                            for item in current
+                            if not (
+                                _match_operators(item, value)
+                                if _is_operator_dict(value)
+                                else item == value
+                            )
+                        ],
+                    )
+        elif operator == "$currentDate":
+            for path in fields:
+                _set_path(document, path, datetime.utcnow())
+        else:
+            raise NotImplementedError(f"内存后端不支持更新运算符 {operator}")
+    return document
+
+
+def _upsert_seed(query: Dict[str, Any]) -> Dict[str, Any]:
+    """upsert 时从查询条件中提取等值字段作为新文档的初始内容"""
+    seed: Dict[str, Any] = {}
+    for key, value in (query or {}).items():
+        if key == "$and":
+            for part in value:
+                seed.update(_upsert_seed(part))
+        elif key.startswith("$"):
+            continue
+        elif _is_operator_dict(value):
+            if "$eq" in value:
+                _set_path(seed, key, _clone(value["$eq"]))
+        else:
+            _set_path(seed, key, _clone(value))
+    return seed
+
+
+# ---------------------------------------------------------------- 结果对象
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+        self.acknowledged = True
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+        self.acknowledged = True
+
+
+class UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+        self.acknowledged = True
+
+
+class DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+        self.acknowledged = True
+
+
+class BulkWriteResult:
+    def __init__(self):
+        self.inserted_count = 0
+        self.matched_count = 0
+        self.modified_count = 0
+        self.deleted_count = 0
+        self.upserted_count = 0
+        self.upserted_ids: Dict[int, Any] = {}
+        self.acknowledged = True
+
+
+# ---------------------------------------------------------------- 游标
+
+
+class MemoryCursor:
+    def __init__(self, collection: "MemoryCollection", query, projection, raw=False):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._batch_size = 101
+        self._raw = raw
+        self._results: Optional[List[Dict[str, Any]]] = None
+        self._position = 0
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int):
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int):
+        self._batch_size = batch_size or 101
+        return self
+
+    def _evaluate(self) -> List[Dict[str, Any]]:
+        if self._results is None:
+            documents = [
+                document
+                for document in self._collection._documents.values()
+                if matches(document, self._query)
+            ]
+            if self._sort:
+                documents = sort_documents(documents, self._sort)
+            documents = documents[self._skip :]
+            if self._limit:
+                documents = documents[: self._limit]
+            self._results = [
+                project(document, self._projection) for document in documents
+            ]
+        return self._results
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        results = self._evaluate()
+        if length is None:
+            batch = results[self._position :]
+        else:
+            batch = results[self._position : self._position + length]
+        self._position += len(batch)
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        results = self._evaluate()
+        if self._raw:
+            if self._position >= len(results):
+                raise StopAsyncIteration
+            batch = results[self._position : self._position + self._batch_size]
+            self._position += len(batch)
+            return b"".join(encode(document) for document in batch)
+        if self._position >= len(results):
+            raise StopAsyncIteration
+        document = results[self._position]
+        self._position += 1
+        return document
+
+    async def close(self):
+        self._results = []
+
+
+class MemoryCommandCursor:
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self._documents = documents
+        self._position = 0
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        end = None if length is None else self._position + length
+        batch = self._documents[self._position : end]
+        self._position += len(batch)
+        return batch
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._position >= len(self._documents):
+            raise StopAsyncIteration
+        document = self._documents[self._position]
+        self._position += 1
+        return document
+
+    async def close(self):
+        self._position = len(self._documents)
+
+
+# ---------------------------------------------------------------- 聚合
+
+
+def _evaluate_expression(document: Dict[str, Any], expression: Any) -> Any:
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get_path(document, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, dict):
+        if len(expression) == 1:
+            operator, arguments = next(iter(expression.items()))
+            if operator.startswith("$"):
+                return _evaluate_operator(document, operator, arguments)
+        return {
+            key: _evaluate_expression(document, value)
+            for key, value in expression.items()
+        }
+    if isinstance(expression, list):
+        return [_evaluate_expression(document, item) for item in expression]
+    return expression
+
+
+def _evaluate_operator(document: Dict[str, Any], operator: str, arguments: Any) -> Any:
+    if not isinstance(arguments, list):
+        arguments = [arguments]
+    values = [_evaluate_expression(document, argument) for argument in arguments]
+    if operator == "$eq":
+        return values[0] == values[1]
+    if operator == "$ne":
+        return values[0] != values[1]
+    if operator == "$cond":
+        condition, if_true, if_false = values
+        return if_true if condition else if_false
+    if operator == "$add":
+        return sum(values)
+    if operator == "$subtract":
+        return values[0] - values[1]
+    if operator == "$multiply":
+        result = 1
+        for value in values:
+            result *= value
+        return result
+    if operator == "$divide":
+        return values[0] / values[1]
+    if operator == "$ifNull":
+        return values[0] if values[0] is not None else values[1]
+    if operator == "$in":
+        return values[0] in values[1]
+    if operator == "$and":
+        return all(values)
+    if operator == "$or":
+        return any(values)
+    raise NotImplementedError(f"内存后端不支持聚合表达式 {operator}")
+
+
+def _group(documents: List[Dict[str, Any]], spec: Dict[str, Any]):
+    groups: Dict[Any, Dict[str, Any]] = {}
+    accumulators = {key: value for key, value in spec.items() if key != "_id"}
+    for document in documents:
+        group_id = _evaluate_expression(document, spec["_id"])
+        key = repr(group_id)
+        if key not in groups:
+            groups[key] = {"_id": group_id}
+            for field, accumulator in accumulators.items():
+                operator = next(iter(accumulator))
+                groups[key][field] = (
+                    [] if operator in ("$push", "$addToSet", "$avg") else _MISSING
+                )
+        group = groups[key]
+        for field, accumulator in accumulators.items():
+            operator, expression = next(iter(accumulator.items()))
+            value = _evaluate_expression(document, expression)
+            current = group[field]
+            if operator == "$sum":
+                group[field] = (0 if current is _MISSING else current) + (
+                    value if isinstance(value, (int, float)) else 0
+                )
+            elif operator in ("$push", "$avg"):
+                current.append(value)
+            elif operator == "$addToSet":
+                if value not in current:
+                    current.append(value)
+            elif operator == "$first":
+                if current is _MISSING:
+                    group[field] = value
+            elif operator == "$last":
+                group[field] = value
+            elif operator == "$min":
+                if current is _MISSING or (value is not None and value < current):
+                    group[field] = value
+            elif operator == "$max":
+                if current is _MISSING or (value is not None and value > current):
+                    group[field] = value
+            else:
+                raise NotImplementedError(f"内存后端不支持聚合累加器 {operator}")
+    results = []
+    for group in groups.values():
+        for field, accumulator in accumulators.items():
+            operator = next(iter(accumulator))
+            if operator == "$avg":
+                numbers = [value for value in group[field] if value is not None]
+                group[field] = sum(numbers) / len(numbers) if numbers else None
+            elif group[field] is _MISSING:
+                group[field] = None
+        results.append(group)
+    return results
+
+
+def run_pipeline(
+    documents: List[Dict[str, Any]], pipeline: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    for stage in pipeline:
+        operator, argument = next(iter(stage.items()))
+        if operator == "$match":
+            documents = [
+                document for document in documents if matches(document, argument)
+            ]
+        elif operator == "$project":
+            computed = {
+                key: value
+                for key, value in argument.items()
+                if not isinstance(value, (int, bool))
+            }
+            plain = {
+                key: value
+                for key, value in argument.items()
+                if isinstance(value, (int, bool))
+            }
+            projected = []
+            for document in documents:
+                result = project(document, plain) if plain else {}
+                if not plain and argument.get("_id", 1) and "_id" in document:
+                    result["_id"] = document["_id"]
+                for key, expression in computed.items():
+                    result[key] = _evaluate_expression(document, expression)
+                projected.append(result)
+            documents = projected
+        elif operator == "$addFields" or operator == "$set":
+            for document in documents:
+                for key, expression in argument.items():
+                    _set_path(document, key, _evaluate_expression(document, expression))
+        elif operator == "$group":
+            documents = _group(documents, argument)
+        elif operator == "$sort":
+            documents = sort_documents(documents, _normalize_sort(argument))
+        elif operator == "$skip":
+            documents = documents[argument:]
+        elif operator == "$limit":
+            documents = documents[:argument]
+        elif operator == "$count":
+            documents = [{argument: len(documents)}] if documents else []
+        elif operator == "$unwind":
+            path = argument if isinstance(argument, str) else argument["path"]
+            field = path[1:]
+            unwound = []
+            for document in documents:
+                values = _get_path(document, field)
+                if not isinstance(values, list):
+                    continue
+                for value in values:
+                    item = _clone(document)
+                    _set_path(item, field, value)
+                    unwound.append(item)
+            documents = unwound
+        else:
+            raise NotImplementedError(f"内存后端不支持聚合阶段 {operator}")
+    return documents
+
+
+# ---------------------------------------------------------------- 集合
+
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self._documents: Dict[Any, Dict[str, Any]] = {}
+        # 索引名 -> 索引定义；唯一索引另维护 键值 -> _id 的映射
+        self._indexes: Dict[str, Dict[str, Any]] = {
+            "_id_": {"name": "_id_", "key": {"_id": 1}, "v": 2}
+        }
+        self._unique_values: Dict[str, Dict[Tuple, Any]] = {}
+
+    def with_options(self, **kwargs) -> "MemoryCollection":
+        return self
+
+    # ------------------------------------------------------------ 索引
+
+    async def create_index(self, keys, **kwargs) -> str:
+        from pymongo import IndexModel
+
+        return (await self.create_indexes([IndexModel(keys, **kwargs)]))[0]
+
+    async def create_indexes(self, models: Iterable[Any]) -> List[str]:
+        self.database._mark_created(self.name)
+        names = []
+        for model in models:
+            document = dict(model.document)
+            name = document["name"]
+            if name not in self._indexes:
+                self._indexes[name] = {"v": 2, **document, "key": dict(document["key"])}
+                if document.get("unique"):
+                    values: Dict[Tuple, Any] = {}
+                    for stored in self._documents.values():
+                        key = self._index_key(name, stored)
+                        if key is None:
+                            continue
+                        if key in values:
+                            del self._indexes[name]
+                            raise DuplicateKeyError(f"E11000 duplicate key: {name}")
+                        values[key] = stored["_id"]
+                    self._unique_values[name] = values
+            names.append(name)
+        return names
+
+    async def drop_index(self, name: str):
+        self._indexes.pop(name, None)
+        self._unique_values.pop(name, None)
+
+    def list_indexes(self) -> MemoryCommandCursor:
+        return MemoryCommandCursor([_clone(index) for index in self._indexes.values()])
+
+    async def index_information(self) -> Dict[str, Any]:
+        return {
+            name: {"key": list(index["key"].items())}
+            for name, index in self._indexes.items()
+        }
+
+    def _index_key(self, name: str, document: Dict[str, Any]) -> Optional[Tuple]:
+        index = self._indexes[name]
+        values = tuple(_get_path(document, field) for field in index["key"])
+        if index.get("sparse") and all(value is _MISSING for value in values):
+            return None
+        return tuple(None if value is _MISSING else repr(value) for value in values)
+
+    def _check_unique(self, document: Dict[str, Any], previous_id: Any = _MISSING):
+        for name, values in self._unique_values.items():
+            key = self._index_key(name, document)
+            if key is None:
+                continue
+            owner = values.get(key, _MISSING)
+            if owner is not _MISSING and owner != previous_id:
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.name} index: {name}"
+                )
+
+    def _store(
+        self, document: Dict[str, Any], previous: Optional[Dict[str, Any]] = None
+    ):
+        if previous is not None:
+            for name, values in self._unique_values.items():
+                key = self._index_key(name, previous)
+                if key is not None:
+                    values.pop(key, None)
+        self._documents[document["_id"]] = document
+        for name, values in self._unique_values.items():
+            key = self._index_key(name, document)
+            if key is not None:
+                values[key] = document["_id"]
+
+    def _remove(self, document: Dict[str, Any]):
+        for name, values in self._unique_values.items():
+            key = self._index_key(name, document)
+            if key is not None:
+                values.pop(key, None)
+        del self._documents[document["_id"]]
+
+    # ------------------------------------------------------------ 读
+
+    def find(self, filter=None, projection=None, sort=None, skip=0, limit=0, **kwargs):
+        cursor = MemoryCursor(self, filter, projection)
+        if sort:
+            cursor.sort(sort)
+        if skip:
+            cursor.skip(skip)
+        if limit:
+            cursor.limit(limit)
+        if kwargs.get("batch_size"):
+            cursor.batch_size(kwargs["batch_size"])
+        return cursor
+
+    def find_raw_batches(self, filter=None, projection=None, **kwargs):
+        cursor = MemoryCursor(self, filter, projection, raw=True)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        return cursor
+
+    async def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        results = await self.find(filter, projection, sort=sort, limit=1).to_list(1)
+        return results[0] if results else None
+
+    def _first_match(self, filter, sort=None) -> Optional[Dict[str, Any]]:
+        if sort:
+            documents = [
+                document
+                for document in self._documents.values()
+                if matches(document, filter)
+            ]
+            documents = sort_documents(documents, _normalize_sort(sort))
+            return documents[0] if documents else None
+        for document in self._documents.values():
+            if matches(document, filter):
+                return document
+        return None
+
+    async def count_documents(self, filter=None, **kwargs) -> int:
+        documents = [
+            document
+            for document in self._documents.values()
+            if matches(document, filter)
+        ]
+        documents = documents[kwargs.get("skip", 0) :]
+        if kwargs.get("limit"):
+            documents = documents[: kwargs["limit"]]
+        return len(documents)
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return len(self._documents)
+
+    async def distinct(self, key: str, filter=None, **kwargs) -> List[Any]:
+        values: List[Any] = []
+        for document in self._documents.values():
+            if not matches(document, filter):
+                continue
+            value = _get_path(document, key)
+            for item in value if isinstance(value, list) else [value]:
+                if item is not _MISSING and item not in values:
+                    values.append(item)
+        return values
+
+    def aggregate(
+        self, pipeline: List[Dict[str, Any]], **kwargs
+    ) -> MemoryCommandCursor:
+        documents = [_clone(document) for document in self._documents.values()]
+        return MemoryCommandCursor(run_pipeline(documents, pipeline))
+
+    # ------------------------------------------------------------ 写
+
+    def _prepare_insert(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        if "_id" not in document:
+            # 与 pymongo 一致：把生成的 _id 写回调用方的文档
+            document["_id"] = ObjectId()
+        if document["_id"] in self._documents:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.name} index: _id_"
+            )
+        stored = _clone(document)
+        self._check_unique(stored)
+        return stored
+
+    async def insert_one(self, document: Dict[str, Any], **kwargs) -> InsertOneResult:
+        stored = self._prepare_insert(document)
+        self.database._mark_created(self.name)
+        self._store(stored)
+        return InsertOneResult(stored["_id"])
+
+    async def insert_many(
+        self, documents: Iterable[Dict[str, Any]], ordered: bool = True, **kwargs
+    ) -> InsertManyResult:
+        self.database._mark_created(self.name)
+        inserted_ids = []
+        errors = []
+        for index, document in enumerate(documents):
+            try:
+                stored = self._prepare_insert(document)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+                continue
+            self._store(stored)
+            inserted_ids.append(stored["_id"])
+        if errors:
+            raise BulkWriteError(
+                {
+                    "writeErrors": errors,
+                    "writeConcernErrors": [],
+                    "nInserted": len(inserted_ids),
+                    "nUpserted": 0,
+                    "nMatched": 0,
+                    "nModified": 0,
+                    "nRemoved": 0,
+                    "upserted": [],
+                }
+            )
+        return InsertManyResult(inserted_ids)
+
+    def _update_document(
+        self, document: Dict[str, Any], update: Dict[str, Any]
+    ) -> bool:
+        updated = _apply_update(_clone(document), update)
+        if updated == document:
+            return False
+        self._check_unique(updated, previous_id=document["_id"])
+        self._store(updated, previous=document)
+        return True
+
+    def _upsert(self, filter, update) -> Any:
+        document = _apply_update(_upsert_seed(filter), update, inserting=True)
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        if document["_id"] in self._documents:
+            # 条件中带 _id 但其他条件不匹配时，MongoDB 插入同一 _id 失败
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.name} index: _id_"
+            )
+        self._check_unique(document)
+        self.database._mark_created(self.name)
+        self._store(document)
+        return document["_id"]
+
+    async def update_one(self, filter, update, upsert: bool = False, **kwargs):
+        document = self._first_match(filter)
+        if document is None:
+            if upsert:
+                return UpdateResult(0, 0, self._upsert(filter, update))
+            return UpdateResult(0, 0)
+        modified = self._update_document(document, update)
+        return UpdateResult(1, int(modified))
+
+    async def update_many(self, filter, update, upsert: bool = False, **kwargs):
+        targets = [
+            document
+            for document in self._documents.values()
+            if matches(document, filter)
+        ]
+        if not targets:
+            if upsert:
+                return UpdateResult(0, 0, self._upsert(filter, update))
+            return UpdateResult(0, 0)
+        modified = sum(self._update_document(document, update) for document in targets)
+        return UpdateResult(len(targets), modified)
+
+    async def replace_one(self, filter, replacement, upsert: bool = False, **kwargs):
+        return await self.update_one(filter, replacement, upsert=upsert)
+
+    async def find_one_and_update(
+        self,
+        filter,
+        update,
+        projection=None,
+        sort=None,
+        upsert: bool = False,
+        return_document=ReturnDocument.BEFORE,
+        **kwargs,
+    ):
+        document = self._first_match(filter, sort)
+        if document is None:
+            if not upsert:
+                return None
+            upserted_id = self._upsert(filter, update)
+            if return_document == ReturnDocument.AFTER:
+                return project(self._documents[upserted_id], projection)
+            return None
+        before = project(document, projection)
+        self._update_document(document, update)
+        if return_document == ReturnDocument.AFTER:
+            return project(self._documents[document["_id"]], projection)
+        return before
+
+    async def find_one_and_delete(self, filter, projection=None, sort=None, **kwargs):
+        document = self._first_match(filter, sort)
+        if document is None:
+            return None
+        self._remove(document)
+        return project(document, projection)
+
+    async def delete_one(self, filter, **kwargs) -> DeleteResult:
+        document = self._first_match(filter)
+        if document is None:
+            return DeleteResult(0)
+        self._remove(document)
+        return DeleteResult(1)
+
+    async def delete_many(self, filter, **kwargs) -> DeleteResult:
+        targets = [
+            document
+            for document in self._documents.values()
+            if matches(document, filter)
+        ]
+        for document in targets:
+            self._remove(document)
+        return DeleteResult(len(targets))
+
+    async def bulk_write(self, requests, ordered: bool = True, **kwargs):
+        result = BulkWriteResult()
+        errors = []
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    await self.insert_one(request._doc)
+                    result.inserted_count += 1
+                elif isinstance(request, (UpdateOne, UpdateMany, ReplaceOne)):
+                    method = (
+                        self.update_many
+                        if isinstance(request, UpdateMany)
+                        else self.update_one
+                    )
+                    outcome = await method(
+                        request._filter, request._doc, upsert=bool(request._upsert)
+                    )
+                    result.matched_count += outcome.matched_count
+                    result.modified_count += outcome.modified_count
+                    if outcome.upserted_id is not None:
+                        result.upserted_count += 1
+                        result.upserted_ids[index] = outcome.upserted_id
+                elif isinstance(request, (DeleteOne, DeleteMany)):
+                    method = (
+                        self.delete_many
+                        if isinstance(request, DeleteMany)
+                        else self.delete_one
+                    )
+                    result.deleted_count += (
+                        await method(request._filter)
+                    ).deleted_count
+                else:
+                    raise NotImplementedError(f"内存后端不支持批量操作 {type(request)}")
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError(
+                {
+                    "writeErrors": errors,
+                    "writeConcernErrors": [],
+                    "nInserted": result.inserted_count,
+                    "nUpserted": result.upserted_count,
+                    "nMatched": result.matched_count,
+                    "nModified": result.modified_count,
+                    "nRemoved": result.deleted_count,
+                    "upserted": [
+                        {"index": index, "_id": upserted_id}
+                        for index, upserted_id in result.upserted_ids.items()
+                    ],
+                }
+            )
+        return result
+
+    async def drop(self):
+        await self.database.drop_collection(self.name)
+
+
+# ---------------------------------------------------------------- 数据库与客户端
+
+
+class MemoryDatabase:
+    def __init__(self, client: "MemoryClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+        self._created: set = set()
+
+    def _mark_created(self, name: str):
+        self._created.add(name)
+
+    def with_options(self, **kwargs) -> "MemoryDatabase":
+        return self
+
+    def get_collection(self, name: str, **kwargs) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        return self.get_collection(name)
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self.get_collection(name)
+
+    async def command(self, command, **kwargs) -> Dict[str, Any]:
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == "ping":
+            return {"ok": 1.0}
+        raise NotImplementedError(f"内存后端不支持命令 {name}")
+
+    async def list_collection_names(self, **kwargs) -> List[str]:
+        return sorted(self._created)
+
+    async def create_collection(self, name: str, **kwargs) -> MemoryCollection:
+        if name in self._created:
+            raise CollectionInvalid(f"collection {name} already exists")
+        self._created.add(name)
+        return self.get_collection(name)
+
+    async def drop_collection(self, name: str):
+        self._collections.pop(name, None)
+        self._created.discard(name)
+
+
+class MemoryClient:
+    """与 AsyncIOMotorClient 用法一致的进程内客户端"""
+
+    def __init__(self, *args, **kwargs):
+        self._databases: Dict[str, MemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(self, name)
+        return self._databases[name]
+
+    def get_database(self, name: str, **kwargs) -> MemoryDatabase:
+        return self[name]
+
+    def close(self):
+        pass
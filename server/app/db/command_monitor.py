@@ -0,0 +1,163 @@
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from pymongo import monitoring
+
+from ..core.config import config
+from ..core.logger import logger
+from ..core.metrics import MONGODB_COMMAND_DURATION, MONGODB_COMMAND_FAILURES
+
+# 握手、认证和会话管理命令不计入请求的查询数
+IGNORED_COMMANDS = {
+    "hello",
+    "ismaster",
+    "isMaster",
+    "ping",
+    "saslStart",
+    "saslContinue",
+    "authenticate",
+    "endSessions",
+}
+
+
+class RequestQueryStats:
+    """单个请求内的数据库命令统计"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.documents = 0
+        self.commands: Dict[str, int] = {}
+        self.started = time.perf_counter()
+
+    def add(self, command_name: str, duration: float, documents: int):
+        self.count += 1
+        self.duration += duration
+        self.documents += documents
+        self.commands[command_name] = self.commands.get(command_name, 0) + 1
+
+
+# 当前请求的统计对象；Motor 在线程池中执行操作时会复制上下文，监听器回调里可直接读取
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar(
+    "request_query_stats", default=None
+)
+
+
+def _monitoring_config() -> Dict[str, Any]:
+    return config["mongodb"].get("command_monitoring") or {}
+
+
+def _returned_documents(reply: Any) -> int:
+    """从命令回复中取返回（或写入）的文档数"""
+    if not isinstance(reply, dict):
+        return 0
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+        return len(batch) if isinstance(batch, list) else 0
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """
+    统计每个请求发出的数据库命令数、耗时和返回文档数，并记录慢查询
+
+    回调在执行命令的线程中同步调用，只做计数。
+    """
+
+    def __init__(self, slow_query_ms: float = 100):
+        self.slow_query_seconds = slow_query_ms / 1000
+        self._lock = threading.Lock()
+        # request_id -> (统计对象, 集合名)
+        self._pending: Dict[int, Any] = {}
+        # 按路由汇总：请求数、命令数、命令耗时、单个请求的最大命令数
+        self._routes: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_config(cls) -> "CommandMonitor":
+        return cls(slow_query_ms=_monitoring_config().get("slow_query_ms", 100))
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else None
+        with self._lock:
+            self._pending[event.request_id] = (_current_stats.get(), collection)
+
+    def _finish(self, event, documents: int, failed: bool = False):
+        with self._lock:
+            pending = self._pending.pop(event.request_id, None)
+        if pending is None:
+            return
+        stats, collection = pending
+        duration = event.duration_micros / 1_000_000
+        MONGODB_COMMAND_DURATION.observe(
+            duration, command=event.command_name, collection=collection or ""
+        )
+        if failed:
+            MONGODB_COMMAND_FAILURES.inc(
+                command=event.command_name, collection=collection or ""
+            )
+        if stats is not None:
+            with self._lock:
+                stats.add(event.command_name, duration, documents)
+        if duration >= self.slow_query_seconds or failed:
+            target = (
+                f"{event.database_name}.{collection}"
+                if collection
+                else event.database_name
+            )
+            log = logger.error if failed else logger.warning
+            log(
+                f"{'数据库命令失败' if failed else '慢查询'}: {event.command_name} {target} "
+                f"耗时 {duration * 1000:.1f}ms 返回 {documents} 条"
+            )
+
+    def succeeded(self, event):
+        self._finish(event, _returned_documents(event.reply))
+
+    def failed(self, event):
+        self._finish(event, 0, failed=True)
+
+    def record_route(self, route: str, stats: RequestQueryStats):
+        with self._lock:
+            summary = self._routes.setdefault(
+                route,
+                {
+                    "requests": 0,
+                    "queries_total": 0,
+                    "query_seconds_total": 0.0,
+                    "documents_total": 0,
+                    "max_queries": 0,
+                },
+            )
+            summary["requests"] += 1
+            summary["queries_total"] += stats.count
+            summary["query_seconds_total"] += stats.duration
+            summary["documents_total"] += stats.documents
+            summary["max_queries"] = max(summary["max_queries"], stats.count)
+
+    def route_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {route: dict(summary) for route, summary in self._routes.items()}
+
+
+command_monitor = CommandMonitor.from_config()
+
+
+def begin_request() -> RequestQueryStats:
+    stats = RequestQueryStats()
+    _current_stats.set(stats)
+    return stats
+
+
+def current_request_stats() -> Optional[RequestQueryStats]:
+    return _current_stats.get()
+
+
+def debug_header_enabled() -> bool:
+    return _monitoring_config().get("debug_header", False)
@@ -0,0 +1,65 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from ..core.config import config
+from .mongodb import db
+
+
+class IdAllocator:
+    """
+    hi/lo 整数 ID 分配器
+
+    每个 worker 一次从 counters 集合租用一段连续 ID（默认 100 个），之后在本地
+    依次发放，用完再租下一段。不同 worker 租到的区间互不重叠，ID 仍然唯一；
+    代价是 worker 重启会留下未用完的空洞，且 ID 大小不再严格对应创建顺序。
+    """
+
+    def __init__(
+        self, block_size: int = 100, block_sizes: Optional[Dict[str, int]] = None
+    ):
+        self.block_size = block_size
+        self.block_sizes = block_sizes or {}
+        # name -> [下一个可用 ID, 当前区间最后一个 ID]
+        self._blocks: Dict[str, List[int]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @classmethod
+    def from_config(cls) -> "IdAllocator":
+        options = config["mongodb"].get("id_allocator") or {}
+        return cls(
+            block_size=options.get("block_size", 100),
+            block_sizes=options.get("block_sizes"),
+        )
+
+    async def next_id(self, name: str) -> int:
+        """获取计数器 name 的下一个 ID"""
+        return (await self.allocate(name, 1))[0]
+
+    async def allocate(self, name: str, count: int) -> List[int]:
+        """一次获取 count 个 ID，不足时按需租用新区间"""
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            ids: List[int] = []
+            while len(ids) < count:
+                block = self._blocks.get(name)
+                if block is None or block[0] > block[1]:
+                    block = await self._lease(name, count - len(ids))
+                    self._blocks[name] = block
+                take = min(count - len(ids), block[1] - block[0] + 1)
+                ids.extend(range(block[0], block[0] + take))
+                block[0] += take
+            return ids
+
+    async def _lease(self, name: str, needed: int) -> List[int]:
+        size = max(self.block_sizes.get(name, self.block_size), needed)
+        result = await db.counters.find_one_and_update(
+            {"name": name},
+            {"$inc": {"seq": size}},
+            return_document=ReturnDocument.AFTER,
+        )
+        return [result["seq"] - size + 1, result["seq"]]
+
+
+id_allocator = IdAllocator.from_config()
@@ -0,0 +1,163 @@
+from typing import Dict, List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from ..core.logger import logger
+
+# 统计查询读取的字段，match_results 上的覆盖索引包含全部这些字段，
+# 查询时只投影这些字段（并排除 _id）即可走纯索引扫描
+MATCH_STATISTICS_FIELDS = [
+    "winning_deck_id",
+    "losing_deck_id",
+    "first_deck_id",
+    "second_deck_id",
+]
+MATCH_STATISTICS_PROJECTION = {
+    "_id": 0,
+    **{field: 1 for field in MATCH_STATISTICS_FIELDS},
+}
+
+# 各集合应有的索引，启动时与 list_indexes() 比对并补建缺失的索引
+INDEX_SPEC: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel("id", unique=True),
+        IndexModel("email", unique=True),
+        IndexModel("name"),
+    ],
+    "environments": [
+        IndexModel("name", unique=True),
+        IndexModel("id", unique=True),
+    ],
+    "decks": [
+        IndexModel("id", unique=True),
+        IndexModel("environment_id"),
+        IndexModel("author_id"),
+        IndexModel([("name", TEXT), ("description", TEXT)]),
+    ],
+    "match_types": [
+        IndexModel("name", unique=True),
+        IndexModel("id", unique=True),
+        # 只为非空的 invite_code 创建索引
+        IndexModel("invite_code", sparse=True),
+    ],
+    "match_type_members": [
+        # 每个用户在同一分组中只有一条成员记录
+        IndexModel(
+            [("match_type_id", ASCENDING), ("user_id", ASCENDING)], unique=True
+        ),
+        IndexModel([("user_id", ASCENDING), ("match_type_id", ASCENDING)]),
+    ],
+    "match_results": [
+        IndexModel("id", unique=True),
+        # 按筛选条件过滤后按 id 分页
+        IndexModel(
+            [
+                ("environment_id", ASCENDING),
+                ("match_type_id", ASCENDING),
+                ("id", ASCENDING),
+            ]
+        ),
+        IndexModel([("environment_id", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("match_type_id", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("first_deck_id", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("second_deck_id", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("winning_deck_id", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("losing_deck_id", ASCENDING), ("id", ASCENDING)]),
+        # 统计查询的覆盖索引
+        IndexModel(
+            [("environment_id", ASCENDING), ("match_type_id", ASCENDING)]
+            + [(field, ASCENDING) for field in MATCH_STATISTICS_FIELDS]
+        ),
+    ],
+    "counters": [
+        IndexModel("name", unique=True),
+    ],
+    "deck_matchup_priors": [
+        # deck_a_id 和 deck_b_id 的组合是唯一的
+        IndexModel([("deck_a_id", ASCENDING), ("deck_b_id", ASCENDING)], unique=True),
+        # 按环境读取先验数据；deck_b_id 用于删除卡组时清理其作为对手的记录
+        IndexModel("environment_id"),
+        IndexModel("deck_b_id"),
+    ],
+    "deletion_jobs": [
+        IndexModel("id", unique=True),
+        IndexModel("status"),
+    ],
+    "calculation_jobs": [
+        IndexModel("id", unique=True),
+        IndexModel("status"),
+        # 统计用户进行中的任务数
+        IndexModel([("owner_id", ASCENDING), ("status", ASCENDING)]),
+        # 结束的任务到 expires_at 后自动删除
+        IndexModel("expires_at", expireAfterSeconds=0),
+    ],
+    "data_versions": [
+        IndexModel("environment_id", unique=True),
+        IndexModel("dirty"),
+    ],
+    "win_rate_snapshots": [
+        # 按范围取最新快照和历史
+        IndexModel(
+            [
+                ("environment_id", ASCENDING),
+                ("match_type_id", ASCENDING),
+                ("computed_at", DESCENDING),
+            ]
+        ),
+    ],
+    "stream_tickets": [
+        IndexModel("ticket", unique=True),
+        # 过期的票据自动删除
+        IndexModel("expires_at", expireAfterSeconds=0),
+    ],
+    "schema_migrations": [
+        IndexModel("version", unique=True),
+    ],
+}
+
+# 比较索引定义时关心的选项
+_COMPARED_OPTIONS = ("unique", "sparse")
+
+
+async def reconcile_indexes(database: AsyncIOMotorDatabase):
+    """
+    按 INDEX_SPEC 补建缺失的索引
+
+    只创建不删除：规格之外的索引只记录日志，由人工确认后再删除；
+    同名但选项不同的索引同样只告警。
+    """
+    for collection_name, models in INDEX_SPEC.items():
+        collection = database.get_collection(collection_name)
+        existing = {}
+        async for index in collection.list_indexes():
+            existing[index["name"]] = index
+
+        missing = []
+        for model in models:
+            document = model.document
+            current = existing.get(document["name"])
+            if current is None:
+                missing.append(model)
+                continue
+            for option in _COMPARED_OPTIONS:
+                if bool(current.get(option)) != bool(document.get(option)):
+                    logger.warning(
+                        f"索引 {collection_name}.{document['name']} 的 {option} "
+                        f"与规格不一致，需要手动重建"
+                    )
+
+        for model in missing:
+            name = model.document["name"]
+            try:
+                await collection.create_indexes([model])
+                logger.info(f"已创建索引 {collection_name}.{name}")
+            except OperationFailure as e:
+                # 例如已有数据违反唯一约束，不阻止服务启动
+                logger.error(f"创建索引 {collection_name}.{name} 失败: {str(e)}")
+
+        expected = {model.document["name"] for model in models} | {"_id_"}
+        extra = sorted(set(existing) - expected)
+        if extra:
+            logger.info(f"{collection_name} 上存在规格之外的索引: {', '.join(extra)}")
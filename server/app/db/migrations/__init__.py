@@ -0,0 +1,7 @@
+from .base import Migration, MigrationProgress, backfill
+from .runner import (
+    MIGRATIONS,
+    MigrationLockHeld,
+    migration_status,
+    run_migrations,
+)
@@ -0,0 +1,39 @@
+"""
+数据迁移命令行
+
+    python -m app.db.migrations status
+    python -m app.db.migrations up [--target VERSION]
+"""
+
+import argparse
+import asyncio
+
+from ..mongodb import db
+from .runner import migration_status, run_migrations
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="ESU 数据迁移")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="查看迁移状态")
+    up_parser = subparsers.add_parser("up", help="执行未完成的迁移")
+    up_parser.add_argument("--target", type=int, default=None, help="迁移到指定版本")
+    args = parser.parse_args()
+
+    await db.connect_to_database()
+    try:
+        if args.command == "status":
+            for item in await migration_status(db.db):
+                print(
+                    f"{item['version']:>4}  {item['status']:<8}  {item['name']}"
+                    f"  (已处理 {item['processed']})"
+                )
+        else:
+            completed = await run_migrations(db.db, target=args.target)
+            print(f"本次完成的迁移: {completed or '无'}")
+    finally:
+        await db.close_database_connection()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+import abc
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+# 默认每批处理的文档数
+DEFAULT_BATCH_SIZE = 1000
+
+
+class MigrationProgress:
+    """记录单个迁移的断点，每处理完一批就持久化，中断后可从断点继续"""
+
+    def __init__(
+        self,
+        records: AsyncIOMotorCollection,
+        version: int,
+        checkpoint: Any = None,
+        on_save: Optional[Callable[[], Any]] = None,
+    ):
+        self._records = records
+        self.version = version
+        self.checkpoint = checkpoint
+        self._on_save = on_save
+
+    async def save(self, checkpoint: Any, processed: int = 0):
+        self.checkpoint = checkpoint
+        await self._records.update_one(
+            {"version": self.version},
+            {
+                "$set": {"checkpoint": checkpoint, "updated_at": datetime.utcnow()},
+                "$inc": {"processed": processed},
+            },
+        )
+        if self._on_save is not None:
+            await self._on_save()
+
+
+class Migration(abc.ABC):
+    """
+    数据迁移基类
+
+    子类设置 version（递增整数）和 name，实现 up()。up() 必须是幂等的：
+    同一迁移可能在中断后从断点重新执行。没有实现 up() 的子类在实例化（即加入
+    MIGRATIONS）时就会报错，而不是执行到一半才失败。
+    """
+
+    version: int
+    name: str
+
+    @abc.abstractmethod
+    async def up(self, database: AsyncIOMotorDatabase, progress: MigrationProgress):
+        """执行迁移，每处理完一批调用 progress.save() 保存断点"""
+
+
+async def backfill(
+    collection: AsyncIOMotorCollection,
+    query: Dict[str, Any],
+    update: Dict[str, Any],
+    progress: MigrationProgress,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+):
+    """按 _id 顺序分批对匹配 query 的文档执行 update，断点保存在 progress 中"""
+    last_id = progress.checkpoint
+    while True:
+        batch_query = query
+        if last_id is not None:
+            batch_query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        batch = (
+            await collection.find(batch_query, {"_id": 1})
+            .sort("_id", 1)
+            .limit(batch_size)
+            .to_list(length=batch_size)
+        )
+        if not batch:
+            return
+        ids = [doc["_id"] for doc in batch]
+        result = await collection.update_many({"_id": {"$in": ids}}, update)
+        last_id = ids[-1]
+        await progress.save(last_id, result.modified_count)
@@ -0,0 +1,168 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from ...core.logger import logger
+from .base import Migration, MigrationProgress
+from .v0001_match_type_creator_id import BackfillMatchTypeCreatorId
+from .v0002_match_type_members import MoveMatchTypeUsersToMembers
+from .v0003_prior_environment_id import BackfillPriorEnvironmentId
+
+# 按版本号排列的全部迁移，新增迁移追加在末尾
+MIGRATIONS: List[Migration] = [
+    BackfillMatchTypeCreatorId(),
+    MoveMatchTypeUsersToMembers(),
+    BackfillPriorEnvironmentId(),
+]
+
+RECORDS_COLLECTION = "schema_migrations"
+LOCK_COLLECTION = "schema_migrations_lock"
+LOCK_ID = "migrations"
+# 迁移锁租约，每保存一次断点续租一次；持有者崩溃后过期即可被接手
+LOCK_LEASE_SECONDS = 120
+
+
+class MigrationLockHeld(Exception):
+    """其他进程正在执行迁移"""
+
+
+class _MigrationLock:
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self._collection = database.get_collection(LOCK_COLLECTION)
+        self.owner = uuid.uuid4().hex
+
+    def _expiry(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=LOCK_LEASE_SECONDS)
+
+    async def acquire(self):
+        try:
+            # 锁不存在时 upsert 创建；锁被他人持有且未过期时 upsert 触发重复键错误
+            await self._collection.update_one(
+                {
+                    "_id": LOCK_ID,
+                    "$or": [
+                        {"owner": self.owner},
+                        {"expires_at": {"$lt": datetime.utcnow()}},
+                    ],
+                },
+                {"$set": {"owner": self.owner, "expires_at": self._expiry()}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            raise MigrationLockHeld("其他进程正在执行数据迁移")
+
+    async def renew(self):
+        result = await self._collection.update_one(
+            {"_id": LOCK_ID, "owner": self.owner},
+            {"$set": {"expires_at": self._expiry()}},
+        )
+        if result.matched_count == 0:
+            raise MigrationLockHeld("迁移锁已被其他进程接手")
+
+    async def release(self):
+        await self._collection.delete_one({"_id": LOCK_ID, "owner": self.owner})
+
+
+async def migration_status(database: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """列出每个迁移的执行状态"""
+    records = {}
+    async for record in database.get_collection(RECORDS_COLLECTION).find(
+        {}, {"_id": 0}
+    ):
+        records[record["version"]] = record
+    return [
+        {
+            "version": migration.version,
+            "name": migration.name,
+            "status": records.get(migration.version, {}).get("status", "pending"),
+            "processed": records.get(migration.version, {}).get("processed", 0),
+            "applied_at": records.get(migration.version, {}).get("applied_at"),
+        }
+        for migration in MIGRATIONS
+    ]
+
+
+async def run_migrations(
+    database: AsyncIOMotorDatabase, target: Optional[int] = None
+) -> List[int]:
+    """
+    依次执行尚未完成的迁移（直到 target 版本），返回本次完成的版本号
+
+    同一时间只有一个进程执行迁移；拿不到锁时抛出 MigrationLockHeld。
+    """
+    records = database.get_collection(RECORDS_COLLECTION)
+    applied = set()
+    async for record in records.find({"status": "applied"}, {"version": 1}):
+        applied.add(record["version"])
+    pending = [
+        migration
+        for migration in MIGRATIONS
+        if migration.version not in applied
+        and (target is None or migration.version <= target)
+    ]
+    if not pending:
+        return []
+
+    lock = _MigrationLock(database)
+    await lock.acquire()
+    completed = []
+    try:
+        for migration in pending:
+            now = datetime.utcnow()
+            record = await records.find_one_and_update(
+                {"version": migration.version},
+                {
+                    "$setOnInsert": {
+                        "version": migration.version,
+                        "name": migration.name,
+                        "checkpoint": None,
+                        "processed": 0,
+                        "started_at": now,
+                    },
+                    "$set": {"status": "running", "updated_at": now},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            if record.get("checkpoint") is not None:
+                logger.info(
+                    f"从断点继续迁移 {migration.version} {migration.name}: "
+                    f"已处理 {record.get('processed', 0)}"
+                )
+            else:
+                logger.info(f"开始迁移 {migration.version} {migration.name}")
+
+            progress = MigrationProgress(
+                records, migration.version, record.get("checkpoint"), lock.renew
+            )
+            try:
+                await migration.up(database, progress)
+            except Exception as e:
+                await records.update_one(
+                    {"version": migration.version},
+                    {"$set": {"status": "failed", "error": str(e)}},
+                )
+                logger.error(
+                    f"迁移 {migration.version} {migration.name} 失败: {str(e)}"
+                )
+                raise
+
+            await records.update_one(
+                {"version": migration.version},
+                {
+                    "$set": {
+                        "status": "applied",
+                        "applied_at": datetime.utcnow(),
+                        "error": None,
+                    }
+                },
+            )
+            completed.append(migration.version)
+            logger.info(f"迁移完成 {migration.version} {migration.name}")
+    finally:
+        await lock.release()
+    return completed
@@ -0,0 +1,18 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from .base import Migration, MigrationProgress, backfill
+
+
+class BackfillMatchTypeCreatorId(Migration):
+    """早期创建的比赛类型没有 creator_id 字段，补为 None，读取时不必再逐条修补"""
+
+    version = 1
+    name = "backfill_match_type_creator_id"
+
+    async def up(self, database: AsyncIOMotorDatabase, progress: MigrationProgress):
+        await backfill(
+            database.get_collection("match_types"),
+            {"creator_id": {"$exists": False}},
+            {"$set": {"creator_id": None}},
+            progress,
+        )
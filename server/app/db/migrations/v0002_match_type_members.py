@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from .base import DEFAULT_BATCH_SIZE, Migration, MigrationProgress
+
+
+class MoveMatchTypeUsersToMembers(Migration):
+    """把 match_types 文档中的 users 数组拆到 match_type_members 集合，再删除该数组"""
+
+    version = 2
+    name = "move_match_type_users_to_members"
+
+    async def up(self, database: AsyncIOMotorDatabase, progress: MigrationProgress):
+        match_types = database.get_collection("match_types")
+        members = database.get_collection("match_type_members")
+        cursor = match_types.find(
+            {"users": {"$exists": True}}, {"_id": 1, "id": 1, "users": 1}
+        ).sort("_id", 1)
+        async for match_type in cursor:
+            user_ids = match_type.get("users") or []
+            # 成员以 upsert 写入，中断后重新执行不会产生重复
+            for start in range(0, len(user_ids), DEFAULT_BATCH_SIZE):
+                await members.bulk_write(
+                    [
+                        UpdateOne(
+                            {"match_type_id": match_type["id"], "user_id": user_id},
+                            {"$setOnInsert": {"joined_at": datetime.utcnow()}},
+                            upsert=True,
+                        )
+                        for user_id in user_ids[start : start + DEFAULT_BATCH_SIZE]
+                    ],
+                    ordered=False,
+                )
+            await match_types.update_one(
+                {"_id": match_type["_id"]}, {"$unset": {"users": ""}}
+            )
+            await progress.save(match_type["_id"], len(user_ids))
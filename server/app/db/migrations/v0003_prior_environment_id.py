@@ -0,0 +1,48 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+from .base import DEFAULT_BATCH_SIZE, Migration, MigrationProgress
+
+
+class BackfillPriorEnvironmentId(Migration):
+    """为先验数据补上 deck_a_id 所属的 environment_id，计算胜率时只读取对应环境的先验"""
+
+    version = 3
+    name = "backfill_prior_environment_id"
+
+    async def up(self, database: AsyncIOMotorDatabase, progress: MigrationProgress):
+        priors = database.get_collection("deck_matchup_priors")
+        decks = database.get_collection("decks")
+        query = {"environment_id": {"$exists": False}}
+        while True:
+            # 处理过的文档不再匹配 query，无需按断点续读
+            batch = (
+                await priors.find(query, {"_id": 1, "deck_a_id": 1})
+                .limit(DEFAULT_BATCH_SIZE)
+                .to_list(length=DEFAULT_BATCH_SIZE)
+            )
+            if not batch:
+                return
+            deck_ids = list({prior["deck_a_id"] for prior in batch})
+            environments = {
+                deck["id"]: deck["environment_id"]
+                async for deck in decks.find(
+                    {"id": {"$in": deck_ids}}, {"_id": 0, "id": 1, "environment_id": 1}
+                )
+            }
+            # 卡组已不存在的先验记为 None，只在不限环境的计算中读取
+            await priors.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": prior["_id"]},
+                        {
+                            "$set": {
+                                "environment_id": environments.get(prior["deck_a_id"])
+                            }
+                        },
+                    )
+                    for prior in batch
+                ],
+                ordered=False,
+            )
+            await progress.save(batch[-1]["_id"], len(batch))
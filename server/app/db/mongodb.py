@@ -1,25 +1,116 @@
 from fastapi import Depends
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
 
 from ..core.config import config
+from ..core.logger import logger
+from .backends import create_client
+from .command_monitor import command_monitor
+from .indexes import INDEX_SPEC, reconcile_indexes
+from .pool_monitor import pool_monitor
+
+# 软删除（墓碑）标记，级联删除进行中的卡组对读请求不可见
+NOT_DELETED = {"deleted": {"$ne": True}}
+
+# config.yaml 中 mongodb.pool 的键与 pymongo 客户端参数的对应关系
+POOL_OPTIONS = {
+    "max_pool_size": "maxPoolSize",
+    "min_pool_size": "minPoolSize",
+    "max_idle_time_ms": "maxIdleTimeMS",
+    "wait_queue_timeout_ms": "waitQueueTimeoutMS",
+    "server_selection_timeout_ms": "serverSelectionTimeoutMS",
+    "connect_timeout_ms": "connectTimeoutMS",
+    "socket_timeout_ms": "socketTimeoutMS",
+}
+
+
+def client_options() -> dict:
+    """根据配置生成连接池和网络压缩参数，未配置的项沿用 URI 或驱动默认值"""
+    mongodb_config = config["mongodb"]
+    options = {
+        POOL_OPTIONS[key]: value
+        for key, value in (mongodb_config.get("pool") or {}).items()
+        if key in POOL_OPTIONS and value is not None
+    }
+    compressors = mongodb_config.get("compressors")
+    if compressors:
+        # zstd 需要 zstandard，snappy 需要 python-snappy；未安装时驱动会告警并忽略
+        options["compressors"] = compressors
+    if mongodb_config.get("zlib_compression_level") is not None:
+        options["zlibCompressionLevel"] = mongodb_config["zlib_compression_level"]
+    return options
+
+
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def read_preference_for(workload: str):
+    """
+    按负载类型返回读偏好（mongodb.read_preferences.<workload>）
+
+    未配置的负载类型使用主节点；max_staleness_seconds 不能小于 90
+    """
+    options = (config["mongodb"].get("read_preferences") or {}).get(workload) or {}
+    mode = options.get("mode", "primary")
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"未知的读偏好: {mode}")
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCE_MODES[mode](
+        max_staleness=options.get("max_staleness_seconds", -1)
+    )
+
+
+def event_listeners() -> list:
+    listeners = [pool_monitor]
+    if (config["mongodb"].get("command_monitoring") or {}).get("enabled", True):
+        listeners.append(command_monitor)
+    return listeners
+
+
+def storage_backend() -> str:
+    """mongodb.backend：motor（默认）或 memory"""
+    return config["mongodb"].get("backend") or "motor"
 
 
 class MongoDB:
     client: AsyncIOMotorClient = None
     db: AsyncIOMotorDatabase = None
+    # 统计、胜率等分析类读请求使用的数据库句柄（可路由到从节点）
+    analytics_db: AsyncIOMotorDatabase = None
 
     @classmethod
     async def connect_to_database(cls):
         try:
-            cls.client = AsyncIOMotorClient(config["mongodb"]["uri"])
+            cls.client = create_client(
+                storage_backend(),
+                config["mongodb"].get("uri"),
+                event_listeners=event_listeners(),
+                **client_options(),
+            )
             cls.db = cls.client[config["mongodb"]["database"]]
+            cls.analytics_db = cls.db.with_options(
+                read_preference=read_preference_for("analytics")
+            )
             # 测试连接
             await cls.db.command("ping")
 
             # 检查并创建集合和索引
             await cls._check_and_create_collections()
         except Exception as e:
-            print(f"数据库连接失败: {str(e)}")
+            logger.error(f"数据库连接失败: {str(e)}")
             raise
 
     @classmethod
@@ -32,39 +123,17 @@ class MongoDB:
         # 获取所有集合名称
         collections = await cls.db.list_collection_names()
 
-        # 如果集合不存在，则创建集合和索引
-        if "users" not in collections:
-            await cls.db.create_collection("users")
-            collection = cls.db.get_collection("users")
-            await collection.create_index("id", unique=True)  # 使用 id 作为唯一索引
-            await collection.create_index("email", unique=True)
-            await collection.create_index("name")
-
-        if "environments" not in collections:
-            await cls.db.create_collection("environments")
-            collection = cls.db.get_collection("environments")
-            await collection.create_index("name", unique=True)
-            await collection.create_index("id", unique=True)
-
-        if "decks" not in collections:
-            await cls.db.create_collection("decks")
-            collection = cls.db.get_collection("decks")
-            await collection.create_index("id", unique=True)
-            await collection.create_index("environment_id")
-            await collection.create_index("author_id")
-            await collection.create_index([("name", "text"), ("description", "text")])
+        # 如果集合不存在，则创建集合
+        for collection_name in INDEX_SPEC:
+            if collection_name not in collections:
+                await cls.db.create_collection(collection_name)
+
+        # 按规格补建索引（包括已有部署上缺失的索引）
+        await reconcile_indexes(cls.db)
 
         if "match_types" not in collections:
-            await cls.db.create_collection("match_types")
-            collection = cls.db.get_collection("match_types")
-            await collection.create_index("name", unique=True)
-            await collection.create_index("id", unique=True)
-            await collection.create_index(
-                "invite_code", sparse=True
-            )  # 只为非空的 invite_code 创建索引
-            await collection.create_index("users")  # 为用户列表创建索引
             # 创建默认比赛类型
-            await collection.update_one(
+            await cls.db.get_collection("match_types").update_one(
                 {"name": "普通对战"},
                 {
                     "$setOnInsert": {
@@ -72,27 +141,13 @@ class MongoDB:
                         "name": "普通对战",
                         "is_private": False,
                         "invite_code": None,
-                        "users": [],
                     }
                 },
                 upsert=True,
             )
 
-        if "match_results" not in collections:
-            await cls.db.create_collection("match_results")
-            collection = cls.db.get_collection("match_results")
-            await collection.create_index("id", unique=True)
-            await collection.create_index("environment_id")
-            await collection.create_index("first_deck_id")
-            await collection.create_index("second_deck_id")
-            await collection.create_index("winning_deck_id")
-            await collection.create_index("losing_deck_id")
-            await collection.create_index("match_type_id")
-
         if "counters" not in collections:
-            await cls.db.create_collection("counters")
             collection = cls.db.get_collection("counters")
-            await collection.create_index("name", unique=True)
             # 初始化计数器
             await collection.update_one(
                 {"name": "environment_id"}, {"$setOnInsert": {"seq": 0}}, upsert=True
@@ -107,19 +162,24 @@ class MongoDB:
                 {"name": "match_result_id"}, {"$setOnInsert": {"seq": 0}}, upsert=True
             )
 
-        if "deck_matchup_priors" not in collections:
-            await cls.db.create_collection("deck_matchup_priors")
-            collection = cls.db.get_collection("deck_matchup_priors")
-            # 创建复合索引，确保deck_a_id和deck_b_id的组合是唯一的
-            await collection.create_index(
-                [("deck_a_id", 1), ("deck_b_id", 1)],
-                unique=True
-            )
+    @classmethod
+    def pool_stats(cls) -> dict:
+        """当前连接池配置与各服务器连接池的统计"""
+        return {
+            "backend": storage_backend(),
+            "options": client_options(),
+            "pools": pool_monitor.snapshot(),
+        }
 
     @classmethod
     def get_collection(cls, collection_name: str):
         return cls.db[collection_name]
 
+    @property
+    def analytics(self) -> AsyncIOMotorDatabase:
+        """分析类读请求（统计、胜率、导出）使用，写入和鉴权始终走 db"""
+        return self.analytics_db
+
     @property
     def users(self):
         return self.db.get_collection("users")
@@ -150,3 +210,7 @@ db = MongoDB()
 
 async def get_database() -> AsyncIOMotorDatabase:
     return db.db
+
+
+async def get_analytics_database() -> AsyncIOMotorDatabase:
+    return db.analytics_db
@@ -0,0 +1,84 @@
+import threading
+from collections import defaultdict
+from typing import Any, Dict
+
+from pymongo import monitoring
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    统计连接池状态
+
+    pymongo 在执行操作的线程中同步回调，这里只做计数，开销可以忽略。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, Dict[str, Any]] = defaultdict(self._new_pool_stats)
+
+    @staticmethod
+    def _new_pool_stats() -> Dict[str, Any]:
+        return {
+            "open": 0,
+            "in_use": 0,
+            "waiting": 0,
+            "created_total": 0,
+            "closed_total": 0,
+            "checked_out_total": 0,
+            "checkout_failed_total": 0,
+            "checkout_wait_seconds_total": 0.0,
+            "cleared_total": 0,
+        }
+
+    def _update(self, address, **changes):
+        key = f"{address[0]}:{address[1]}"
+        with self._lock:
+            stats = self._pools[key]
+            for name, delta in changes.items():
+                stats[name] += delta
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {address: dict(stats) for address, stats in self._pools.items()}
+
+    def pool_created(self, event):
+        self._update(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._update(event.address, cleared_total=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._update(event.address, open=1, created_total=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event.address, open=-1, closed_total=1)
+
+    def connection_check_out_started(self, event):
+        self._update(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._update(event.address, waiting=-1, checkout_failed_total=1)
+
+    def connection_checked_out(self, event):
+        self._update(
+            event.address,
+            waiting=-1,
+            in_use=1,
+            checked_out_total=1,
+            checkout_wait_seconds_total=getattr(event, "duration", 0.0) or 0.0,
+        )
+
+    def connection_checked_in(self, event):
+        self._update(event.address, in_use=-1)
+
+
+pool_monitor = PoolMonitor()
@@ -0,0 +1,181 @@
+from typing import Any, AsyncIterator, Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+from bson import decode_all
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from ..models.deck import Deck
+from .indexes import MATCH_STATISTICS_FIELDS, MATCH_STATISTICS_PROJECTION
+from .mongodb import NOT_DELETED
+
+# 分析查询每批从服务器拉取的文档数
+ANALYTICS_BATCH_SIZE = 5000
+
+
+class MatchRow(NamedTuple):
+    """对局中统计需要的四个卡组 ID，可直接替代 MatchResult 传给计算器"""
+
+    winning_deck_id: int
+    losing_deck_id: int
+    first_deck_id: int
+    second_deck_id: int
+
+
+class MatchArrays(NamedTuple):
+    """按列存放的对局卡组 ID"""
+
+    winning_deck_id: np.ndarray
+    losing_deck_id: np.ndarray
+    first_deck_id: np.ndarray
+    second_deck_id: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.winning_deck_id)
+
+
+class PriorRow(NamedTuple):
+    deck_a_id: int
+    deck_b_id: int
+    prior_matches: int
+    prior_wins: int
+
+
+def prior_key(deck_a_id: int, deck_b_id: int) -> str:
+    return f"{deck_a_id}_{deck_b_id}"
+
+
+async def _iter_raw_documents(
+    collection, query: Dict[str, Any], projection: Dict[str, Any]
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    以原始 BSON 批次读取并在 C 扩展中一次解码整批，避免逐条构造 Python 对象的开销
+    """
+    cursor = collection.find_raw_batches(query, projection).batch_size(
+        ANALYTICS_BATCH_SIZE
+    )
+    async for batch in cursor:
+        yield decode_all(batch)
+
+
+class MatchResultRepository:
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self._collection = database.get_collection("match_results")
+
+    async def iter_deck_batches(
+        self, query: Dict[str, Any]
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """按批返回只含卡组 ID 字段的文档（走覆盖索引）"""
+        async for documents in _iter_raw_documents(
+            self._collection, query, MATCH_STATISTICS_PROJECTION
+        ):
+            yield documents
+
+    async def fetch_deck_rows(self, query: Dict[str, Any]) -> List[MatchRow]:
+        rows: List[MatchRow] = []
+        async for documents in self.iter_deck_batches(query):
+            rows.extend(
+                MatchRow(
+                    doc["winning_deck_id"],
+                    doc["losing_deck_id"],
+                    doc["first_deck_id"],
+                    doc["second_deck_id"],
+                )
+                for doc in documents
+            )
+        return rows
+
+    async def fetch_deck_arrays(self, query: Dict[str, Any]) -> MatchArrays:
+        columns: Dict[str, List[np.ndarray]] = {
+            field: [] for field in MATCH_STATISTICS_FIELDS
+        }
+        async for documents in self.iter_deck_batches(query):
+            for field in MATCH_STATISTICS_FIELDS:
+                columns[field].append(
+                    np.fromiter(
+                        (doc[field] for doc in documents),
+                        dtype=np.int64,
+                        count=len(documents),
+                    )
+                )
+        return MatchArrays(
+            **{
+                field: (
+                    np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+                )
+                for field, chunks in columns.items()
+            }
+        )
+
+
+class DeckRepository:
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self._collection = database.get_collection("decks")
+
+    def _query(self, environment_id: Optional[int]) -> Dict[str, Any]:
+        query = dict(NOT_DELETED)
+        if environment_id is not None:
+            query["environment_id"] = environment_id
+        return query
+
+    async def list_decks(self, environment_id: Optional[int] = None) -> List[Deck]:
+        decks = await self._collection.find(
+            self._query(environment_id), {"_id": 0}
+        ).to_list(None)
+        return [Deck(**deck) for deck in decks]
+
+    async def names(self, environment_id: Optional[int] = None) -> Dict[int, str]:
+        """卡组 ID 到名称的映射，只读取这两个字段"""
+        decks = await self._collection.find(
+            self._query(environment_id), {"_id": 0, "id": 1, "name": 1}
+        ).to_list(None)
+        return {deck["id"]: deck["name"] for deck in decks}
+
+    async def environment_ids(self, deck_ids: Iterable[int]) -> Dict[int, int]:
+        """卡组 ID 到所属环境 ID 的映射，不存在（或已删除）的卡组不在结果中"""
+        query = {**self._query(None), "id": {"$in": list(deck_ids)}}
+        decks = await self._collection.find(
+            query, {"_id": 0, "id": 1, "environment_id": 1}
+        ).to_list(None)
+        return {deck["id"]: deck["environment_id"] for deck in decks}
+
+
+class PriorRepository:
+    def __init__(self, database: AsyncIOMotorDatabase):
+        self._collection = database.get_collection("deck_matchup_priors")
+
+    async def fetch_rows(
+        self,
+        deck_ids: Optional[Iterable[int]] = None,
+        environment_id: Optional[int] = None,
+    ) -> Dict[str, PriorRow]:
+        """
+        以 "deck_a_id_deck_b_id" 为键返回先验数据
+
+        传入 environment_id 时只读取该环境的记录（走 environment_id 索引），
+        传入 deck_ids 时只读取双方都在其中的记录
+        """
+        query: Dict[str, Any] = {}
+        if environment_id is not None:
+            query["environment_id"] = environment_id
+        if deck_ids is not None:
+            deck_ids = list(deck_ids)
+            query["deck_a_id"] = {"$in": deck_ids}
+            query["deck_b_id"] = {"$in": deck_ids}
+        projection = {
+            "_id": 0,
+            "deck_a_id": 1,
+            "deck_b_id": 1,
+            "prior_matches": 1,
+            "prior_wins": 1,
+        }
+        priors: Dict[str, PriorRow] = {}
+        async for documents in _iter_raw_documents(self._collection, query, projection):
+            for doc in documents:
+                row = PriorRow(
+                    doc["deck_a_id"],
+                    doc["deck_b_id"],
+                    doc["prior_matches"],
+                    doc["prior_wins"],
+                )
+                priors[prior_key(row.deck_a_id, row.deck_b_id)] = row
+        return priors
@@ -0,0 +1,155 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from ..core.config import config
+from ..core.data_versions import data_version_marker
+from ..core.logger import logger
+from .id_allocator import id_allocator
+from .mongodb import db
+
+
+class WriteBufferFull(Exception):
+    """写入缓冲区已满（数据库写入跟不上提交速度）"""
+
+
+_PendingItem = Tuple[Dict[str, Any], asyncio.Future]
+
+
+class MatchResultWriteBuffer:
+    """
+    单条对局提交的合并写入缓冲区
+
+    请求把待写入的文档放入有界队列后等待结果；后台任务最多等待 max_delay_ms
+    或攒够 max_batch_size 条后，从 ID 分配器批量取 ID 并用 insert_many 一次写入，
+    再把各自的记录交还给对应的请求。队列满时提交方最多等待
+    submit_timeout 秒，超时抛出 WriteBufferFull，由接口返回 503。
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 100,
+        max_delay_ms: float = 5.0,
+        max_pending: int = 1000,
+        submit_timeout: float = 2.0,
+    ):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay_ms / 1000
+        self.max_pending = max_pending
+        self.submit_timeout = submit_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls) -> "MatchResultWriteBuffer":
+        options = config["mongodb"].get("write_buffer") or {}
+        return cls(
+            max_batch_size=options.get("max_batch_size", 100),
+            max_delay_ms=options.get("max_delay_ms", 5.0),
+            max_pending=options.get("max_pending", 1000),
+            submit_timeout=options.get("submit_timeout_seconds", 2.0),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._worker = asyncio.create_task(self._run())
+        logger.info(
+            f"对局写入缓冲已启动: batch={self.max_batch_size}, "
+            f"delay={self.max_delay * 1000:g}ms, pending={self.max_pending}"
+        )
+
+    async def stop(self):
+        """停止后台任务，已入队的提交会先全部写入"""
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None
+
+    async def submit(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """提交一条对局记录，返回写入后带 id 的文档"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(
+                self._queue.put((document, future)), timeout=self.submit_timeout
+            )
+        except asyncio.TimeoutError:
+            raise WriteBufferFull("对局写入繁忙，请稍后重试")
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch: List[_PendingItem] = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            # 写入完成前不再取下一批，数据库变慢时队列会自然积压形成背压
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[_PendingItem]):
+        documents = []
+        try:
+            ids = await id_allocator.allocate("match_result_id", len(batch))
+            for (document, _), match_result_id in zip(batch, ids):
+                documents.append({**document, "id": match_result_id})
+            await db.match_results.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # 无序写入时部分文档可能已成功，只让失败的请求报错
+            failed = {
+                error["index"]: error for error in e.details.get("writeErrors", [])
+            }
+            for index, (_, future) in enumerate(batch):
+                if future.done():
+                    continue
+                if index in failed:
+                    future.set_exception(Exception(failed[index].get("errmsg", str(e))))
+                else:
+                    future.set_result(documents[index])
+            logger.error(f"批量写入对局部分失败: {len(failed)}/{len(batch)}")
+            data_version_marker.mark(
+                document["environment_id"]
+                for index, document in enumerate(documents)
+                if index not in failed
+            )
+            return
+        except Exception as e:
+            logger.error(f"批量写入对局失败: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for document, (_, future) in zip(documents, batch):
+            # 请求可能已经断开（future 被取消），记录仍然保留
+            if not future.done():
+                future.set_result(document)
+        data_version_marker.mark(document["environment_id"] for document in documents)
+
+
+write_buffer = MatchResultWriteBuffer.from_config()
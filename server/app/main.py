@@ -1,28 +1,71 @@
 from contextlib import asynccontextmanager
+from typing import Dict
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from .api.endpoints import (
     auth,
     decks,
     environments,
+    jobs,
     match_results,
     match_types,
+    metrics,
     statistics,
+    system,
     users,
     win_rates,
     prior_knowledge,
 )
+from .core.calculation_jobs import resume_calculation_jobs
 from .core.config import config
+from .core.deletion_jobs import resume_deletion_jobs
+from .core.logger import logger
+from .core.metrics import HTTP_REQUEST_DB_QUERIES, HTTP_REQUEST_DURATION
+from .core.data_versions import data_version_marker
+from .core.live_updates import live_updates
+from .core.snapshots import snapshot_scheduler
+from .core.tracing import (
+    begin_trace,
+    server_timing_enabled,
+    server_timing_header,
+    slow_request_seconds,
+)
+from .db.command_monitor import (
+    begin_request,
+    command_monitor,
+    debug_header_enabled,
+)
+from .db.migrations import MigrationLockHeld, run_migrations
 from .db.mongodb import db
+from .db.write_buffer import write_buffer
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db.connect_to_database()
+    if (config["mongodb"].get("migrations") or {}).get("run_on_startup", True):
+        try:
+            await run_migrations(db.db)
+        except MigrationLockHeld:
+            # 多个 worker 同时启动时只有一个执行迁移
+            logger.info("其他进程正在执行数据迁移，跳过")
+    await resume_deletion_jobs()
+    await resume_calculation_jobs()
+    if (config.get("snapshots") or {}).get("enabled", True):
+        await snapshot_scheduler.start()
+    if (config["mongodb"].get("write_buffer") or {}).get("enabled", False):
+        await write_buffer.start()
     yield
+    await live_updates.stop()
+    await snapshot_scheduler.stop()
+    await write_buffer.stop()
+    # 缓冲区落库后再写入剩余的数据版本变更
+    await data_version_marker.stop()
     await db.close_database_connection()
+    # 等待队列中的日志写完
+    await logger.complete()
 
 
 app = FastAPI(
@@ -41,19 +84,92 @@ app.add_middleware(
     allow_headers=config["cors"]["allow_headers"],
 )
 
+
+# 路由对象 -> 带前缀的路径模板，用作指标中的路由标签
+ROUTE_TEMPLATES: Dict[int, str] = {}
+
+
+def route_template(request: Request) -> str:
+    """请求匹配到的路由模板；未匹配到路由的请求合并为一个标签，避免指标基数失控"""
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    return ROUTE_TEMPLATES.get(id(route), route.path)
+
+
+def include_router(router, prefix: str = "", **kwargs):
+    app.include_router(router, prefix=prefix, **kwargs)
+    for route in router.routes:
+        ROUTE_TEMPLATES[id(route)] = prefix + route.path
+
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    """记录每个请求的耗时、各阶段耗时和数据库命令数，按路由汇总"""
+    stats = begin_request()
+    trace = begin_trace()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        route_path = route_template(request)
+        elapsed = trace.elapsed
+        HTTP_REQUEST_DURATION.observe(
+            elapsed,
+            method=request.method,
+            route=route_path,
+            status=status_code,
+        )
+        HTTP_REQUEST_DB_QUERIES.observe(
+            stats.count, method=request.method, route=route_path
+        )
+        if route_path != "unmatched":
+            command_monitor.record_route(f"{request.method} {route_path}", stats)
+        if elapsed >= slow_request_seconds():
+            logger.bind(
+                event="slow_request",
+                method=request.method,
+                route=route_path,
+                status=status_code,
+                duration_ms=round(elapsed * 1000, 1),
+                spans_ms={
+                    name: round(duration * 1000, 1)
+                    for name, duration in trace.spans.items()
+                },
+                db_queries=stats.count,
+                db_ms=round(stats.duration * 1000, 1),
+            ).warning(
+                f"慢请求: {request.method} {route_path} {status_code} "
+                f"耗时 {elapsed * 1000:.1f}ms，数据库命令 {stats.count} 次"
+            )
+    if server_timing_enabled():
+        response.headers["Server-Timing"] = server_timing_header(
+            trace, {"mongo": stats.duration}
+        )
+    if debug_header_enabled():
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Query-Time"] = f"{stats.duration * 1000:.1f}ms"
+    return response
+
+
 # 注册路由
-app.include_router(auth.router, prefix="/api/v1", tags=["auth"])
-app.include_router(
+if (config.get("metrics") or {}).get("enabled", True):
+    include_router(metrics.router, tags=["metrics"])
+include_router(auth.router, prefix="/api/v1", tags=["auth"])
+include_router(
     environments.router, prefix="/api/v1/environments", tags=["environments"]
 )
-app.include_router(decks.router, prefix="/api/v1/decks", tags=["decks"])
-app.include_router(
-    match_types.router, prefix="/api/v1/match-types", tags=["match-types"]
-)
-app.include_router(
+include_router(decks.router, prefix="/api/v1/decks", tags=["decks"])
+include_router(match_types.router, prefix="/api/v1/match-types", tags=["match-types"])
+include_router(
     match_results.router, prefix="/api/v1/match-results", tags=["match-results"]
 )
-app.include_router(statistics.router, prefix="/api/v1", tags=["statistics"])
-app.include_router(win_rates.router, prefix="/api/v1/win-rates", tags=["win-rates"])
-app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
-app.include_router(prior_knowledge.router, prefix="/api/v1/prior-knowledge", tags=["prior-knowledge"])
+include_router(statistics.router, prefix="/api/v1", tags=["statistics"])
+include_router(win_rates.router, prefix="/api/v1/win-rates", tags=["win-rates"])
+include_router(jobs.router, prefix="/api/v1/jobs", tags=["jobs"])
+include_router(users.router, prefix="/api/v1/users", tags=["users"])
+include_router(system.router, prefix="/api/v1/system", tags=["system"])
+include_router(
+    prior_knowledge.router, prefix="/api/v1/prior-knowledge", tags=["prior-knowledge"]
+)
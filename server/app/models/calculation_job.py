@@ -0,0 +1,39 @@
+from datetime import datetime
+from enum import Enum
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from .win_rate import WinRateCalculationResponse
+
+
+class CalculationJobStatus(str, Enum):
+    PENDING = "pending"  # 排队中
+    RUNNING = "running"  # 计算中
+    COMPLETED = "completed"  # 已完成
+    FAILED = "failed"  # 失败
+    CANCELLED = "cancelled"  # 已取消
+
+
+class CalculationJobCreate(BaseModel):
+    sensitivity: float = 30.0
+    prior_weight: float = 1.0
+    environment_id: Optional[int] = None
+    match_type_id: Optional[int] = None
+    all_environments: bool = False  # 为每个环境分别计算，忽略 environment_id
+
+
+class CalculationJob(BaseModel):
+    id: str
+    status: CalculationJobStatus
+    spec: CalculationJobCreate
+    environment_ids: List[Optional[int]]  # 需要计算的环境，None 表示不限环境
+    progress: int = 0  # 已完成的环境数
+    # 键为环境 ID（不限环境时为 "all"），没有可计算数据的环境为 None
+    result: Dict[str, Optional[WinRateCalculationResponse]] = {}
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    owner_id: str
+    created_at: datetime
+    updated_at: datetime
+    expires_at: Optional[datetime] = None  # 结束后保留到此时间
@@ -0,0 +1,25 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class DeletionJobStatus(str, Enum):
+    PENDING = "pending"  # 排队中或等待重试
+    RUNNING = "running"  # 删除中
+    COMPLETED = "completed"  # 已完成
+
+
+class DeletionJob(BaseModel):
+    id: str
+    kind: str  # deck 或 environment
+    target_id: int
+    status: DeletionJobStatus
+    deleted_matches: int = 0
+    total_matches: int = 0  # 创建任务时统计的对局数
+    error: Optional[str] = None  # 最近一次失败的原因
+    attempts: int = 0
+    retry_at: Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
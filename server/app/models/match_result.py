@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -25,3 +25,15 @@ class MatchResult(MatchResultBase):
 
 class BatchMatchResultCreate(BaseModel):
     match_results: List[MatchResultCreate]
+
+
+class MatchResultPartial(BaseModel):
+    """按字段投影返回的对局结果，未选择的字段不出现在响应中"""
+
+    id: int
+    environment_id: Optional[int] = None
+    first_deck_id: Optional[int] = None
+    second_deck_id: Optional[int] = None
+    winning_deck_id: Optional[int] = None
+    losing_deck_id: Optional[int] = None
+    match_type_id: Optional[int] = None
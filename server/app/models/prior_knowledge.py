@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict
+from typing import Dict, List
 
 class DeckMatchupPrior(BaseModel):
     deck_a_id: int
@@ -8,4 +8,7 @@ class DeckMatchupPrior(BaseModel):
     prior_wins: int     # 虚拟胜利次数
 
 class DeckMatchupPriorResponse(BaseModel):
-    matchup_priors: Dict[str, DeckMatchupPrior]  # key: "deck_a_id_deck_b_id" 
\ No newline at end of file
+    matchup_priors: Dict[str, DeckMatchupPrior]  # key: "deck_a_id_deck_b_id" 
+
+class BatchDeckMatchupPriorUpdate(BaseModel):
+    matchup_priors: List[DeckMatchupPrior]  # 整个矩阵或其中的部分单元格
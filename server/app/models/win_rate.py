@@ -1,4 +1,5 @@
-from typing import Dict, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -21,3 +22,20 @@ class WinRateCalculationRequest(BaseModel):
 class WinRateCalculationResponse(BaseModel):
     calculations: Dict[int, WinRateCalculation]
     sensitivity: float
+
+
+class WinRateSnapshot(BaseModel):
+    environment_id: int
+    match_type_id: Optional[int] = None  # None 表示不限比赛类型
+    data_version: int  # 计算时环境的数据版本
+    computed_at: datetime
+    sensitivity: float
+    prior_weight: float
+    total_matches: int
+    calculations: Dict[int, WinRateCalculation]
+    deck_statistics: List[Dict[str, Any]]  # 与 /statistics 返回的 deck_statistics 相同
+
+
+class LiveTicket(BaseModel):
+    ticket: str  # 一次性票据，作为 GET /win-rates/live 的 ticket 参数
+    expires_in: int  # 有效秒数
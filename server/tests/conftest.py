@@ -0,0 +1,77 @@
+"""
+测试使用的配置和数据库
+
+配置以 config.yaml.example 为基础改用内存后端，不依赖本地的 config.yaml；
+设置 ESU_TEST_MONGODB_URI 后，标记了 both_backends 的测试还会在真实的 MongoDB 上
+再运行一遍（每次使用新的临时数据库，结束后删除）。
+"""
+
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+import yaml
+
+_settings = yaml.safe_load(
+    (Path(__file__).parent.parent / "config.yaml.example").read_text(encoding="utf-8")
+)
+_settings["mongodb"].update(backend="memory", database="esu_test")
+_settings["mongodb"]["migrations"] = {"run_on_startup": False}
+_settings["logging"].update(enqueue=False, file={"enabled": False})
+_settings["snapshots"]["enabled"] = False
+with tempfile.NamedTemporaryFile(
+    "w", suffix=".yaml", delete=False, encoding="utf-8"
+) as _file:
+    yaml.safe_dump(_settings, _file, allow_unicode=True)
+os.environ["ESU_CONFIG"] = _file.name
+
+from app.api.deps import token_cache, user_cache  # noqa: E402
+from app.core.memberships import membership_cache  # noqa: E402
+from app.core.priors import prior_cache  # noqa: E402
+from app.db.backends import create_client  # noqa: E402
+from app.db.mongodb import MongoDB  # noqa: E402
+
+MONGODB_URI = os.environ.get("ESU_TEST_MONGODB_URI")
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "both_backends: 同时在真实 MongoDB 上运行（需 ESU_TEST_MONGODB_URI）"
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "backend" in metafunc.fixturenames:
+        backends = ["memory"]
+        if metafunc.definition.get_closest_marker("both_backends"):
+            backends.append(
+                pytest.param(
+                    "motor",
+                    marks=pytest.mark.skipif(
+                        not MONGODB_URI, reason="未设置 ESU_TEST_MONGODB_URI"
+                    ),
+                )
+            )
+        metafunc.parametrize("backend", backends)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def database(backend):
+    """连接新的空数据库并按启动流程建好集合和索引，测试结束后断开"""
+    for cache in (user_cache, token_cache, membership_cache, prior_cache):
+        cache.clear()
+    name = f"esu_test_{uuid.uuid4().hex[:8]}" if backend == "motor" else "esu_test"
+    MongoDB.client = create_client(backend, MONGODB_URI)
+    MongoDB.db = MongoDB.analytics_db = MongoDB.client[name]
+    await MongoDB._check_and_create_collections()
+    yield MongoDB.db
+    if backend == "motor":
+        await MongoDB.client.drop_database(name)
+    MongoDB.client.close()
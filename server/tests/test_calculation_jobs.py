@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from app.core import calculation_jobs
+from app.models.calculation_job import CalculationJobCreate
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def spawned(database, monkeypatch):
+    # 由测试驱动任务执行
+    spawned = []
+    monkeypatch.setattr(calculation_jobs, "_spawn", spawned.append)
+    return spawned
+
+
+async def test_cancel_during_calculation_discards_the_result(spawned, monkeypatch):
+    job = await calculation_jobs.enqueue_calculation(
+        CalculationJobCreate(environment_id=1), owner_id="u1"
+    )
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_calculation(*args, **kwargs):
+        started.set()
+        await release.wait()
+        raise calculation_jobs.InsufficientData()
+
+    monkeypatch.setattr(calculation_jobs, "calculate_win_rates", slow_calculation)
+    task = asyncio.create_task(calculation_jobs._run(job["id"]))
+    await started.wait()
+    cancelling = await calculation_jobs.cancel_calculation_job(job["id"])
+    assert (cancelling["status"], cancelling["cancel_requested"]) == ("running", True)
+
+    release.set()
+    await task
+    finished = await calculation_jobs.get_calculation_job(job["id"])
+    assert finished["status"] == "cancelled"
+    assert (finished["result"], finished["progress"]) == ({}, 0)
+
+
+async def test_uncancelled_job_stores_its_result(spawned, monkeypatch):
+    job = await calculation_jobs.enqueue_calculation(
+        CalculationJobCreate(environment_id=1), owner_id="u1"
+    )
+
+    async def no_data(*args, **kwargs):
+        raise calculation_jobs.InsufficientData()
+
+    monkeypatch.setattr(calculation_jobs, "calculate_win_rates", no_data)
+    await calculation_jobs._run(job["id"])
+    finished = await calculation_jobs.get_calculation_job(job["id"])
+    assert finished["status"] == "completed"
+    assert (finished["result"], finished["progress"]) == ({"1": None}, 1)
@@ -0,0 +1,134 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.api.deps import get_current_admin
+from app.core import deletion_jobs
+from app.main import app
+
+pytestmark = pytest.mark.anyio
+
+DECK_ID = 1
+
+
+@pytest.fixture
+async def seeded(database, monkeypatch):
+    monkeypatch.setattr(deletion_jobs, "BATCH_SIZE", 4)
+    # 由测试驱动任务执行
+    spawned = []
+    monkeypatch.setattr(
+        deletion_jobs, "_spawn", lambda job_id, delay=0: spawned.append(job_id)
+    )
+    await database.decks.insert_many(
+        [
+            {"id": deck_id, "name": str(deck_id), "environment_id": 1, "author_id": "a"}
+            for deck_id in (1, 2, 3)
+        ]
+    )
+    await database.match_results.insert_many(
+        [
+            {
+                "id": match_id,
+                "environment_id": 1,
+                "match_type_id": 1,
+                # 被删卡组轮流出现在四个字段中，每 5 局有一局与它无关
+                "first_deck_id": DECK_ID if match_id % 5 == 1 else 2,
+                "second_deck_id": DECK_ID if match_id % 5 == 2 else 3,
+                "winning_deck_id": DECK_ID if match_id % 5 == 3 else 2,
+                "losing_deck_id": DECK_ID if match_id % 5 == 4 else 3,
+            }
+            for match_id in range(1, 31)
+        ]
+    )
+    return spawned
+
+
+@pytest.fixture
+async def client():
+    app.dependency_overrides[get_current_admin] = lambda: None
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.pop(get_current_admin)
+
+
+async def _poll(client, job_id):
+    response = await client.get(f"/api/v1/decks/deletion-jobs/{job_id}")
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_poll_while_running(seeded, client, database):
+    job = await deletion_jobs.enqueue_deletion("deck", DECK_ID)
+    assert job["total_matches"] == 24
+    task = asyncio.create_task(deletion_jobs._run(job["id"]))
+    while True:
+        polled = await _poll(client, job["id"])
+        if polled["deleted_matches"]:
+            break
+        await asyncio.sleep(0.01)
+    assert polled["status"] == "running"
+    # 断点等内部状态不对外返回
+    assert not {"field", "last_match_id", "lease_expires_at"} & polled.keys()
+
+    await task
+    polled = await _poll(client, job["id"])
+    assert (polled["status"], polled["deleted_matches"]) == ("completed", 24)
+    assert await database.match_results.count_documents({}) == 6
+    assert await database.decks.count_documents({"id": DECK_ID}) == 0
+
+
+async def test_failure_resumes_from_checkpoint(seeded, client, database, monkeypatch):
+    delete_target = deletion_jobs._delete_target
+
+    async def failing(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(deletion_jobs, "_delete_target", failing)
+    job = await deletion_jobs.enqueue_deletion("deck", DECK_ID)
+    await deletion_jobs._run(job["id"])
+    polled = await _poll(client, job["id"])
+    assert (polled["status"], polled["error"], polled["attempts"]) == (
+        "pending",
+        "boom",
+        1,
+    )
+    stored = await database.deletion_jobs.find_one({"id": job["id"]})
+    assert stored["field"] == "losing_deck_id"
+
+    monkeypatch.setattr(deletion_jobs, "_delete_target", delete_target)
+    await database.deletion_jobs.update_one(
+        {"id": job["id"]}, {"$set": {"retry_at": None}}
+    )
+    await deletion_jobs._run(job["id"])
+    polled = await _poll(client, job["id"])
+    assert (polled["status"], polled["deleted_matches"]) == ("completed", 24)
+
+
+async def test_failed_status_update_waits_for_the_lease(seeded, monkeypatch):
+    job = await deletion_jobs.enqueue_deletion("deck", DECK_ID)
+
+    async def failing(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(deletion_jobs, "_delete_target", failing)
+    jobs = deletion_jobs._jobs()
+    update_one = jobs.update_one
+
+    async def update_unless_failing(query, update):
+        if update.get("$set", {}).get("status") == "pending":
+            raise RuntimeError("database unavailable")
+        return await update_one(query, update)
+
+    monkeypatch.setattr(jobs, "update_one", update_unless_failing)
+    monkeypatch.setattr(deletion_jobs, "_jobs", lambda: jobs)
+    delays = []
+    monkeypatch.setattr(
+        deletion_jobs, "_spawn", lambda job_id, delay=0: delays.append(delay)
+    )
+    await deletion_jobs._run(job["id"])
+    # 状态仍为 running，租约过期后再由 _claim 接手
+    stored = await jobs.find_one({"id": job["id"]})
+    assert stored["status"] == "running"
+    assert delays == [deletion_jobs.LEASE_SECONDS]
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from app.db.id_allocator import IdAllocator
+
+pytestmark = [pytest.mark.anyio, pytest.mark.both_backends]
+
+
+async def test_concurrent_workers_get_unique_ids(database):
+    # 三个分配器模拟三个 worker，各自并发地发放单个 ID 和批量 ID
+    workers = [IdAllocator(block_size=7) for _ in range(3)]
+
+    async def single(allocator):
+        return [await allocator.next_id("match_result_id")]
+
+    async def batch(allocator):
+        return await allocator.allocate("match_result_id", 12)
+
+    results = await asyncio.gather(
+        *((single if i % 2 else batch)(workers[i % len(workers)]) for i in range(60))
+    )
+    ids = [match_id for result in results for match_id in result]
+    assert len(ids) == 30 * 12 + 30
+    assert len(set(ids)) == len(ids)
+
+    counter = await database.counters.find_one({"name": "match_result_id"})
+    assert max(ids) <= counter["seq"]
+
+
+async def test_block_is_served_locally(database):
+    allocator = IdAllocator(block_size=10)
+    assert [await allocator.next_id("deck_id") for _ in range(10)] == list(range(1, 11))
+    counter = await database.counters.find_one({"name": "deck_id"})
+    assert counter["seq"] == 10
+
+
+async def test_large_batch_leases_what_it_needs(database):
+    allocator = IdAllocator(block_size=5, block_sizes={"deck_id": 3})
+    first = await allocator.next_id("deck_id")
+    # 当前区间剩余 2 个，不足部分一次租用，不按区间大小反复租用
+    assert await allocator.allocate("deck_id", 20) == list(range(first + 1, first + 21))
+    counter = await database.counters.find_one({"name": "deck_id"})
+    assert counter["seq"] == 3 + 18
+
+
+async def test_workers_do_not_overlap(database):
+    a, b = IdAllocator(block_size=4), IdAllocator(block_size=4)
+    ids_a = await a.allocate("environment_id", 3)
+    ids_b = await b.allocate("environment_id", 3)
+    ids_a += await a.allocate("environment_id", 3)
+    assert ids_a == [1, 2, 3, 4, 9, 10]
+    assert ids_b == [5, 6, 7]
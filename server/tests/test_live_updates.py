@@ -0,0 +1,270 @@
+import asyncio
+from datetime import datetime
+
+import httpx
+import numpy as np
+import pytest
+
+from app.api.deps import invalidate_user
+from app.api.endpoints import win_rates
+from app.core.data_versions import bump_data_version
+from app.core.live_updates import (
+    SUBSCRIBER_QUEUE_SIZE,
+    LiveUpdateHub,
+    _Channel,
+    _diff,
+    matchup_cells,
+)
+from app.core.memberships import add_member
+from app.core.stream_tickets import issue_ticket, redeem_ticket
+from app.db.repositories import MatchArrays
+from app.main import app
+
+ENVIRONMENT_ID = 1
+CELL_FIELDS = [
+    "total",
+    "wins",
+    "first_hand_total",
+    "first_hand_wins",
+    "second_hand_total",
+    "second_hand_wins",
+]
+
+
+def _arrays(rows):
+    """rows 为 (winner, loser, first, second)"""
+    return MatchArrays(*(np.array(column, dtype=np.int64) for column in zip(*rows)))
+
+
+def _random_rows(seed: int, count: int, deck_count: int = 5):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for _ in range(count):
+        a, b = (int(deck_id) for deck_id in rng.integers(1, deck_count + 1, 2))
+        winner, loser = (a, b) if rng.random() < 0.5 else (b, a)
+        # 约五分之一的对局没有先后手信息
+        first, second = (0, 0) if rng.random() < 0.2 else (a, b)
+        rows.append((winner, loser, first, second))
+    return rows
+
+
+def test_matchup_cells_example():
+    cells = matchup_cells(
+        _arrays(
+            [
+                (1, 2, 1, 2),
+                (2, 1, 1, 2),
+                (1, 2, 0, 0),
+                # 同卡组对局只计一次胜场
+                (3, 3, 3, 3),
+            ]
+        )
+    )
+    assert cells == {
+        "1_2": {
+            "total": 3,
+            "wins": 2,
+            "first_hand_total": 2,
+            "first_hand_wins": 1,
+            "second_hand_total": 0,
+            "second_hand_wins": 0,
+        },
+        "2_1": {
+            "total": 3,
+            "wins": 1,
+            "first_hand_total": 0,
+            "first_hand_wins": 0,
+            "second_hand_total": 2,
+            "second_hand_wins": 1,
+        },
+        "3_3": {
+            "total": 1,
+            "wins": 1,
+            "first_hand_total": 1,
+            "first_hand_wins": 1,
+            "second_hand_total": 0,
+            "second_hand_wins": 0,
+        },
+    }
+
+
+def test_matchup_cells_empty():
+    empty = MatchArrays(*(np.empty(0, dtype=np.int64) for _ in range(4)))
+    assert matchup_cells(empty) == {}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("hand", [None, "first", "second"])
+@pytest.mark.parametrize("seed", range(3))
+async def test_matchup_cells_agree_with_deck_matchups(database, seed, hand):
+    rows = _random_rows(seed, count=300)
+    await database.environments.insert_one({"id": ENVIRONMENT_ID, "name": "env"})
+    await database.decks.insert_many(
+        [
+            {
+                "id": deck_id,
+                "name": f"deck {deck_id}",
+                "environment_id": ENVIRONMENT_ID,
+                "author_id": "a",
+            }
+            for deck_id in range(1, 6)
+        ]
+    )
+    await database.match_results.insert_many(
+        [
+            {
+                "id": match_id,
+                "environment_id": ENVIRONMENT_ID,
+                "match_type_id": 1,
+                "winning_deck_id": winner,
+                "losing_deck_id": loser,
+                "first_deck_id": first,
+                "second_deck_id": second,
+            }
+            for match_id, (winner, loser, first, second) in enumerate(rows, start=1)
+        ]
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        params = {"environment_id": ENVIRONMENT_ID}
+        if hand:
+            params["hand"] = hand
+        response = await client.get("/api/v1/deck-matchups", params=params)
+    assert response.status_code == 200
+    expected = {
+        f"{deck_id}_{opponent_id}": {field: stats[field] for field in CELL_FIELDS}
+        for deck_id, deck in response.json()["matchup_statistics"].items()
+        for opponent_id, stats in deck["matchups"].items()
+    }
+    assert matchup_cells(_arrays(rows), hand) == expected
+
+
+def test_diff():
+    old = {"a": 1, "b": {"x": 1}, "c": 3}
+    new = {"a": 1, "b": {"x": 2}, "d": 4}
+    assert _diff(old, new) == {"b": {"x": 2}, "c": None, "d": 4}
+    assert _diff(new, new) == {}
+    assert _diff({}, new) == new
+
+
+@pytest.mark.anyio
+async def test_hub_sends_snapshot_then_only_changed_entries(database):
+    await database.decks.insert_many(
+        [
+            {
+                "id": deck_id,
+                "name": str(deck_id),
+                "environment_id": ENVIRONMENT_ID,
+                "author_id": "a",
+            }
+            for deck_id in (1, 2, 3)
+        ]
+    )
+
+    async def play(match_id, winner, loser):
+        await database.match_results.insert_one(
+            {
+                "id": match_id,
+                "environment_id": ENVIRONMENT_ID,
+                "match_type_id": 1,
+                "winning_deck_id": winner,
+                "losing_deck_id": loser,
+                "first_deck_id": winner,
+                "second_deck_id": loser,
+            }
+        )
+        await bump_data_version([ENVIRONMENT_ID])
+
+    await play(1, 1, 2)
+    hub = LiveUpdateHub(poll_seconds=3600, debounce_seconds=0)
+    async with hub.subscribe(ENVIRONMENT_ID) as queue:
+        # 由测试逐轮驱动，不使用后台轮询
+        await hub.stop()
+        assert await hub.run_once() == 1
+        event, snapshot = queue.get_nowait()
+        assert event == "snapshot"
+        assert set(snapshot["matchups"]) == {"1_2", "2_1"}
+
+        # 版本未变化时不重新计算
+        assert await hub.run_once() == 0
+
+        await play(2, 3, 1)
+        assert await hub.run_once() == 1
+        event, delta = queue.get_nowait()
+        assert event == "delta"
+        assert delta["data_version"] == snapshot["data_version"] + 1
+        # 1 对 2 的单元格没有变化，不在增量中
+        assert set(delta["matchups"]) == {"1_3", "3_1"}
+        assert queue.empty()
+
+        # 新订阅者立即收到当前的完整状态
+        async with hub.subscribe(ENVIRONMENT_ID) as late:
+            event, state = late.get_nowait()
+            assert event == "snapshot"
+            assert set(state["matchups"]) == {"1_2", "2_1", "1_3", "3_1"}
+            assert hub.subscriber_count == 2
+    assert hub.subscriber_count == 0
+
+
+def test_slow_subscriber_gets_a_fresh_snapshot():
+    hub = LiveUpdateHub()
+    channel = _Channel()
+    channel.state, channel.version = {"win_rates": {}, "matchups": {}}, 7
+    queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    for version in range(SUBSCRIBER_QUEUE_SIZE + 1):
+        hub._publish(channel, queue, ("delta", {"data_version": version}))
+    # 积压溢出后丢弃所有增量，只剩一个完整状态
+    assert queue.qsize() == 1
+    assert queue.get_nowait() == (
+        "snapshot",
+        {"data_version": 7, "win_rates": {}, "matchups": {}},
+    )
+
+
+@pytest.mark.anyio
+async def test_stream_tickets_are_single_use_and_scoped(database):
+    ticket = await issue_ticket("a@example.com", ENVIRONMENT_ID, 2)
+    assert await redeem_ticket(ticket, ENVIRONMENT_ID, None) is None
+    assert await redeem_ticket(ticket, ENVIRONMENT_ID, 2) == "a@example.com"
+    assert await redeem_ticket(ticket, ENVIRONMENT_ID, 2) is None
+    assert await redeem_ticket("forged", ENVIRONMENT_ID, 2) is None
+
+
+@pytest.mark.anyio
+async def test_stream_closes_when_access_is_lost(database, monkeypatch):
+    hub = LiveUpdateHub(poll_seconds=3600)
+    monkeypatch.setattr(win_rates, "live_updates", hub)
+    monkeypatch.setattr(win_rates, "HEARTBEAT_SECONDS", 0.01)
+    await database.environments.insert_one({"id": ENVIRONMENT_ID, "name": "env"})
+    await database.match_types.insert_one(
+        {"id": 2, "name": "private", "is_private": True, "invite_code": "a"}
+    )
+    now = datetime.utcnow()
+    user = await database.users.insert_one(
+        {
+            "email": "a@example.com",
+            "name": "a",
+            "role": "player",
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+    await add_member(2, str(user.inserted_id))
+
+    response = await win_rates.subscribe_live_statistics(
+        environment_id=ENVIRONMENT_ID,
+        match_type_id=2,
+        ticket=await issue_ticket("a@example.com", ENVIRONMENT_ID, 2),
+        token=None,
+    )
+    stream = response.body_iterator
+    # 仍有权限时只收到心跳（或状态）
+    for _ in range(3):
+        assert "revoked" not in await stream.__anext__()
+
+    await database.users.delete_one({"_id": user.inserted_id})
+    invalidate_user("a@example.com")
+    chunks = [chunk async for chunk in stream]
+    assert chunks[-1].startswith("event: revoked")
+    assert hub.subscriber_count == 0
+    await hub.stop()
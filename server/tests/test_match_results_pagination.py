@@ -0,0 +1,74 @@
+import httpx
+import pytest
+
+from app.main import app
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client(database):
+    await database.match_results.insert_many(
+        [
+            {
+                "id": match_id,
+                "environment_id": 1 if match_id % 3 else 2,
+                "match_type_id": 1,
+                "first_deck_id": 1,
+                "second_deck_id": 2,
+                "winning_deck_id": 1 if match_id % 2 else 2,
+                "losing_deck_id": 2 if match_id % 2 else 1,
+            }
+            # 乱序写入，分页仍应按 id 升序
+            for match_id in [5, 3, 11, 1, 8, 2, 10, 4, 9, 7, 6, 12]
+        ]
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+async def _pages(client, **params):
+    ids, after_id, pages = [], None, 0
+    while True:
+        query = dict(params, **({"after_id": after_id} if after_id else {}))
+        response = await client.get("/api/v1/match-results/", params=query)
+        assert response.status_code == 200
+        ids += [row["id"] for row in response.json()]
+        pages += 1
+        after_id = response.headers.get("X-Next-After-Id")
+        if after_id is None:
+            return ids, pages
+
+
+async def test_pages_cover_all_ids_in_order(client):
+    ids, pages = await _pages(client, limit=5)
+    assert ids == list(range(1, 13))
+    assert pages == 3
+
+
+async def test_full_last_page_ends_with_an_empty_page(client):
+    # 条数恰好是 limit 的整数倍时，最后一页仍返回游标，下一页为空
+    ids, pages = await _pages(client, limit=4)
+    assert ids == list(range(1, 13))
+    assert pages == 4
+
+
+async def test_filters_apply_before_the_cursor(client):
+    ids, _ = await _pages(client, limit=2, environment_id=2)
+    assert ids == [3, 6, 9, 12]
+
+
+async def test_fields_projection(client):
+    response = await client.get(
+        "/api/v1/match-results/", params={"limit": 2, "fields": "winning_deck_id"}
+    )
+    assert response.json() == [
+        {"id": 1, "winning_deck_id": 1},
+        {"id": 2, "winning_deck_id": 2},
+    ]
+
+
+async def test_unknown_fields_are_rejected(client):
+    response = await client.get("/api/v1/match-results/", params={"fields": "secret"})
+    assert response.status_code == 400
@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import httpx
+import pytest
+
+from app.api.deps import get_current_user_or_guest
+from app.core.memberships import add_member
+from app.main import app
+from app.models.user import UserInDB, UserRole
+
+pytestmark = pytest.mark.anyio
+
+
+def _user(role: UserRole) -> UserInDB:
+    now = datetime.utcnow()
+    return UserInDB(
+        id="u1",
+        email="u1@example.com",
+        name="u1",
+        role=role,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+@pytest.fixture
+async def client(database):
+    # 启动时已创建默认的公开比赛类型 1
+    await database.match_types.insert_many(
+        [
+            {"id": 2, "name": "joined", "is_private": True, "invite_code": "a"},
+            {"id": 3, "name": "other", "is_private": True, "invite_code": "b"},
+        ]
+    )
+    await add_member(2, "u1")
+    await add_member(2, "u2")
+    await add_member(3, "u2")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+
+
+async def _list(client, role):
+    app.dependency_overrides[get_current_user_or_guest] = lambda: _user(role)
+    response = await client.get("/api/v1/match-types/")
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_list_omits_members(client):
+    listed = await _list(client, UserRole.PLAYER)
+    assert [mt["id"] for mt in listed] == [1, 2]
+    assert all("users" not in mt for mt in listed)
+    assert [mt["id"] for mt in await _list(client, UserRole.ADMIN)] == [1, 2, 3]
+    guest = await _list(client, UserRole.GUEST)
+    assert [(mt["id"], mt["invite_code"]) for mt in guest] == [(1, None)]
+
+
+async def test_single_match_type_returns_members(client):
+    app.dependency_overrides[get_current_user_or_guest] = lambda: _user(UserRole.PLAYER)
+    response = await client.get("/api/v1/match-types/2")
+    assert response.status_code == 200
+    assert response.json()["users"] == ["u1", "u2"]
+    assert (await client.get("/api/v1/match-types/3")).status_code == 403
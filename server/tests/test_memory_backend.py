@@ -0,0 +1,342 @@
+"""
+内存后端与 MongoDB 行为一致性
+
+全部用例标记了 both_backends：设置 ESU_TEST_MONGODB_URI 后会在真实的 MongoDB 上
+以相同的断言再运行一遍，两边结果不一致即说明内存后端的实现有偏差。
+"""
+
+import pytest
+from pymongo import DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.db.repositories import (
+    DeckRepository,
+    MatchResultRepository,
+    MatchRow,
+    PriorRepository,
+    PriorRow,
+)
+
+pytestmark = [pytest.mark.anyio, pytest.mark.both_backends]
+
+MATCHES = [
+    # (id, environment_id, match_type_id, winner, loser, first, second)
+    (1, 1, 1, 1, 2, 1, 2),
+    (2, 1, 1, 2, 1, 1, 2),
+    (3, 1, 2, 1, 3, 3, 1),
+    (4, 2, 1, 4, 5, 0, 0),
+    (5, 1, 1, 3, 3, 3, 3),
+]
+
+
+@pytest.fixture
+async def seeded(database):
+    await database.decks.insert_many(
+        [
+            {"id": 1, "name": "alpha", "environment_id": 1, "author_id": "a"},
+            {"id": 2, "name": "beta", "environment_id": 1, "author_id": "a"},
+            {"id": 3, "name": "gamma", "environment_id": 1, "author_id": "b"},
+            {"id": 4, "name": "delta", "environment_id": 2, "author_id": "b"},
+            {
+                "id": 5,
+                "name": "tombstone",
+                "environment_id": 2,
+                "author_id": "b",
+                "deleted": True,
+            },
+        ]
+    )
+    await database.match_results.insert_many(
+        [
+            {
+                "id": match_id,
+                "environment_id": environment_id,
+                "match_type_id": match_type_id,
+                "winning_deck_id": winner,
+                "losing_deck_id": loser,
+                "first_deck_id": first,
+                "second_deck_id": second,
+            }
+            for match_id, environment_id, match_type_id, winner, loser, first, second in MATCHES
+        ]
+    )
+    await database.deck_matchup_priors.insert_many(
+        [
+            {
+                "deck_a_id": 1,
+                "deck_b_id": 2,
+                "environment_id": 1,
+                "prior_matches": 10,
+                "prior_wins": 6,
+            },
+            {
+                "deck_a_id": 1,
+                "deck_b_id": 3,
+                "environment_id": 1,
+                "prior_matches": 4,
+                "prior_wins": 1,
+            },
+            {
+                "deck_a_id": 4,
+                "deck_b_id": 5,
+                "environment_id": 2,
+                "prior_matches": 8,
+                "prior_wins": 8,
+            },
+        ]
+    )
+    return database
+
+
+# ------------------------------------------------------------ 仓储
+
+
+async def test_deck_repository_hides_tombstones(seeded):
+    decks = DeckRepository(seeded)
+    assert sorted(deck.id for deck in await decks.list_decks()) == [1, 2, 3, 4]
+    assert await decks.names(2) == {4: "delta"}
+    assert await decks.environment_ids([1, 4, 5, 99]) == {1: 1, 4: 2}
+
+
+async def test_match_repository_rows_and_arrays_agree(seeded):
+    matches = MatchResultRepository(seeded)
+    query = {"environment_id": 1, "match_type_id": 1}
+    rows = await matches.fetch_deck_rows(query)
+    assert sorted(rows) == sorted(
+        [MatchRow(1, 2, 1, 2), MatchRow(2, 1, 1, 2), MatchRow(3, 3, 3, 3)]
+    )
+    arrays = await matches.fetch_deck_arrays(query)
+    assert len(arrays) == 3
+    assert sorted(
+        zip(
+            arrays.winning_deck_id.tolist(),
+            arrays.losing_deck_id.tolist(),
+            arrays.first_deck_id.tolist(),
+            arrays.second_deck_id.tolist(),
+        )
+    ) == sorted(tuple(row) for row in rows)
+
+    empty = await matches.fetch_deck_arrays({"environment_id": 99})
+    assert len(empty) == 0 and empty.winning_deck_id.dtype.kind == "i"
+
+
+async def test_prior_repository_filters(seeded):
+    priors = PriorRepository(seeded)
+    assert await priors.fetch_rows(environment_id=1) == {
+        "1_2": PriorRow(1, 2, 10, 6),
+        "1_3": PriorRow(1, 3, 4, 1),
+    }
+    assert await priors.fetch_rows(deck_ids=[1, 2, 4]) == {"1_2": PriorRow(1, 2, 10, 6)}
+
+
+# ------------------------------------------------------------ 查询与分页
+
+
+async def test_sort_skip_limit(seeded):
+    cursor = (
+        seeded.match_results.find({"environment_id": 1}, {"_id": 0, "id": 1})
+        .sort([("winning_deck_id", -1), ("id", 1)])
+        .skip(1)
+        .limit(2)
+    )
+    assert await cursor.to_list(length=None) == [{"id": 2}, {"id": 1}]
+
+
+async def test_cursor_iterates_across_batches(seeded):
+    ids = [
+        doc["id"]
+        async for doc in seeded.match_results.find({}, {"id": 1})
+        .sort("id", 1)
+        .batch_size(2)
+    ]
+    assert ids == [1, 2, 3, 4, 5]
+
+
+async def test_query_operators(seeded):
+    async def ids(query):
+        docs = await seeded.decks.find(query, {"_id": 0, "id": 1}).to_list(None)
+        return sorted(doc["id"] for doc in docs)
+
+    assert await ids({"deleted": {"$ne": True}}) == [1, 2, 3, 4]
+    assert await ids({"deleted": None}) == [1, 2, 3, 4]
+    assert await ids({"deleted": {"$exists": True}}) == [5]
+    assert await ids({"id": {"$in": [2, 4, 6]}, "author_id": "b"}) == [4]
+    assert await ids({"$or": [{"id": {"$lt": 2}}, {"name": "gamma"}]}) == [1, 3]
+    assert await ids({"id": {"$gte": 2, "$nin": [3]}}) == [2, 4, 5]
+    assert await seeded.decks.count_documents({"environment_id": 1}) == 3
+    assert sorted(await seeded.decks.distinct("author_id")) == ["a", "b"]
+
+
+# ------------------------------------------------------------ 写入
+
+
+async def test_update_operators_and_upserts(database):
+    counters = database.get_collection("test_counters")
+    # upsert 时以条件中的等值字段作为新文档的初始值
+    await counters.update_one(
+        {"name": "a"},
+        {"$inc": {"seq": 5}, "$setOnInsert": {"created": True}},
+        upsert=True,
+    )
+    await counters.update_one(
+        {"name": "a"},
+        {"$inc": {"seq": 5}, "$setOnInsert": {"created": False}},
+        upsert=True,
+    )
+    doc = await counters.find_one({"name": "a"}, {"_id": 0})
+    assert doc == {"name": "a", "seq": 10, "created": True}
+
+    await counters.update_one(
+        {"name": "a"}, {"$min": {"seq": 3}, "$unset": {"created": ""}}
+    )
+    after = await counters.find_one_and_update(
+        {"name": "a"},
+        {"$inc": {"seq": 1}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+    assert after == {"name": "a", "seq": 4}
+    assert (
+        await counters.find_one_and_update({"name": "missing"}, {"$set": {"x": 1}})
+        is None
+    )
+
+
+async def test_unique_index_violations(seeded):
+    with pytest.raises(DuplicateKeyError):
+        await seeded.decks.insert_one(
+            {"id": 1, "name": "dup", "environment_id": 1, "author_id": "a"}
+        )
+    with pytest.raises(DuplicateKeyError):
+        await seeded.decks.update_one({"id": 2}, {"$set": {"id": 1}})
+    assert await seeded.decks.count_documents({"id": 1}) == 1
+
+
+async def test_unordered_insert_many_keeps_going(seeded):
+    with pytest.raises(BulkWriteError) as error:
+        await seeded.match_results.insert_many(
+            [{"id": 10}, {"id": 1}, {"id": 11}, {"id": 2}], ordered=False
+        )
+    details = error.value.details
+    assert details["nInserted"] == 2
+    assert [e["index"] for e in details["writeErrors"]] == [1, 3]
+    assert all(e["code"] == 11000 for e in details["writeErrors"])
+    assert await seeded.match_results.count_documents({"id": {"$in": [10, 11]}}) == 2
+
+
+async def test_ordered_insert_many_stops_at_first_error(seeded):
+    with pytest.raises(BulkWriteError) as error:
+        await seeded.match_results.insert_many([{"id": 20}, {"id": 1}, {"id": 21}])
+    assert error.value.details["nInserted"] == 1
+    assert await seeded.match_results.count_documents({"id": 21}) == 0
+
+
+async def test_bulk_write_counts(seeded):
+    result = await seeded.deck_matchup_priors.bulk_write(
+        [
+            UpdateOne(
+                {"deck_a_id": 1, "deck_b_id": 2},
+                {"$set": {"prior_matches": 12}},
+                upsert=True,
+            ),
+            UpdateOne(
+                {"deck_a_id": 2, "deck_b_id": 3},
+                {"$set": {"prior_matches": 2, "prior_wins": 1, "environment_id": 1}},
+                upsert=True,
+            ),
+            InsertOne(
+                {
+                    "deck_a_id": 3,
+                    "deck_b_id": 4,
+                    "environment_id": 1,
+                    "prior_matches": 1,
+                    "prior_wins": 0,
+                }
+            ),
+            DeleteOne({"deck_a_id": 4, "deck_b_id": 5}),
+        ],
+        ordered=False,
+    )
+    assert (
+        result.matched_count,
+        result.modified_count,
+        result.upserted_count,
+        result.inserted_count,
+        result.deleted_count,
+    ) == (1, 1, 1, 1, 1)
+    assert list(result.upserted_ids) == [1]
+    assert await PriorRepository(seeded).fetch_rows(environment_id=1) == {
+        "1_2": PriorRow(1, 2, 12, 6),
+        "1_3": PriorRow(1, 3, 4, 1),
+        "2_3": PriorRow(2, 3, 2, 1),
+        "3_4": PriorRow(3, 4, 1, 0),
+    }
+
+
+# ------------------------------------------------------------ 聚合
+
+
+async def test_group_with_conditional_sums(seeded):
+    pipeline = [
+        {"$match": {"environment_id": 1}},
+        {
+            "$group": {
+                "_id": "$winning_deck_id",
+                "wins": {"$sum": 1},
+                "first_hand_wins": {
+                    "$sum": {
+                        "$cond": [{"$eq": ["$first_deck_id", "$winning_deck_id"]}, 1, 0]
+                    }
+                },
+                "opponents": {"$addToSet": "$losing_deck_id"},
+                "average_id": {"$avg": "$id"},
+                "last_id": {"$max": "$id"},
+            }
+        },
+        {"$sort": {"_id": 1}},
+    ]
+    groups = await seeded.match_results.aggregate(pipeline).to_list(None)
+    assert [
+        (
+            group["_id"],
+            group["wins"],
+            group["first_hand_wins"],
+            sorted(group["opponents"]),
+            group["average_id"],
+            group["last_id"],
+        )
+        for group in groups
+    ] == [
+        (1, 2, 1, [2, 3], 2.0, 3),
+        (2, 1, 0, [1], 2.0, 2),
+        (3, 1, 1, [3], 5.0, 5),
+    ]
+
+
+async def test_project_unwind_and_count(seeded):
+    pipeline = [
+        {"$match": {"environment_id": 1, "match_type_id": 1}},
+        {
+            "$project": {
+                "_id": 0,
+                "id": 1,
+                "decks": ["$winning_deck_id", "$losing_deck_id"],
+            }
+        },
+        {"$unwind": "$decks"},
+        {"$group": {"_id": "$decks", "games": {"$sum": 1}}},
+        {"$sort": {"games": -1, "_id": 1}},
+        {"$limit": 2},
+    ]
+    assert await seeded.match_results.aggregate(pipeline).to_list(None) == [
+        {"_id": 1, "games": 2},
+        {"_id": 2, "games": 2},
+    ]
+    counted = await seeded.match_results.aggregate(
+        [{"$match": {"environment_id": 2}}, {"$count": "total"}]
+    ).to_list(None)
+    assert counted == [{"total": 1}]
+    empty = await seeded.match_results.aggregate(
+        [{"$match": {"environment_id": 99}}, {"$count": "total"}]
+    ).to_list(None)
+    assert empty == []
@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db.migrations import Migration, MigrationLockHeld, run_migrations, runner
+
+pytestmark = [pytest.mark.anyio, pytest.mark.both_backends]
+
+
+class _Recording(Migration):
+    def __init__(self, version: int, calls: list, fail: bool = False):
+        self.version = version
+        self.name = f"recording_{version}"
+        self.calls = calls
+        self.fail = fail
+
+    async def up(self, database, progress):
+        self.calls.append(self.version)
+        # 让出事件循环，使并发启动的其他 runner 有机会争抢锁
+        await asyncio.sleep(0.01)
+        await progress.save(checkpoint=self.version, processed=1)
+        if self.fail:
+            raise RuntimeError("boom")
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        runner, "MIGRATIONS", [_Recording(1, calls), _Recording(2, calls)]
+    )
+    return calls
+
+
+async def _lock_doc(database):
+    return await database.get_collection(runner.LOCK_COLLECTION).find_one(
+        {"_id": runner.LOCK_ID}
+    )
+
+
+async def test_lock_excludes_other_owners(database):
+    first, second = runner._MigrationLock(database), runner._MigrationLock(database)
+    await first.acquire()
+    with pytest.raises(MigrationLockHeld):
+        await second.acquire()
+    # 持有者可以重复获取（续租）
+    await first.acquire()
+    await first.release()
+    await second.acquire()
+    assert (await _lock_doc(database))["owner"] == second.owner
+
+
+async def test_expired_lock_is_taken_over(database):
+    stale, fresh = runner._MigrationLock(database), runner._MigrationLock(database)
+    await stale.acquire()
+    await database.get_collection(runner.LOCK_COLLECTION).update_one(
+        {"_id": runner.LOCK_ID},
+        {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}},
+    )
+    await fresh.acquire()
+    # 原持有者续租时发现锁已被接手，不能继续迁移
+    with pytest.raises(MigrationLockHeld):
+        await stale.renew()
+    # 原持有者释放时不会删除新持有者的锁
+    await stale.release()
+    assert (await _lock_doc(database))["owner"] == fresh.owner
+
+
+async def test_concurrent_runners_apply_each_migration_once(database, calls):
+    results = await asyncio.gather(
+        *(run_migrations(database) for _ in range(3)), return_exceptions=True
+    )
+    completed = [result for result in results if isinstance(result, list)]
+    assert completed == [[1, 2]]
+    assert all(
+        isinstance(result, MigrationLockHeld)
+        for result in results
+        if not isinstance(result, list)
+    )
+    assert calls == [1, 2]
+    assert await _lock_doc(database) is None
+    assert await run_migrations(database) == []
+
+
+async def test_held_lock_blocks_runner(database, calls):
+    holder = runner._MigrationLock(database)
+    await holder.acquire()
+    with pytest.raises(MigrationLockHeld):
+        await run_migrations(database)
+    assert calls == []
+    await holder.release()
+    assert await run_migrations(database) == [1, 2]
+
+
+async def test_failure_releases_lock_and_resumes(database, monkeypatch):
+    calls = []
+    failing = _Recording(2, calls, fail=True)
+    monkeypatch.setattr(runner, "MIGRATIONS", [_Recording(1, calls), failing])
+    with pytest.raises(RuntimeError):
+        await run_migrations(database)
+    assert await _lock_doc(database) is None
+    status = {
+        row["version"]: row["status"] for row in await runner.migration_status(database)
+    }
+    assert status == {1: "applied", 2: "failed"}
+
+    failing.fail = False
+    assert await run_migrations(database) == [2]
+    assert calls == [1, 2, 2]
+    record = await database.get_collection(runner.RECORDS_COLLECTION).find_one(
+        {"version": 2}
+    )
+    assert record["processed"] == 2
@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core import snapshots
+from app.core.data_versions import DataVersionMarker, bump_data_version
+from app.core.snapshots import SnapshotScheduler, latest_snapshot
+
+pytestmark = pytest.mark.anyio
+
+ENVIRONMENT_ID = 1
+
+
+@pytest.fixture
+async def versions(database):
+    await database.decks.insert_many(
+        [
+            {
+                "id": deck_id,
+                "name": name,
+                "environment_id": ENVIRONMENT_ID,
+                "author_id": "a",
+            }
+            for deck_id, name in [(1, "alpha"), (2, "beta")]
+        ]
+    )
+    await database.match_results.insert_many(
+        [
+            {
+                "id": match_id,
+                "environment_id": ENVIRONMENT_ID,
+                "match_type_id": 1 + match_id % 2,
+                "first_deck_id": 1,
+                "second_deck_id": 2,
+                "winning_deck_id": 1 if match_id % 3 else 2,
+                "losing_deck_id": 2 if match_id % 3 else 1,
+            }
+            for match_id in range(1, 21)
+        ]
+    )
+    await bump_data_version([ENVIRONMENT_ID])
+    return database.get_collection("data_versions")
+
+
+@pytest.fixture
+def scheduler():
+    return SnapshotScheduler(debounce_seconds=30, max_delay_seconds=300)
+
+
+async def _age(versions, **fields):
+    """把最后一次写入挪到 debounce 之前"""
+    await versions.update_one(
+        {"environment_id": ENVIRONMENT_ID},
+        {"$set": {"updated_at": datetime.utcnow() - timedelta(hours=1), **fields}},
+    )
+
+
+async def _state(versions):
+    return await versions.find_one({"environment_id": ENVIRONMENT_ID})
+
+
+async def test_waits_for_writes_to_settle(versions, scheduler):
+    assert await scheduler.run_once() == 0
+    await _age(versions)
+    assert await scheduler.run_once() == 1
+
+    state = await _state(versions)
+    assert state["dirty"] is False and state["lease_expires_at"] is None
+    assert "dirty_since" not in state
+    for match_type_id, total in [(None, 20), (1, 10), (2, 10)]:
+        snapshot = await latest_snapshot(ENVIRONMENT_ID, match_type_id)
+        assert snapshot["data_version"] == state["version"]
+        assert snapshot["total_matches"] == total
+    # 没有新写入时不再重复计算
+    assert await scheduler.run_once() == 0
+
+
+async def test_max_delay_forces_a_snapshot_under_steady_writes(versions, scheduler):
+    await versions.update_one(
+        {"environment_id": ENVIRONMENT_ID},
+        {"$set": {"dirty_since": datetime.utcnow() - timedelta(hours=1)}},
+    )
+    assert await scheduler.run_once() == 1
+
+
+async def test_lease_excludes_other_workers(versions, scheduler):
+    await _age(versions)
+    other = SnapshotScheduler(debounce_seconds=30, max_delay_seconds=300)
+    assert (await scheduler._claim())["environment_id"] == ENVIRONMENT_ID
+    assert await other._claim() is None
+    # 持有者崩溃、租约过期后可被其他 worker 接手
+    await versions.update_one(
+        {"environment_id": ENVIRONMENT_ID},
+        {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}},
+    )
+    assert (await other._claim())["environment_id"] == ENVIRONMENT_ID
+
+
+async def test_write_during_computation_restarts_max_delay(
+    versions, scheduler, monkeypatch
+):
+    compute = scheduler._snapshot_scope
+
+    async def compute_with_concurrent_write(environment_id, match_type_id, version):
+        await compute(environment_id, match_type_id, version)
+        await bump_data_version([environment_id])
+
+    monkeypatch.setattr(scheduler, "_snapshot_scope", compute_with_concurrent_write)
+    await _age(versions, dirty_since=datetime.utcnow() - timedelta(hours=1))
+    started = datetime.utcnow()
+    assert await scheduler.run_once() == 1
+
+    state = await _state(versions)
+    assert state["dirty"] is True and state["lease_expires_at"] is None
+    # 最长等待从本次计算开始重新计时，持续写入时不会每轮都被重新领取
+    assert state["dirty_since"] >= started - timedelta(seconds=1)
+    assert await scheduler.run_once() == 0
+
+
+async def test_failures_back_off_until_success(versions, scheduler, monkeypatch):
+    compute = scheduler._snapshot_scope
+
+    async def failing(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(scheduler, "_snapshot_scope", failing)
+    delays = []
+    for _ in range(3):
+        await _age(versions, retry_at=None)
+        with pytest.raises(RuntimeError):
+            await scheduler.run_once()
+        state = await _state(versions)
+        assert state["dirty"] is True and state["lease_expires_at"] is None
+        delays.append((state["retry_at"] - datetime.utcnow()).total_seconds())
+        # 退避期间不会被重新领取
+        assert await scheduler.run_once() == 0
+    assert [round(delay) for delay in delays] == [30, 60, 120]
+
+    monkeypatch.setattr(scheduler, "_snapshot_scope", compute)
+    await _age(versions, retry_at=None)
+    assert await scheduler.run_once() == 1
+    state = await _state(versions)
+    assert (state["dirty"], state["failures"], state["retry_at"]) == (False, 0, None)
+
+
+async def test_history_is_capped(versions):
+    scheduler = SnapshotScheduler(debounce_seconds=30, history_size=2)
+    for _ in range(4):
+        await bump_data_version([ENVIRONMENT_ID])
+        await _age(versions)
+        assert await scheduler.run_once() == 1
+    history = await snapshots.snapshot_history(ENVIRONMENT_ID, limit=10)
+    assert len(history) == 2
+    assert history[0]["data_version"] == (await _state(versions))["version"]
+
+
+async def test_marker_coalesces_version_bumps(versions):
+    before = (await _state(versions))["version"]
+    marker = DataVersionMarker(flush_seconds=60)
+    for _ in range(5):
+        marker.mark([ENVIRONMENT_ID, None])
+    marker.mark([2])
+    assert marker.pending == 2
+    await marker.stop()
+
+    assert marker.pending == 0
+    assert (await _state(versions))["version"] == before + 1
+    other = await versions.find_one({"environment_id": 2})
+    assert (other["version"], other["dirty"]) == (1, True)
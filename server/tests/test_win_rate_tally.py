@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from app.core.win_rate_calculator import (
+    WinRateCalculator,
+    _tally_arrays,
+    _tally_rows,
+)
+from app.db.repositories import MatchArrays, MatchRow, PriorRow
+from app.models.deck import Deck
+
+
+def _random_rows(seed: int, count: int, deck_count: int = 6):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for _ in range(count):
+        first, second = (int(deck_id) for deck_id in rng.integers(1, deck_count + 1, 2))
+        winner, loser = (first, second) if rng.random() < 0.5 else (second, first)
+        rows.append(MatchRow(winner, loser, first, second))
+    return rows
+
+
+def _arrays(rows):
+    return MatchArrays(*(np.array(column, dtype=np.int64) for column in zip(*rows)))
+
+
+def test_small_example():
+    rows = [
+        MatchRow(1, 2, 1, 2),
+        MatchRow(1, 2, 2, 1),
+        MatchRow(2, 1, 1, 2),
+        # 同卡组对局只计一次
+        MatchRow(3, 3, 3, 3),
+    ]
+    expected = {
+        1: {2: {"wins": 2, "total": 3}},
+        2: {1: {"wins": 1, "total": 3}},
+        3: {3: {"wins": 1, "total": 1}},
+    }
+    assert _tally_rows(rows) == expected
+    assert _tally_arrays(_arrays(rows)) == expected
+
+
+def test_empty_input():
+    empty = MatchArrays(*(np.empty(0, dtype=np.int64) for _ in range(4)))
+    assert _tally_rows([]) == _tally_arrays(empty) == {}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_arrays_match_rows(seed):
+    rows = _random_rows(seed, count=500)
+    assert _tally_arrays(_arrays(rows)) == _tally_rows(rows)
+
+
+def test_calculator_gives_same_result_for_rows_and_arrays():
+    rows = _random_rows(42, count=400)
+    decks = [
+        Deck(id=deck_id, name=str(deck_id), environment_id=1, author_id="a")
+        for deck_id in range(1, 7)
+    ]
+    priors = {"1_2": PriorRow(1, 2, 10, 7), "4_3": PriorRow(4, 3, 6, 2)}
+    calculator = WinRateCalculator(sensitivity=30.0, prior_weight=1.0)
+    from_rows = calculator.calculate_final_win_rates(decks, rows, None, priors)
+    from_arrays = calculator.calculate_final_win_rates(
+        decks, _arrays(rows), None, priors
+    )
+    assert from_rows.keys() == from_arrays.keys()
+    for deck_id, calculation in from_rows.items():
+        assert from_arrays[deck_id].average_win_rate == pytest.approx(
+            calculation.average_win_rate
+        )
+        assert from_arrays[deck_id].weighted_win_rate == pytest.approx(
+            calculation.weighted_win_rate
+        )
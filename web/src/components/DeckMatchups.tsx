@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from "react";
+import React, { useState, useEffect, useCallback, useRef } from "react";
 import { API_ENDPOINTS } from "../config/api";
 import {
   message,
@@ -18,6 +18,7 @@ import { MatchType, BatchMatch } from "../types";
 import type { ColumnsType } from "antd/es/table";
 import BatchMatchModal from "./BatchMatchModal";
 import { submitBatchMatch } from "../utils/matchUtils";
+import { subscribeLiveStatistics } from "../utils/liveStatistics";
 import { QuestionCircleOutlined } from "@ant-design/icons";
 import "./DeckMatchups.css";
 
@@ -29,7 +30,9 @@ interface Environment {
 }
 
 interface MatchupStats {
+  opponent_name?: string;
   wins: number;
+  losses?: number;
   total: number;
   win_rate: number;
   first_hand_wins: number;
@@ -66,6 +69,8 @@ const DeckMatchups: React.FC = () => {
   const [selectedHand, setSelectedHand] = useState<string>("all");
   const [loading, setLoading] = useState(false);
   const [statistics, setStatistics] = useState<MatchupStatistics | null>(null);
+  // 供实时推送的回调读取当前数据，不随每次更新重新订阅
+  const statisticsRef = useRef<MatchupStatistics | null>(null);
   const [environments, setEnvironments] = useState<Environment[]>([]);
   const [matchTypes, setMatchTypes] = useState<MatchType[]>([]);
   const [batchModalVisible, setBatchModalVisible] = useState(false);
@@ -163,6 +168,65 @@ const DeckMatchups: React.FC = () => {
     fetchStatistics();
   }, [fetchStatistics]);
 
+  useEffect(() => {
+    statisticsRef.current = statistics;
+  }, [statistics]);
+
+  // 订阅实时统计：全部先后手时直接合并变化的单元格
+  useEffect(() => {
+    if (!selectedEnvironment) return;
+    // 首个 snapshot 与刚获取的统计一致；之后的 snapshot 来自重连或积压溢出，
+    // 期间的增量可能已丢失，重新获取完整统计
+    let receivedSnapshot = false;
+    return subscribeLiveStatistics(
+      selectedEnvironment,
+      selectedMatchType,
+      (event, isSnapshot) => {
+        if (isSnapshot) {
+          if (receivedSnapshot) fetchStatistics();
+          receivedSnapshot = true;
+          return;
+        }
+        // 新建的卡组不在当前数据中，与按先后手筛选时一样重新获取完整统计
+        const current = statisticsRef.current;
+        const hasNewDeck = Object.keys(event.matchups).some(
+          (key) => !current?.matchup_statistics[key.split("_")[0]]
+        );
+        if (selectedHand !== "all" || hasNewDeck) {
+          fetchStatistics();
+          return;
+        }
+        setStatistics((previous) => {
+          if (!previous) return previous;
+          const matchupStatistics = { ...previous.matchup_statistics };
+          Object.entries(event.matchups).forEach(([key, cell]) => {
+            const [deckId, opponentId] = key.split("_");
+            const deck = matchupStatistics[deckId];
+            if (!deck) return;
+            const matchups = { ...deck.matchups };
+            if (cell === null) {
+              delete matchups[opponentId];
+            } else {
+              matchups[opponentId] = {
+                opponent_name:
+                  matchupStatistics[opponentId]?.deck_name ?? opponentId,
+                ...matchups[opponentId],
+                ...cell,
+                losses: cell.total - cell.wins,
+                win_rate:
+                  cell.total > 0
+                    ? Math.round((cell.wins / cell.total) * 10000) / 100
+                    : 0,
+              };
+            }
+            matchupStatistics[deckId] = { ...deck, matchups };
+          });
+          return { ...previous, matchup_statistics: matchupStatistics };
+        });
+      }
+    );
+  }, [selectedEnvironment, selectedMatchType, selectedHand, fetchStatistics]);
+
   useEffect(() => {
     checkAdminStatus();
   }, [checkAdminStatus]);
@@ -70,8 +70,24 @@ const MatchResults: React.FC = () => {
       if (selectedMatchType) {
         params.append('match_type_id', selectedMatchType.toString());
       }
-      const response = await api.get(`${API_ENDPOINTS.MATCH_RESULTS}?${params.toString()}`);
-      const sortedData = response.data.sort(
+      // 接口按 id 分页返回，逐页拉取直到不足一页
+      const pageSize = 1000;
+      params.append('limit', pageSize.toString());
+      const allResults: MatchResult[] = [];
+      let afterId: number | null = null;
+      for (;;) {
+        if (afterId !== null) {
+          params.set('after_id', afterId.toString());
+        }
+        const response = await api.get(`${API_ENDPOINTS.MATCH_RESULTS}?${params.toString()}`);
+        const page: MatchResult[] = response.data;
+        allResults.push(...page);
+        if (page.length < pageSize) {
+          break;
+        }
+        afterId = page[page.length - 1].id;
+      }
+      const sortedData = allResults.sort(
         (a: MatchResult, b: MatchResult) => b.id - a.id
       );
       setMatchResults(sortedData);
@@ -46,6 +46,8 @@ const MatchTypes: React.FC = () => {
     null
   );
   const [users, setUsers] = useState<Record<string, User>>({});
+  // 私有分组的成员，列表接口不返回，按需从单个分组接口获取
+  const [members, setMembers] = useState<Record<number, string[]>>({});
   const [isAdmin, setIsAdmin] = useState(false);
   const [currentUserId, setCurrentUserId] = useState<string>("");
   const [form] = Form.useForm();
@@ -87,6 +89,7 @@ const MatchTypes: React.FC = () => {
         withCredentials: true, // 确保发送认证信息
       });
       setMatchTypes(response.data);
+      setMembers({});
     } catch (error) {
       console.error("获取比赛类型列表失败", error);
       message.error("获取比赛类型列表失败");
@@ -105,15 +108,25 @@ const MatchTypes: React.FC = () => {
     }
   }, []);
 
-  // 监听比赛类型变化，更新用户信息
-  useEffect(() => {
-    if (matchTypes.length > 0) {
-      const allUserIds = matchTypes.flatMap((mt) => mt.users || []);
-      if (allUserIds.length > 0) {
-        fetchUsers(allUserIds, users);
+  const fetchMembers = useCallback(
+    async (id: number) => {
+      try {
+        const response = await api.get(`${API_ENDPOINTS.MATCH_TYPES}${id}`);
+        setMembers((prev) => ({ ...prev, [id]: response.data.users || [] }));
+      } catch {
+        message.error("获取成员列表失败");
       }
+    },
+    [message]
+  );
+
+  // 监听成员变化，更新用户信息
+  useEffect(() => {
+    const allUserIds = Object.values(members).flat();
+    if (allUserIds.length > 0) {
+      fetchUsers(allUserIds, users);
     }
-  }, [matchTypes, fetchUsers, users]);
+  }, [members, fetchUsers, users]);
 
   // 监听路由变化
   useEffect(() => {
@@ -293,7 +306,18 @@ const MatchTypes: React.FC = () => {
       width: 300,
       responsive: ['lg'],
       render: (_: unknown, record: MatchType) =>
-        record.is_private ? renderUserList(record.users) : null,
+        !record.is_private ? null : members[record.id] ? (
+          renderUserList(members[record.id])
+        ) : (
+          <Button
+            type="link"
+            size="small"
+            icon={<TeamOutlined />}
+            onClick={() => fetchMembers(record.id)}
+          >
+            查看成员
+          </Button>
+        ),
     },
     {
       title: "操作",
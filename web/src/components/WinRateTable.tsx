@@ -16,6 +16,11 @@ import {
 import api from "../config/api";
 import { useLocation } from "react-router-dom";
 import { MatchType } from "../types";
+import {
+  LIVE_PRIOR_WEIGHT,
+  LIVE_SENSITIVITY,
+  subscribeLiveStatistics,
+} from "../utils/liveStatistics";
 import type { ColumnsType } from "antd/es/table";
 import "./WinRateTable.css";
 
@@ -120,6 +125,28 @@ const WinRateTable: React.FC = () => {
       if (selectedEnvironment) {
         params.append("environment_id", selectedEnvironment.toString());
       }
+      // 默认参数优先读取后台预先计算的快照，快照尚未生成时再实时计算
+      if (
+        selectedEnvironment &&
+        sensitivity === LIVE_SENSITIVITY &&
+        priorWeight === LIVE_PRIOR_WEIGHT
+      ) {
+        const snapshotParams = new URLSearchParams({
+          environment_id: selectedEnvironment.toString(),
+        });
+        if (selectedMatchType) {
+          snapshotParams.append("match_type_id", selectedMatchType);
+        }
+        try {
+          const response = await api.get<WinRateCalculationResponse>(
+            `${API_ENDPOINTS.WIN_RATES}/snapshot?${snapshotParams.toString()}`
+          );
+          setCalculations(response.data.calculations);
+          return;
+        } catch (error) {
+          console.warn("Win rate snapshot unavailable:", error);
+        }
+      }
       const response = await api.get<WinRateCalculationResponse>(
         `${API_ENDPOINTS.WIN_RATES}/calculate?${params.toString()}`
       );
@@ -144,6 +171,39 @@ const WinRateTable: React.FC = () => {
     fetchWinRates();
   }, [sensitivity, priorWeight, selectedMatchType, selectedEnvironment, fetchWinRates]);
 
+  // 订阅实时统计：默认参数时直接合并推送的胜率，否则收到变更后重新计算
+  useEffect(() => {
+    if (!selectedEnvironment) return;
+    const isDefault =
+      sensitivity === LIVE_SENSITIVITY && priorWeight === LIVE_PRIOR_WEIGHT;
+    // 首个 snapshot 之后的 snapshot 来自重连或积压溢出，期间可能错过了变更
+    let receivedSnapshot = false;
+    return subscribeLiveStatistics(
+      selectedEnvironment,
+      selectedMatchType,
+      (event, isSnapshot) => {
+        const missedChanges = !isSnapshot || receivedSnapshot;
+        if (isSnapshot) receivedSnapshot = true;
+        if (!isDefault) {
+          if (missedChanges) fetchWinRates();
+          return;
+        }
+        setCalculations((previous) => {
+          const next = isSnapshot ? {} : { ...previous };
+          Object.entries(event.win_rates).forEach(([deckId, winRate]) => {
+            const id = Number(deckId);
+            if (winRate === null) {
+              delete next[id];
+            } else {
+              next[id] = { deck_id: id, environment_offset: 0, ...winRate };
+            }
+          });
+          return next;
+        });
+      }
+    );
+  }, [sensitivity, priorWeight, selectedMatchType, selectedEnvironment, fetchWinRates]);
+
   interface TableRecord {
     deck_id: number;
     average_win_rate: number;
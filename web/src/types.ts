@@ -15,7 +15,7 @@ export interface MatchType {
   name: string;
   is_private: boolean;
   invite_code?: string;
-  users: string[];
+  users?: string[]; // 列表接口不返回成员
   creator_id: string;
 }
 
@@ -0,0 +1,102 @@
+import api, { API_ENDPOINTS } from "../config/api";
+
+export interface LiveWinRate {
+  average_win_rate: number;
+  weighted_win_rate: number;
+}
+
+export interface LiveMatchupCell {
+  wins: number;
+  total: number;
+  first_hand_wins: number;
+  first_hand_total: number;
+  second_hand_wins: number;
+  second_hand_total: number;
+}
+
+// snapshot 为完整状态，delta 只包含变化的条目，消失的条目为 null
+export interface LiveStatisticsEvent {
+  data_version: number;
+  win_rates: Record<string, LiveWinRate | null>;
+  matchups: Record<string, LiveMatchupCell | null>;
+}
+
+// 服务端推送的胜率为默认参数下的结果
+export const LIVE_SENSITIVITY = 30.0;
+export const LIVE_PRIOR_WEIGHT = 1.0;
+
+// 连接断开后重新建立连接的等待时间
+const RECONNECT_DELAY_MS = 3000;
+
+/**
+ * 订阅环境（及比赛类型）的实时统计，返回取消订阅的函数
+ *
+ * EventSource 无法设置请求头，登录用户每次连接前先换取一次性票据放在查询参数中，
+ * 避免 token 出现在 URL 里。票据只能使用一次，因此不依赖浏览器的自动重连：
+ * 断线后关闭连接，换取新票据后重新连接，重连后首先收到的 snapshot 事件会覆盖
+ * 期间错过的增量。收到 revoked 事件（失去访问权限）后不再重连。
+ */
+export const subscribeLiveStatistics = (
+  environmentId: string | number,
+  matchTypeId: string | number | undefined,
+  onEvent: (event: LiveStatisticsEvent, isSnapshot: boolean) => void
+): (() => void) => {
+  const params = new URLSearchParams({
+    environment_id: environmentId.toString(),
+  });
+  if (matchTypeId) {
+    params.append("match_type_id", matchTypeId.toString());
+  }
+  let source: EventSource | undefined;
+  let retryTimer: ReturnType<typeof setTimeout> | undefined;
+  let closed = false;
+
+  const reconnectLater = () => {
+    if (!closed) {
+      retryTimer = setTimeout(connect, RECONNECT_DELAY_MS);
+    }
+  };
+
+  const connect = async () => {
+    const streamParams = new URLSearchParams(params);
+    const token = localStorage.getItem("token");
+    if (token && token !== "guest") {
+      try {
+        const response = await api.post<{ ticket: string }>(
+          `${API_ENDPOINTS.WIN_RATES}/live/ticket?${params.toString()}`
+        );
+        streamParams.append("ticket", response.data.ticket);
+      } catch (error) {
+        console.error("Error creating live statistics ticket:", error);
+        reconnectLater();
+        return;
+      }
+    }
+    if (closed) return;
+    source = new EventSource(
+      `${API_ENDPOINTS.WIN_RATES}/live?${streamParams.toString()}`
+    );
+    source.addEventListener("snapshot", (event) =>
+      onEvent(JSON.parse((event as MessageEvent).data), true)
+    );
+    source.addEventListener("delta", (event) =>
+      onEvent(JSON.parse((event as MessageEvent).data), false)
+    );
+    // 订阅期间失去访问权限，服务端关闭连接，不再重连
+    source.addEventListener("revoked", () => {
+      closed = true;
+      source?.close();
+    });
+    source.onerror = () => {
+      source?.close();
+      reconnectLater();
+    };
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    source?.close();
+  };
+};